@@ -4,10 +4,13 @@ from typing import Annotated
 import jwt
 from fastapi import Depends, HTTPException, Request, status
 from fastapi.security.oauth2 import OAuth2PasswordBearer
+from pydantic import ValidationError
 
 from forum.auth.exceptions import InsufficientPermission
 from forum.auth.models import User
+from forum.auth.schemas import TokenData
 from forum.auth.service import auth as auth_service
+from forum.cache.repository import cache_repo
 from forum.config import settings
 from forum.database.core import DbSession
 
@@ -22,18 +25,27 @@ credentials_exception = HTTPException(
 )
 
 
-async def get_current_user(
-    session: DbSession, token: Annotated[str, Depends(oauth2_scheme)]
-) -> User:
-    """Validate current user"""
+async def get_token_claims(
+    token: Annotated[str, Depends(oauth2_scheme)],
+) -> TokenData:
+    """Validate the access token and return its claims."""
     try:
         payload = jwt.decode(token, settings.JWT_KEY, algorithms=[settings.JWT_ALG])
-        user_id = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except jwt.InvalidTokenError:
+        return TokenData(**payload)
+    except (jwt.InvalidTokenError, ValidationError):
         raise credentials_exception
-    user = await auth_service._get(session, user_id)
+
+
+TokenClaims = Annotated[TokenData, Depends(get_token_claims)]
+
+
+async def get_current_user(
+    session: DbSession, request: Request, claims: TokenClaims
+) -> User:
+    """Validate current user"""
+    user = await auth_service.get_cached(
+        session, request.app.state.cache, int(claims.sub)
+    )
     if not user:
         raise credentials_exception
     return user
@@ -62,15 +74,51 @@ async def get_admin_user(current_user: CurrentUser):
 AdminUser = Annotated[User, Depends(get_admin_user)]
 
 
+class RoleClaimDependency:
+    """
+    Check the role claimed by the access token, without loading the user.
+    Users whose role changed while their tokens are still valid are checked
+    against their current role instead.
+    """
+
+    def __init__(self, roles: set[str], detail: str) -> None:
+        self._roles = roles
+        self._detail = detail
+
+    async def __call__(
+        self, session: DbSession, request: Request, claims: TokenClaims
+    ) -> TokenData:
+        cache = request.app.state.cache
+        user_id = int(claims.sub)
+        role = claims.role
+        if await cache_repo.is_role_claims_revoked(cache, user_id):
+            user = await auth_service.get_cached(session, cache, user_id)
+            if not user:
+                raise credentials_exception
+            role = user.role.name.lower() if user.role else None
+
+        if role not in self._roles:
+            raise HTTPException(status.HTTP_403_FORBIDDEN, self._detail)
+        return claims
+
+
+get_moderator_claims = RoleClaimDependency(
+    {"moderator", "admin"}, "You must be a moderator"
+)
+get_admin_claims = RoleClaimDependency({"admin"}, "You must be an admin")
+
+
 class PermissionDependency:
     """Check if User has a set of permissions as dependency."""
 
     def __init__(self, permissions: set[str]) -> None:
         self._perm = permissions
 
-    async def __call__(self, request: Request, user: CurrentUser):
+    async def __call__(self, session: DbSession, request: Request, user: CurrentUser):
         try:
-            await auth_service.check_authorization(request, user, self._perm)
+            await auth_service.check_authorization(
+                session, request.app.state.cache, user, self._perm
+            )
         except InsufficientPermission:
             raise HTTPException(
                 status.HTTP_401_UNAUTHORIZED, "Insufficient Permissions"
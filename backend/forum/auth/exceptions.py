@@ -20,3 +20,21 @@ class InsufficientPermission(Exception):
 
 class InvalidRefreshToken(Exception):
     pass
+
+
+class TooManyLoginAttempts(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too many login attempts, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class UserDoesNotExist(Exception):
+    pass
+
+
+class RoleDoesNotExist(Exception):
+    pass
+
+
+class PermissionDoesNotExist(Exception):
+    pass
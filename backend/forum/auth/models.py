@@ -1,11 +1,14 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from typing import TYPE_CHECKING
 
 from argon2 import PasswordHasher
-from sqlalchemy import ForeignKey
+from sqlalchemy import Column, ForeignKey, Table
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.types import Integer, LargeBinary, String
 
 from forum.auth.utils import generate_jwt_token
+from forum.config import settings
 from forum.database.core import Base, TimestampMixin
 
 if TYPE_CHECKING:
@@ -13,15 +16,36 @@ if TYPE_CHECKING:
     from forum.post.models import Post
 
 
+password_hasher = PasswordHasher()
+
+# argon2 releases the GIL, so hashing in threads keeps the event loop free
+# while the pool size caps how many hashes run at once per worker
+hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="argon2"
+)
+
+
 def hash_password(password: str) -> bytes:
     """Hash a password using argon2."""
-    hash = PasswordHasher().hash(password)
+    hash = password_hasher.hash(password)
     return hash.encode("utf-8")
 
 
 def verify_hash(password: str, hash: bytes) -> bool:
     """Check if password matches the hash."""
-    return PasswordHasher().verify(hash, password)
+    return password_hasher.verify(hash, password)
+
+
+async def hash_password_async(password: str) -> bytes:
+    """Hash a password in the hashing pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(hash_executor, hash_password, password)
+
+
+async def verify_hash_async(password: str, hash: bytes) -> bool:
+    """Check if password matches the hash in the hashing pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(hash_executor, verify_hash, password, hash)
 
 
 class User(Base, TimestampMixin):
@@ -40,17 +64,17 @@ class User(Base, TimestampMixin):
 
     posts: Mapped[list["Post"]] = relationship(back_populates="author")
 
-    def verify_password(self, password: str) -> bool:
+    async def verify_password(self, password: str) -> bool:
         """Check if the `password` matches the hashed password in database."""
         if not password:
             raise ValueError("Password cannot be empty")
-        return verify_hash(password, self.password)
+        return await verify_hash_async(password, self.password)
 
-    def set_password(self, password: str):
+    async def set_password(self, password: str):
         """Set a new password for the User."""
         if not password:
             raise ValueError("Password cannot be empty")
-        self.password = hash_password(password)
+        self.password = await hash_password_async(password)
 
     def is_moderator(self) -> bool:
         """True if user have a moderator role."""
@@ -73,9 +97,35 @@ class User(Base, TimestampMixin):
         return f"User=(id={self.id!r}, username={self.username!r}, created_at={self.created_at!r}, updated_at={self.updated_at!r})"
 
 
+role_permissions = Table(
+    "role_permissions",
+    Base.metadata,
+    Column("role_id", ForeignKey("roles.id", ondelete="CASCADE"), primary_key=True),
+    Column(
+        "permission_id",
+        ForeignKey("permissions.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+)
+
+
 class Role(Base):
     __tablename__ = "roles"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(30), unique=True)
 
     users: Mapped[list[User]] = relationship(back_populates="role")
+
+    permissions: Mapped[list["Permission"]] = relationship(
+        secondary=role_permissions, back_populates="roles"
+    )
+
+
+class Permission(Base):
+    __tablename__ = "permissions"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(50), unique=True)
+
+    roles: Mapped[list[Role]] = relationship(
+        secondary=role_permissions, back_populates="permissions"
+    )
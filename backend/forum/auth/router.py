@@ -7,27 +7,36 @@ from fastapi.security.oauth2 import OAuth2PasswordRequestForm
 from pydantic import PositiveInt
 from forum.auth.dependencies import (
     CurrentUser,
+    get_admin_user,
     get_moderator_user,
 )
 from forum.auth.exceptions import (
     EmailAlreadyExists,
     IncorrectPasswordOrUsername,
     InvalidRefreshToken,
+    PermissionDoesNotExist,
+    RoleDoesNotExist,
+    TooManyLoginAttempts,
+    UserDoesNotExist,
     UsernameAlreadyExists,
 )
 from forum.auth.schemas import (
+    RolePermissions,
+    RolePermissionsUpdate,
     Token,
     UserCreate,
     UserLogin,
     UserPagination,
     UserRead,
+    UserRoleUpdate,
 )
 from forum.auth.service import auth as auth_service
 from forum.config import settings
-from forum.database.core import DbSession
+from forum.database.core import DbSession, ReadDbSession
 
 auth_router = APIRouter(prefix="/auth", tags=["authorization"])
 user_router = APIRouter(prefix="/users", tags=["users"])
+role_router = APIRouter(prefix="/roles", tags=["roles"])
 
 log = logging.getLogger(__name__)
 
@@ -54,9 +63,18 @@ async def login_endpoint(
     """Login endpoint."""
     try:
         user_in = UserLogin(username=user_data.username, password=user_data.password)
-        tokens = await auth_service.login(db_session, request.app.state.cache, user_in)
+        client_ip = request.client.host if request.client else None
+        tokens = await auth_service.login(
+            db_session, request.app.state.cache, user_in, client_ip
+        )
         set_cookie_refresh_token(response, tokens.refresh_token)
         return Token(access_token=tokens.access_token)
+    except TooManyLoginAttempts as e:
+        raise HTTPException(
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts",
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except IncorrectPasswordOrUsername:
         raise HTTPException(
             status.HTTP_401_UNAUTHORIZED,
@@ -89,13 +107,43 @@ async def refresh_token_endpoint(request: Request, response: Response):
         )
 
 
+@auth_router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout_endpoint(request: Request, response: Response):
+    """Revoke the refresh token of this session."""
+    rf_token = request.cookies.get("refresh_token")
+    try:
+        if rf_token:
+            await auth_service.logout(request.app.state.cache, rf_token)
+        response.delete_cookie("refresh_token", httponly=True, secure=True)
+    except Exception:
+        log.error("failure to logout user", exc_info=True)
+        raise HTTPException(
+            status.HTTP_500_INTERNAL_SERVER_ERROR, "An unexpected error occurred"
+        )
+
+
+@auth_router.post("/logout/all", status_code=status.HTTP_204_NO_CONTENT)
+async def logout_everywhere_endpoint(
+    current_user: CurrentUser, request: Request, response: Response
+):
+    """Revoke the refresh tokens of every session of the current user."""
+    try:
+        await auth_service.logout_everywhere(request.app.state.cache, current_user.id)
+        response.delete_cookie("refresh_token", httponly=True, secure=True)
+    except Exception:
+        log.error("failure to logout user everywhere", exc_info=True)
+        raise HTTPException(
+            status.HTTP_500_INTERNAL_SERVER_ERROR, "An unexpected error occurred"
+        )
+
+
 @auth_router.post(
     "/register", response_model=Token, status_code=status.HTTP_201_CREATED
 )
-async def register_user(db_session: DbSession, user_in: UserCreate, request: Request):
+async def register_user(db_session: DbSession, user_in: UserCreate):
     """Register user endpoint."""
     try:
-        user = await auth_service.register(db_session, user_in, request.app.state.cache)
+        user = await auth_service.register(db_session, user_in)
         return Token(access_token=user.token)
     except UsernameAlreadyExists:
         raise HTTPException(status.HTTP_409_CONFLICT, "Username already exists")
@@ -112,7 +160,7 @@ async def register_user(db_session: DbSession, user_in: UserCreate, request: Req
     "/", response_model=UserPagination, dependencies=[Depends(get_moderator_user)]
 )
 async def read_users(
-    db_session: DbSession, page: PositiveInt = 1, limit: PositiveInt = 10
+    db_session: ReadDbSession, page: PositiveInt = 1, limit: PositiveInt = 10
 ):
     try:
         users, total = await auth_service.list_users(db_session, page, limit)
@@ -138,6 +186,57 @@ async def read_user_me(current_user: CurrentUser) -> UserRead:
     return current_user
 
 
+@user_router.patch(
+    "/{id}/role", response_model=UserRead, dependencies=[Depends(get_admin_user)]
+)
+async def update_user_role(
+    db_session: DbSession, request: Request, id: int, role_in: UserRoleUpdate
+):
+    """Change the role of a user."""
+    try:
+        return await auth_service.set_user_role(
+            db_session, request.app.state.cache, id, role_in.role_id
+        )
+    except UserDoesNotExist:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "User not found")
+    except RoleDoesNotExist:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Role does not exist")
+    except Exception:
+        log.error("failed to update user role", exc_info=True)
+        raise HTTPException(
+            status.HTTP_500_INTERNAL_SERVER_ERROR, "An unexpected error occurred"
+        )
+
+
+@role_router.put(
+    "/{id}/permissions",
+    response_model=RolePermissions,
+    dependencies=[Depends(get_admin_user)],
+)
+async def update_role_permissions(
+    db_session: DbSession, id: int, perms_in: RolePermissionsUpdate
+):
+    """Replace the permissions of a role."""
+    try:
+        role = await auth_service.set_role_permissions(
+            db_session, id, perms_in.permissions
+        )
+        return RolePermissions(
+            id=role.id,
+            name=role.name,
+            permissions={p.name for p in role.permissions},
+        )
+    except RoleDoesNotExist:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Role not found")
+    except PermissionDoesNotExist:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Unknown permissions")
+    except Exception:
+        log.error("failed to update role permissions", exc_info=True)
+        raise HTTPException(
+            status.HTTP_500_INTERNAL_SERVER_ERROR, "An unexpected error occurred"
+        )
+
+
 # @user_router.get(
 #     "/me/posts/{post_id}",
 #     dependencies=[
@@ -39,6 +39,44 @@ class UserRead(UserBase):
     created_at: datetime
 
 
+class RoleRead(BaseModel):
+    id: int
+    name: str
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class RolePermissions(RoleRead):
+    """Pydantic model for a Role with its permissions."""
+
+    permissions: set[str]
+
+
+class RolePermissionsUpdate(BaseModel):
+    """Pydantic model to replace the permissions of a Role."""
+
+    permissions: set[str]
+
+
+class UserRoleUpdate(BaseModel):
+    """Pydantic model to change the role of a User."""
+
+    role_id: int
+
+
+class UserCache(BaseModel):
+    """Pydantic model of the authenticated user kept in cache."""
+
+    id: int
+    username: str
+    email: str
+    created_at: datetime
+    updated_at: datetime
+    role: RoleRead | None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class UserPagination(Pagination):
     """Pydantic model for paginated results of Users."""
 
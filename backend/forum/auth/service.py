@@ -1,13 +1,12 @@
-import json
 import logging
 
 from argon2.exceptions import VerifyMismatchError
-from fastapi import Request
 from redis.asyncio import Redis
 from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, make_transient_to_detached, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.sql import select
 
 from forum.auth.exceptions import (
@@ -15,43 +14,83 @@ from forum.auth.exceptions import (
     IncorrectPasswordOrUsername,
     InsufficientPermission,
     InvalidRefreshToken,
+    PermissionDoesNotExist,
+    RoleDoesNotExist,
+    UserDoesNotExist,
     UsernameAlreadyExists,
 )
-from forum.auth.models import User, hash_password, verify_hash
-from forum.auth.schemas import TokenResponse, UserCreate, UserLogin
-from forum.auth.utils import generate_jwt_token, generate_refresh_token
-from forum.cache.repository import cache_repo
+from forum.auth.models import Permission, Role, User, hash_password, verify_hash_async
+from forum.auth.schemas import (
+    TokenResponse,
+    UserCache,
+    UserCreate,
+    UserLogin,
+    UserRead,
+)
+from forum.auth.throttling import login_throttle
+from forum.auth.utils import (
+    generate_jwt_token,
+    generate_refresh_token,
+    get_refresh_family_user,
+    get_refresh_token_family,
+    new_refresh_family,
+)
+from forum.cache.repository import (
+    ROLE_PERMISSIONS_CHANGED,
+    USER_CHANGED,
+    USER_CREATED,
+    cache_repo,
+)
 from forum.config import settings
+from forum.outbox.service import outbox
 
 log = logging.getLogger(__name__)
 
 DUMMY_HASH = hash_password("dummypassword")
 
 REFRESH_TOKEN_PREFIX = "rf_token"
+REFRESH_FAMILY_PREFIX = "rf_family"
+REFRESH_FAMILIES_PREFIX = "rf_families"
 
 
 class AuthService:
-    async def register(
-        self, session: AsyncSession, user_in: UserCreate, cache: Redis
-    ) -> User:
+    async def register(self, session: AsyncSession, user_in: UserCreate) -> User:
         """Register a new User."""
         user = User(**user_in.model_dump(exclude={"password"}))
-        user.set_password(user_in.password)
+        await user.set_password(user_in.password)
         user.role_id = 1  # TODO: remove hardcode
 
-        return await self._create(session, user, cache)
+        return await self._create(session, user)
 
     async def login(
-        self, session: AsyncSession, cache: Redis, user_in: UserLogin
+        self,
+        session: AsyncSession,
+        cache: Redis,
+        user_in: UserLogin,
+        client_ip: str | None = None,
     ) -> TokenResponse:
         """
         Login a user if it exists and their credentials are valid.
         Returns an access token and refresh token.
+
+        Raise TooManyLoginAttempts, before checking the password, if the
+        username or the client IP has too many failed or in flight logins.
         """
+        attempt = await login_throttle.check(cache, user_in.username, client_ip)
+        try:
+            user = await self._authenticate(session, user_in)
+        except IncorrectPasswordOrUsername:
+            await login_throttle.record_failure(
+                cache, user_in.username, client_ip, attempt
+            )
+            raise
+        except BaseException:
+            await login_throttle.release(cache, user_in.username, client_ip, attempt)
+            raise
+        await login_throttle.reset(cache, user_in.username, client_ip, attempt)
 
-        user = await self._authenticate(session, user_in)
         token = user.token
-        refresh_token = generate_refresh_token()
+        refresh_token = generate_refresh_token(new_refresh_family(user.id))
         await self._cache_store_refresh_token(cache, refresh_token, user)
         return TokenResponse(access_token=token, refresh_token=refresh_token)
 
@@ -67,11 +106,11 @@ class AuthService:
         try:
             if user is None:
                 raise IncorrectPasswordOrUsername
-            user.verify_password(user_in.password)
+            await user.verify_password(user_in.password)
             return user
         except IncorrectPasswordOrUsername:
             try:
-                verify_hash(user_in.password, DUMMY_HASH)
+                await verify_hash_async(user_in.password, DUMMY_HASH)
             except:  # noqa
                 pass
             raise
@@ -82,40 +121,167 @@ class AuthService:
             raise
 
     async def refresh(self, cache: Redis, refresh_token: str) -> TokenResponse:
-        """Validate a refresh token. If valid returns new tokens."""
-        user_data = await cache.get(f"{REFRESH_TOKEN_PREFIX}:{refresh_token}")
-        if user_data is None:
-            raise InvalidRefreshToken
+        """
+        Validate a refresh token. If valid returns new tokens.
 
-        # Delete old refresh token
-        await cache.delete(f"{REFRESH_TOKEN_PREFIX}:{refresh_token}")
+        The token is consumed and replaced in a single transaction, so only
+        one of concurrent refreshes with the same token can succeed.
+        Presenting a token that was already used revokes its whole family.
+        The family and the index of the families of its user are kept alive
+        together, so logout_everywhere finds every family still in use.
+        """
+        family = get_refresh_token_family(refresh_token)
+        if family is None:
+            raise InvalidRefreshToken
 
-        # Save new refresh
-        new_refresh = generate_refresh_token()
-        await cache.set(
+        new_refresh = generate_refresh_token(family)
+        family_key = f"{REFRESH_FAMILY_PREFIX}:{family}"
+        pipe = cache.pipeline(transaction=True)
+        pipe.getdel(f"{REFRESH_TOKEN_PREFIX}:{refresh_token}")
+        pipe.set(
             f"{REFRESH_TOKEN_PREFIX}:{new_refresh}",
-            user_data,
+            family,
             ex=settings.JWT_RF_TOKEN_EXPIRATION,
         )
+        pipe.hgetall(family_key)
+        pipe.expire(family_key, settings.JWT_RF_TOKEN_EXPIRATION)
+        user_id = get_refresh_family_user(family)
+        if user_id is not None:
+            pipe.expire(
+                f"{REFRESH_FAMILIES_PREFIX}:{user_id}",
+                settings.JWT_RF_TOKEN_EXPIRATION,
+            )
+        token_family, _, user, *_ = await pipe.execute()
 
-        user = json.loads(user_data)
-        access_token = generate_jwt_token(user["user_id"], user["role"])
+        if token_family != family or not user:
+            # Reused, expired or revoked token
+            await self._revoke_refresh_family(cache, family, user.get("user_id"))
+            await cache.delete(f"{REFRESH_TOKEN_PREFIX}:{new_refresh}")
+            raise InvalidRefreshToken
+
+        access_token = generate_jwt_token(int(user["user_id"]), user["role"])
         return TokenResponse(access_token=access_token, refresh_token=new_refresh)
 
+    async def logout(self, cache: Redis, refresh_token: str):
+        """Revoke the family of a refresh token."""
+        family = get_refresh_token_family(refresh_token)
+        if family is None:
+            return
+        user_id = await cache.hget(f"{REFRESH_FAMILY_PREFIX}:{family}", "user_id")
+        await self._revoke_refresh_family(cache, family, user_id)
+
+    async def logout_everywhere(self, cache: Redis, user_id: int):
+        """Revoke every refresh token family of a user."""
+        families_key = f"{REFRESH_FAMILIES_PREFIX}:{user_id}"
+        families = await cache.smembers(families_key)  # type: ignore
+        await cache.delete(
+            families_key, *(f"{REFRESH_FAMILY_PREFIX}:{f}" for f in families)
+        )
+
     async def check_authorization(
-        self, request: Request, user: User, permissions: set[str]
+        self,
+        session: AsyncSession,
+        cache: Redis,
+        user: User,
+        permissions: set[str],
     ):
         """Validate if the user has authozitation."""
+        if user.role_id is None:
+            raise InsufficientPermission
         try:
-            user_perms = await self._get_permissions(request.state.app.cache, user)
+            user_perms = await self.get_role_permissions(session, cache, user.role_id)
         except Exception as e:
             log.error(f"Unexpected error when checking authorization for {user}: {e}")
             raise
 
-        if user_perms and permissions <= user_perms:
+        if permissions <= user_perms:
             return True
         raise InsufficientPermission
 
+    async def get_role_permissions(
+        self, session: AsyncSession, cache: Redis, role_id: int
+    ) -> set[str]:
+        """
+        Returns the permissions of a role.
+        Read from cache, falling back to the database and caching the result.
+        """
+        perms = await cache_repo.get_role_permissions(cache, role_id)
+        if perms is None:
+            loaded = await self._load_role_permissions(session, role_id)
+            perms = loaded.get(role_id, set())
+            await cache_repo.set_role_permissions(cache, {role_id: perms})
+        return perms
+
+    async def warm_permissions(self, session: AsyncSession, cache: Redis):
+        """Cache the permissions of every role."""
+        perms = await self._load_role_permissions(session)
+        await cache_repo.set_role_permissions(cache, perms)
+        log.info(f"Cached permissions of {len(perms)} roles")
+
+    async def set_role_permissions(
+        self, session: AsyncSession, role_id: int, names: set[str]
+    ) -> Role:
+        """
+        Replace the permissions of a role.
+        Raise RoleDoesNotExist or PermissionDoesNotExist for unknown ids or names.
+        """
+        role = await session.get(
+            Role,
+            role_id,
+            options=[selectinload(Role.permissions)],
+            populate_existing=True,
+        )
+        if role is None:
+            raise RoleDoesNotExist
+        perms = (
+            await session.scalars(select(Permission).where(Permission.name.in_(names)))
+        ).all()
+        if len(perms) != len(names):
+            raise PermissionDoesNotExist
+
+        role.permissions = list(perms)
+        await session.flush()
+        outbox.add(session, ROLE_PERMISSIONS_CHANGED, {"role_id": role_id})
+        return role
+
+    async def set_user_role(
+        self, session: AsyncSession, cache: Redis, user_id: int, role_id: int
+    ) -> User:
+        """
+        Change the role of a user.
+        Their refresh tokens are revoked and the role claimed by their access
+        tokens stops being trusted, since both carry the previous role.
+        Raise UserDoesNotExist or RoleDoesNotExist for unknown ids.
+        """
+        user = await self._get(session, user_id)
+        if user is None:
+            raise UserDoesNotExist
+        role = await session.get(Role, role_id)
+        if role is None:
+            raise RoleDoesNotExist
+
+        user.role = role
+        await session.flush()
+        await session.refresh(user, ["updated_at", "role"])
+        outbox.add(session, USER_CHANGED, {"user_id": user_id})
+        await cache_repo.revoke_role_claims(cache, user_id)
+        await self.logout_everywhere(cache, user_id)
+        return user
+
+    async def _load_role_permissions(
+        self, session: AsyncSession, role_id: int | None = None
+    ) -> dict[int, set[str]]:
+        """Load the permissions of one or every role from the database."""
+        stmt = select(Role.id, Permission.name).outerjoin(Role.permissions)
+        if role_id is not None:
+            stmt = stmt.where(Role.id == role_id)
+        perms: dict[int, set[str]] = {}
+        for id, name in await session.execute(stmt):
+            role_perms = perms.setdefault(id, set())
+            if name is not None:
+                role_perms.add(name)
+        return perms
+
     async def list_users(
         self, session: AsyncSession, page: int, limit: int
     ) -> tuple[list[User], int]:
@@ -136,31 +302,57 @@ class AuthService:
         return res.all(), total  # type: ignore
 
     async def _cache_store_refresh_token(self, cache: Redis, refresh_token, user: User):
-        """Store refresh token in cache."""
-        data = {"user_id": user.id, "role": user.role.name}
-        await cache.set(
-            f"{REFRESH_TOKEN_PREFIX}:{refresh_token}",
-            json.dumps(data),
-            ex=settings.JWT_RF_TOKEN_EXPIRATION,
-        )
+        """Store refresh token in cache, as the first token of a new family."""
+        family = get_refresh_token_family(refresh_token)
+        family_key = f"{REFRESH_FAMILY_PREFIX}:{family}"
+        families_key = f"{REFRESH_FAMILIES_PREFIX}:{user.id}"
+        ttl = settings.JWT_RF_TOKEN_EXPIRATION
+
+        pipe = cache.pipeline(transaction=True)
+        pipe.set(f"{REFRESH_TOKEN_PREFIX}:{refresh_token}", family, ex=ttl)
+        pipe.hset(family_key, mapping={"user_id": user.id, "role": user.role.name})
+        pipe.expire(family_key, ttl)
+        pipe.sadd(families_key, family)
+        pipe.expire(families_key, ttl)
+        await pipe.execute()
+
+    async def _revoke_refresh_family(
+        self, cache: Redis, family: str, user_id: int | str | None
+    ):
+        """Revoke a refresh token family, its remaining token stops working."""
+        pipe = cache.pipeline(transaction=True)
+        pipe.delete(f"{REFRESH_FAMILY_PREFIX}:{family}")
+        if user_id is not None:
+            pipe.srem(f"{REFRESH_FAMILIES_PREFIX}:{user_id}", family)
+        await pipe.execute()
 
     async def _get(self, session: AsyncSession, id: int) -> User | None:
         """Returns a User by ID."""
         return await session.get(User, id, options=[joinedload(User.role)])
 
-    async def _get_permissions(self, cache: Redis, user: User) -> set[str] | None:
+    async def get_cached(
+        self, session: AsyncSession, cache: Redis, id: int
+    ) -> User | None:
         """
-        Attempt permissions retrieval from cache.
-        Otherwise retrieve from database and update cache.
+        Returns a User by ID, from cache when possible.
+        A cached user is attached to the session without querying the database.
         """
-        cache_key = f"users_perms:{user.id}"
-
-        perms = await cache.smembers(cache_key)  # type:ignore
-        if perms:
-            return perms
+        cached = await cache_repo.get_user(cache, id)
+        if cached is None:
+            user = await self._get(session, id)
+            if user is not None:
+                await cache_repo.set_user(cache, UserCache.model_validate(user))
+            return user
 
-        # Cache miss -> Retrive from database
-        # TODO: retrieve from database
+        role = None
+        if cached.role is not None:
+            role = Role(**cached.role.model_dump())
+            make_transient_to_detached(role)
+        user = User(**cached.model_dump(exclude={"role"}))
+        user.role_id = role.id if role else None
+        make_transient_to_detached(user)
+        set_committed_value(user, "role", role)
+        return await session.merge(user, load=False)
 
     async def get_by_username(
         self, session: AsyncSession, username: str
@@ -171,13 +363,17 @@ class AuthService:
         )
         return res.scalar()
 
-    async def _create(self, session: AsyncSession, user: User, cache: Redis) -> User:
+    async def _create(self, session: AsyncSession, user: User) -> User:
         """Create a new User in database."""
         try:
             session.add(user)
             await session.flush()
             await session.refresh(user, ["role"])
-            await cache_repo.push_recent_user(cache, user)
+            outbox.add(
+                session,
+                USER_CREATED,
+                {"user": UserRead.model_validate(user).model_dump(mode="json")},
+            )
             return user
         except IntegrityError as e:
             detail = str(e.orig)
@@ -0,0 +1,115 @@
+import secrets
+import time
+
+from redis.asyncio import Redis
+
+from forum.auth.exceptions import TooManyLoginAttempts
+from forum.config import settings
+
+LOGIN_FAILURES_PREFIX = "login_failures"
+LOGIN_STATS_KEY = "login_throttle:stats"
+
+
+class LoginThrottle:
+    """
+    Sliding window limit of failed logins, per username and per client IP.
+
+    Attempts are stored as members of a sorted set scored by their timestamp,
+    so the window slides instead of resetting at fixed intervals.
+    Attempts are reserved before any password hashing is done, and only the
+    failed ones stay in the window.
+    Counters of attempts, failures and rejections are kept in a Redis hash.
+    """
+
+    def __init__(self, max_per_username: int, max_per_ip: int, window: int) -> None:
+        self.max_per_username = max_per_username
+        self.max_per_ip = max_per_ip
+        self.window = window
+
+    def _keys(self, username: str, ip: str | None) -> list[tuple[str, str, int]]:
+        """Returns the (scope, key, limit) tracked for a login attempt."""
+        keys = [
+            (
+                "username",
+                f"{LOGIN_FAILURES_PREFIX}:username:{username.lower()}",
+                self.max_per_username,
+            )
+        ]
+        if ip:
+            keys.append(("ip", f"{LOGIN_FAILURES_PREFIX}:ip:{ip}", self.max_per_ip))
+        return keys
+
+    async def check(self, cache: Redis, username: str, ip: str | None) -> str:
+        """
+        Reserve a login attempt and return it.
+        Raise TooManyLoginAttempts if the username or the IP is over its limit.
+
+        The attempt is added to the window in the same transaction that counts
+        it, so attempts still in flight count against the limit. It stays
+        there as a failure unless it is released.
+        """
+        now = time.time()
+        attempt = f"{now}:{secrets.token_hex(4)}"
+        keys = self._keys(username, ip)
+        pipe = cache.pipeline()
+        for _, key, _ in keys:
+            pipe.zremrangebyscore(key, 0, now - self.window)
+            pipe.zadd(key, {attempt: now})
+            pipe.expire(key, self.window)
+            pipe.zcard(key)
+            pipe.zrange(key, 0, 0, withscores=True)
+        pipe.hincrby(LOGIN_STATS_KEY, "attempts", 1)
+        res = await pipe.execute()
+
+        for i, (scope, _, limit) in enumerate(keys):
+            n_attempts, oldest = res[i * 5 + 3], res[i * 5 + 4]
+            if n_attempts > limit:
+                await self.release(cache, username, ip, attempt)
+                await cache.hincrby(LOGIN_STATS_KEY, f"rejected_{scope}", 1)
+                retry_after = oldest[0][1] + self.window - now if oldest else 0
+                raise TooManyLoginAttempts(max(int(retry_after) + 1, 1))
+        return attempt
+
+    async def record_failure(
+        self, cache: Redis, username: str, ip: str | None, attempt: str
+    ):
+        """Keep a failed attempt in the windows, from the time it failed."""
+        now = time.time()
+        pipe = cache.pipeline(transaction=False)
+        for _, key, _ in self._keys(username, ip):
+            pipe.zadd(key, {attempt: now}, xx=True)
+            pipe.expire(key, self.window)
+        pipe.hincrby(LOGIN_STATS_KEY, "failures", 1)
+        await pipe.execute()
+
+    async def release(self, cache: Redis, username: str, ip: str | None, attempt: str):
+        """Remove an attempt that did not fail from the windows."""
+        pipe = cache.pipeline(transaction=False)
+        for _, key, _ in self._keys(username, ip):
+            pipe.zrem(key, attempt)
+        await pipe.execute()
+
+    async def reset(self, cache: Redis, username: str, ip: str | None, attempt: str):
+        """
+        Forget the failures of a username after a successful login.
+        Only the successful attempt is removed from the IP window.
+        """
+        pipe = cache.pipeline(transaction=False)
+        for scope, key, _ in self._keys(username, ip):
+            if scope == "username":
+                pipe.delete(key)
+            else:
+                pipe.zrem(key, attempt)
+        await pipe.execute()
+
+    async def get_stats(self, cache: Redis) -> dict[str, int]:
+        """Returns the login counters."""
+        stats = await cache.hgetall(LOGIN_STATS_KEY)  # type: ignore
+        return {k: int(v) for k, v in stats.items()}
+
+
+login_throttle = LoginThrottle(
+    settings.LOGIN_MAX_FAILURES_PER_USERNAME,
+    settings.LOGIN_MAX_FAILURES_PER_IP,
+    settings.LOGIN_FAILURES_WINDOW,
+)
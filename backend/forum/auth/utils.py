@@ -4,6 +4,8 @@ import secrets
 
 import jwt
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from forum.auth.schemas import TokenData
@@ -11,21 +13,84 @@ from forum.config import settings
 
 log = logging.getLogger(__name__)
 
+USER_PERMISSIONS = {
+    "threads:create",
+    "threads:edit",
+    "posts:create",
+    "posts:edit",
+    "posts:delete",
+}
+MODERATOR_PERMISSIONS = USER_PERMISSIONS | {
+    "threads:pin",
+    "threads:lock",
+    "posts:moderate",
+    "users:read",
+    "dashboard:read",
+}
+ADMIN_PERMISSIONS = MODERATOR_PERMISSIONS | {
+    "forums:manage",
+    "categories:manage",
+    "roles:manage",
+}
+DEFAULT_PERMISSIONS = {
+    "User": USER_PERMISSIONS,
+    "Moderator": MODERATOR_PERMISSIONS,
+    "Admin": ADMIN_PERMISSIONS,
+}
+
+
+def _insert_ignore(session: AsyncSession, table):
+    """INSERT ... ON CONFLICT DO NOTHING, for the dialect of the session."""
+    if session.get_bind().dialect.name == "sqlite":
+        return sqlite_insert(table).on_conflict_do_nothing()
+    return postgresql_insert(table).on_conflict_do_nothing()
+
 
 async def init_roles(session: AsyncSession):
+    """
+    Create the default roles. Workers start at the same time, rows
+    already inserted by another one are skipped.
+    """
     from forum.auth.models import Role
 
     res = await session.scalar(select(Role))
     if res is None:
-        role = Role(name="User")
-        session.add(role)
-        log.info("Creating User role")
-        role = Role(name="Moderator")
-        session.add(role)
-        log.info("Creating Moderador role")
-        role = Role(name="Admin")
-        session.add(role)
-        log.info("Creating Admin role")
+        names = ("User", "Moderator", "Admin")
+        await session.execute(
+            _insert_ignore(session, Role), [{"name": name} for name in names]
+        )
+        log.info(f"Creating {', '.join(names)} roles")
+        await session.commit()
+
+
+async def init_permissions(session: AsyncSession):
+    """
+    Create the permissions and grant the defaults to each role. Workers start
+    at the same time, rows already inserted by another one are skipped.
+    """
+    from forum.auth.models import Permission, Role, role_permissions
+
+    res = await session.scalar(select(Permission))
+    if res is None:
+        names = sorted(set().union(*DEFAULT_PERMISSIONS.values()))
+        await session.execute(
+            _insert_ignore(session, Permission), [{"name": n} for n in names]
+        )
+        perms = dict(
+            (await session.execute(select(Permission.name, Permission.id))).all()
+        )
+        roles = await session.execute(
+            select(Role.name, Role.id).where(Role.name.in_(DEFAULT_PERMISSIONS))
+        )
+        grants = []
+        for name, role_id in roles:
+            grants += [
+                {"role_id": role_id, "permission_id": perms[n]}
+                for n in sorted(DEFAULT_PERMISSIONS[name])
+            ]
+            log.info(f"Granting default permissions to {name} role")
+        if grants:
+            await session.execute(_insert_ignore(session, role_permissions), grants)
         await session.commit()
 
 
@@ -37,6 +102,28 @@ def generate_jwt_token(user_id: int, role: str) -> str:
     return jwt.encode(to_encode.model_dump(), settings.JWT_KEY, settings.JWT_ALG)
 
 
-def generate_refresh_token() -> str:
-    """Generate a refresh token."""
-    return secrets.token_urlsafe(32)
+def generate_refresh_token(family: str | None = None) -> str:
+    """
+    Generate a refresh token, prefixed by the family it belongs to.
+    A new family is started when none is given.
+    """
+    if family is None:
+        family = secrets.token_urlsafe(16)
+    return f"{family}.{secrets.token_urlsafe(32)}"
+
+
+def get_refresh_token_family(refresh_token: str) -> str | None:
+    """Returns the family of a refresh token, None if malformed."""
+    family, sep, _ = refresh_token.partition(".")
+    return family if sep and family else None
+
+
+def new_refresh_family(user_id: int) -> str:
+    """Start a refresh token family, prefixed by the id of its user."""
+    return f"{user_id}-{secrets.token_urlsafe(16)}"
+
+
+def get_refresh_family_user(family: str) -> str | None:
+    """Returns the user id prefixing a family, None if it has none."""
+    user_id, sep, _ = family.partition("-")
+    return user_id if sep and user_id.isdigit() else None
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from redis.asyncio import Redis
+
+from forum.config import settings
+
+log = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache_invalidation"
+
+
+class LocalCache:
+    """
+    Per-worker in-memory LRU cache with a TTL, in front of Redis.
+    Keys are the same as in Redis. Entries are invalidated across workers
+    and nodes through a Redis pub/sub channel.
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    def get(self, key: str) -> str | None:
+        """Get a value if present and not expired."""
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str):
+        """Set a value, evicting the least recently used ones above max size."""
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        """Delete a value from this worker only."""
+        self._data.pop(key, None)
+
+    def clear(self):
+        """Delete every value from this worker."""
+        self._data.clear()
+
+    async def invalidate(self, cache: Redis, key: str):
+        """Delete a value from this worker and tell the others to do the same."""
+        self.delete(key)
+        await cache.publish(INVALIDATION_CHANNEL, key)
+
+    async def listen(self, cache: Redis, retry_delay: float = 1):
+        """
+        Listen for invalidations from other workers until cancelled.
+        Everything is dropped after a reconnect since messages may have been missed.
+        """
+        while True:
+            try:
+                async with cache.pubsub() as pubsub:
+                    await pubsub.subscribe(INVALIDATION_CHANNEL)
+                    self.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.delete(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f"Lost cache invalidation channel, reconnecting: {e}")
+                await asyncio.sleep(retry_delay)
+
+
+local_cache = LocalCache(settings.LOCAL_CACHE_MAX_SIZE, settings.LOCAL_CACHE_TTL)
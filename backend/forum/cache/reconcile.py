@@ -0,0 +1,227 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Awaitable
+
+from redis.asyncio import Redis
+from redis.exceptions import WatchError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.sql import func, select
+
+from forum.auth.models import User
+from forum.cache.repository import (
+    NUM_POSTS_PER_FORUM,
+    NUM_POSTS_PER_USER,
+    NUM_THREADS_PER_FORUM,
+    RECONCILE_SUSPECTS_KEY,
+)
+from forum.cache.write_behind import write_behind
+from forum.config import settings
+from forum.forum.models import Forum
+from forum.post.models import Post
+from forum.thread.models import Thread
+
+log = logging.getLogger(__name__)
+
+RECONCILE_LOCK_KEY = "reconcile:lock"
+RECONCILE_CURSOR_KEY = "reconcile:cursor"
+RECONCILE_STATS_KEY = "reconcile:stats"
+
+
+class CounterReconciler:
+    """
+    Repair the cached counters that drifted from the database.
+
+    Each pass checks the next `batch_size` forums and users, by id, against
+    the database and wraps around once the end is reached. Forums are checked
+    against the thread_count and reply_count columns, rebuilt by the
+    rebuild_counters of the services, users against their indexed posts.
+    The position is kept in Redis, and a lock expiring after `interval` lets a
+    single worker run a pass per interval.
+
+    A committed write whose counter update is still in the outbox or in a
+    write-behind buffer shows as drift, and repairing it would count the
+    write twice once it lands. A key is only repaired when it shows the same
+    cached and database values on two passes in a row, a write landing in
+    between changes them. Keys found drifted are kept as suspects and checked
+    again on the next pass, whatever the slice, up to `batch_size` of each.
+    Loading the counters from the database marks every loaded key as a suspect.
+
+    Keys are watched while the database is queried, a key changed in between
+    is left for the next round.
+    """
+
+    def __init__(self, batch_size: int, interval: int) -> None:
+        self.batch_size = batch_size
+        self.interval = interval
+
+    async def run(self, cache: Redis, sessionlocal: async_sessionmaker[AsyncSession]):
+        """Run a pass every interval, in one worker at a time, until cancelled."""
+        while True:
+            try:
+                if await cache.set(RECONCILE_LOCK_KEY, 1, nx=True, ex=self.interval):
+                    async with sessionlocal() as session:
+                        await self.reconcile(cache, session)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f"Counter reconciliation failed: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    async def reconcile(self, cache: Redis, session: AsyncSession) -> int:
+        """
+        Check the next slice of forums and users, and the suspects of the
+        previous pass. Returns the drift confirmed.
+        """
+        # Increments buffered by this worker are not drift
+        await write_behind.flush(cache)
+        suspects = await cache.hgetall(RECONCILE_SUSPECTS_KEY)  # type: ignore
+        suspect_ids: defaultdict[str, set[int]] = defaultdict(set)
+        for key in suspects:
+            prefix, _, id = key.rpartition(":")
+            if prefix in (NUM_THREADS_PER_FORUM, NUM_POSTS_PER_FORUM):
+                prefix = "forums"
+            suspect_ids[prefix].add(int(id))
+
+        drift = 0
+        forum_ids = await self._next_ids(cache, session, Forum, "forums")
+        forum_ids = sorted(set(forum_ids) | self._first(suspect_ids["forums"]))
+        if forum_ids:
+            keys = [f"{NUM_THREADS_PER_FORUM}:{id}" for id in forum_ids]
+            keys += [f"{NUM_POSTS_PER_FORUM}:{id}" for id in forum_ids]
+            drift += await self._repair(
+                cache, keys, self._forum_counts(session, forum_ids), suspects
+            )
+
+        user_ids = await self._next_ids(cache, session, User, "users")
+        user_ids = sorted(set(user_ids) | self._first(suspect_ids[NUM_POSTS_PER_USER]))
+        if user_ids:
+            keys = [f"{NUM_POSTS_PER_USER}:{id}" for id in user_ids]
+            drift += await self._repair(
+                cache, keys, self._user_counts(session, user_ids), suspects
+            )
+
+        await cache.hincrby(RECONCILE_STATS_KEY, "passes", 1)  # type: ignore
+        if drift:
+            log.warning(f"Repaired a drift of {drift} in the cached counters")
+        return drift
+
+    async def get_stats(self, cache: Redis) -> dict[str, int]:
+        """Get the reconciliation counters."""
+        stats = await cache.hgetall(RECONCILE_STATS_KEY)  # type: ignore
+        return {k: int(v) for k, v in stats.items()}
+
+    def _first(self, ids: set[int]) -> set[int]:
+        """The first `batch_size` suspects, the others wait for the next passes."""
+        return set(sorted(ids)[: self.batch_size])
+
+    async def _next_ids(
+        self,
+        cache: Redis,
+        session: AsyncSession,
+        model: type[Forum] | type[User],
+        scope: str,
+    ) -> list[int]:
+        """Ids of the next slice, moving the cursor past them."""
+        cursor = int(await cache.hget(RECONCILE_CURSOR_KEY, scope) or 0)  # type: ignore
+        st = select(model.id).order_by(model.id).limit(self.batch_size)
+        ids = list(await session.scalars(st.where(model.id > cursor)))
+        if not ids and cursor:
+            # Rows after the cursor were deleted, start over now
+            ids = list(await session.scalars(st))
+        # Start over after the last slice
+        next_cursor = ids[-1] if len(ids) == self.batch_size else 0
+        await cache.hset(RECONCILE_CURSOR_KEY, scope, next_cursor)  # type: ignore
+        return ids
+
+    async def _repair(
+        self,
+        cache: Redis,
+        keys: list[str],
+        counts: Awaitable[dict[str, int]],
+        suspects: dict[str, str],
+    ) -> int:
+        """
+        Compare cached counters with the counts from the database. Differences
+        seen on the previous pass too are repaired, new ones are kept as
+        suspects. Returns the drift repaired, the sum of the differences.
+        """
+        async with cache.pipeline() as pipe:
+            await pipe.watch(*keys)
+            cached = dict(zip(keys, await pipe.mget(keys)))
+            expected = await counts
+            seen = {
+                key: f"{int(cached[key] or 0)}:{value}"
+                for key, value in expected.items()
+                if int(cached[key] or 0) != value
+            }
+            wrong = {
+                key: expected[key]
+                for key, values in seen.items()
+                if suspects.get(key) == values
+            }
+            new = {key: values for key, values in seen.items() if key not in wrong}
+            drift = sum(abs(int(cached[key] or 0) - v) for key, v in wrong.items())
+            repaired = 0
+            try:
+                pipe.multi()
+                if wrong:
+                    pipe.mset(wrong)
+                # Suspects of this pass replace the ones of these keys
+                pipe.hdel(RECONCILE_SUSPECTS_KEY, *keys)
+                if new:
+                    pipe.hset(RECONCILE_SUSPECTS_KEY, mapping=new)
+                await pipe.execute()
+                repaired = len(wrong)
+            except WatchError:
+                log.info("Counters changed while reconciling, retrying later")
+
+        async with cache.pipeline(transaction=False) as pipe:
+            pipe.hincrby(RECONCILE_STATS_KEY, "checked", len(keys))
+            pipe.hincrby(RECONCILE_STATS_KEY, "suspected", len(new))
+            pipe.hincrby(RECONCILE_STATS_KEY, "drifted", len(wrong))
+            pipe.hincrby(RECONCILE_STATS_KEY, "drift", drift)
+            pipe.hincrby(RECONCILE_STATS_KEY, "repaired", repaired)
+            await pipe.execute()
+        return drift
+
+    async def _forum_counts(
+        self, session: AsyncSession, forum_ids: list[int]
+    ) -> dict[str, int]:
+        """
+        Number of threads and posts of each forum, by cache key.
+        Read from the denormalized counters of the forums and their threads,
+        so a pass reads the threads of its forums and never the posts.
+        """
+        counts = {f"{NUM_POSTS_PER_FORUM}:{id}": 0 for id in forum_ids}
+        threads = await session.execute(
+            select(Forum.id, Forum.thread_count).where(Forum.id.in_(forum_ids))
+        )
+        counts |= {f"{NUM_THREADS_PER_FORUM}:{id}": n for id, n in threads}
+        posts = await session.execute(
+            select(Thread.forum_id, func.sum(Thread.reply_count))
+            .where(Thread.forum_id.in_(forum_ids))
+            .group_by(Thread.forum_id)
+        )
+        for id, count in posts:
+            counts[f"{NUM_POSTS_PER_FORUM}:{id}"] = int(count)
+        return counts
+
+    async def _user_counts(
+        self, session: AsyncSession, user_ids: list[int]
+    ) -> dict[str, int]:
+        """Number of posts of each user, by cache key."""
+        counts = {f"{NUM_POSTS_PER_USER}:{id}": 0 for id in user_ids}
+        posts = await session.execute(
+            select(Post.author_id, func.count())
+            .where(Post.author_id.in_(user_ids))
+            .group_by(Post.author_id)
+        )
+        for id, count in posts:
+            counts[f"{NUM_POSTS_PER_USER}:{id}"] = count
+        return counts
+
+
+counter_reconciler = CounterReconciler(
+    settings.RECONCILE_BATCH_SIZE, settings.RECONCILE_INTERVAL
+)
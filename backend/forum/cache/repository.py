@@ -1,10 +1,17 @@
+import json
 import logging
+from collections import defaultdict
+from uuid import uuid4
 
 from redis.asyncio import Redis
+from redis.exceptions import WatchError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.sql import func, select
+from sqlalchemy.sql import Select, func, select
 
-from forum.auth.schemas import UserRead
+from forum.auth.schemas import UserCache, UserRead
+from forum.cache.local import INVALIDATION_CHANNEL, LocalCache, local_cache
+from forum.cache.write_behind import WriteBehindCounters, write_behind
+from forum.config import settings
 from forum.post.models import Post
 from forum.thread.models import Thread
 
@@ -15,6 +22,29 @@ LAST_N = 10
 NUM_POSTS_PER_USER = "user_posts"
 NUM_POSTS_PER_FORUM = "forum_posts"
 NUM_THREADS_PER_FORUM = "forum_threads"
+FORUM_INDEX_KEY = "forum_index"
+FORUM_INDEX_TTL = 60 * 10  # 10 minutes in seconds
+USER_KEY = "user"
+USER_TTL = 60  # seconds
+REVOKED_ROLE_KEY = "revoked_role"
+ROLE_PERMISSIONS_KEY = "role_perms"
+ROLE_PERMISSIONS_TTL = 60 * 10  # 10 minutes in seconds
+WARMUP_LOCK_KEY = "cache_warmup:lock"
+COUNTERS_VERSION_KEY = "cache_warmup:version"
+# Counters the reconciler checks first, see forum.cache.reconcile
+RECONCILE_SUSPECTS_KEY = "reconcile:suspects"
+SUSPECT_LOADED = "loaded"
+LOAD_CHUNK_SIZE = 1000  # rows per MSET when loading counters
+# Kinds of the cache events relayed from the outbox, see apply_events
+POST_CREATED = "post_created"
+POST_DELETED = "post_deleted"
+THREAD_CREATED = "thread_created"
+USER_CREATED = "user_created"
+USER_CHANGED = "user_changed"
+ROLE_PERMISSIONS_CHANGED = "role_permissions_changed"
+FORUM_INDEX_CHANGED = "forum_index_changed"
+# Bump when the counters loaded from the database change, to reload them
+COUNTERS_VERSION = "1"
 
 
 class CacheRepository:
@@ -22,74 +52,222 @@ class CacheRepository:
     Repository for caching. Some of the features are:
     - Caching user activity,
     - Caching thread/post counts
+    - Caching the forum index
+    - Caching the authenticated users
+    - Caching the permissions of each role
     - Loading from database
+
+    Near-static values are also kept in an optional in-process `LocalCache`,
+    and counter increments can be buffered in optional `WriteBehindCounters`.
     """
 
-    async def push_recent_user(self, cache: Redis, user: UserRead):
-        """Push user to cache to keep track of the recent users."""
-        user_data = UserRead.model_validate(user)
-        try:
-            async with cache.pipeline(transaction=True) as pipe:
-                await pipe.lpush(RECENT_USERS_KEY, user_data.model_dump_json())  # type: ignore
-                await pipe.ltrim(RECENT_USERS_KEY, 0, LAST_N - 1)  # type: ignore
-                await pipe.execute()
-            log.info(f"Cached {user}")
-        except Exception as e:
-            log.error(f"Error during caching new user: {user}: {e}")
+    def __init__(
+        self,
+        local: LocalCache | None = None,
+        counters: WriteBehindCounters | None = None,
+    ) -> None:
+        self._local = local
+        self._counters = counters
 
     async def get_recent_users(self, cache: Redis) -> list[UserRead]:
         """Retrieve the recent registered users (up to LAST_n)."""
         users = await cache.lrange(RECENT_USERS_KEY, 0, LAST_N - 1)  # type: ignore
         return [UserRead.model_validate_json(user) for user in users]
 
-    async def on_post_created(self, cache: Redis, user_id: int, forum_id: int):
+    async def apply_events(
+        self, cache: Redis, events: list[tuple[str, dict]], buffered: bool = True
+    ):
         """
-        Update cache after a post is created.
-        Increments user total posts and forum total posts.
+        Apply cache events, as (kind, payload), in a single round trip.
+        Counter increments of the same key are summed, and left to the
+        write-behind counters when there are some and `buffered` is set.
+        The outbox relay writes them directly, its events are deleted once
+        applied and a buffer would lose them with its worker.
+        Invalidated keys are dropped from the in-process cache of every worker.
         """
-        async with cache.pipeline() as pipe:
-            await pipe.incr(f"{NUM_POSTS_PER_USER}:{user_id}")
-            await pipe.incr(f"{NUM_POSTS_PER_FORUM}:{forum_id}")
+        invalidated = []
+        deltas: defaultdict[str, int] = defaultdict(int)
+        async with cache.pipeline(transaction=False) as pipe:
+            for kind, payload in events:
+                if kind == POST_CREATED:
+                    deltas[f"{NUM_POSTS_PER_USER}:{payload['user_id']}"] += 1
+                    deltas[f"{NUM_POSTS_PER_FORUM}:{payload['forum_id']}"] += 1
+                elif kind == POST_DELETED:
+                    deltas[f"{NUM_POSTS_PER_USER}:{payload['user_id']}"] -= 1
+                    deltas[f"{NUM_POSTS_PER_FORUM}:{payload['forum_id']}"] -= 1
+                elif kind == THREAD_CREATED:
+                    deltas[f"{NUM_THREADS_PER_FORUM}:{payload['forum_id']}"] += 1
+                elif kind == USER_CREATED:
+                    user = UserRead.model_validate(payload["user"])
+                    pipe.lpush(RECENT_USERS_KEY, user.model_dump_json())
+                    pipe.ltrim(RECENT_USERS_KEY, 0, LAST_N - 1)
+                elif kind == USER_CHANGED:
+                    invalidated.append(f"{USER_KEY}:{payload['user_id']}")
+                elif kind == ROLE_PERMISSIONS_CHANGED:
+                    invalidated.append(f"{ROLE_PERMISSIONS_KEY}:{payload['role_id']}")
+                elif kind == FORUM_INDEX_CHANGED:
+                    invalidated.append(FORUM_INDEX_KEY)
+                else:
+                    log.error(f"Unknown cache event {kind}: {payload}")
+
+            for key, amount in deltas.items():
+                if buffered and self._counters is not None:
+                    self._counters.incr(key, amount)
+                elif amount:
+                    pipe.incrby(key, amount)
+            for key in invalidated:
+                pipe.delete(key)
+                if self._local is not None:
+                    self._local.delete(key)
+                    pipe.publish(INVALIDATION_CHANNEL, key)
             await pipe.execute()
 
-    async def on_post_deleted(self, cache: Redis, user_id: int, forum_id: int):
+    async def on_forums_read(
+        self, cache: Redis, forum_ids: list[int]
+    ) -> list[tuple[int, int]]:
         """
-        Update cache after a post is deleted.
-        Decrements user total posts and forum total posts.
+        Read cache for many forums in a single round trip.
+        Returns the total posts and the number of threads of each forum,
+        in the same order as `forum_ids`.
         """
-        async with cache.pipeline() as pipe:
-            await pipe.decr(f"{NUM_POSTS_PER_USER}:{user_id}")
-            await pipe.decr(f"{NUM_POSTS_PER_FORUM}:{forum_id}")
-            await pipe.execute()
+        if not forum_ids:
+            return []
+        keys = [f"{NUM_POSTS_PER_FORUM}:{id}" for id in forum_ids]
+        keys += [f"{NUM_THREADS_PER_FORUM}:{id}" for id in forum_ids]
+        res = await cache.mget(keys)
+        n_posts, n_threads = res[: len(forum_ids)], res[len(forum_ids) :]
+        return [(int(p or 0), int(t or 0)) for p, t in zip(n_posts, n_threads)]
 
-    async def on_thread_created(self, cache: Redis, forum_id: int):
+    async def get_forum_index(self, cache: Redis) -> tuple[list[int], list[str]] | None:
         """
-        Update cache after a thread is created.
-        Increments forum total threads.
+        Get the cached forum index, without counters: the forum ids and
+        their encoded JSON objects, left open for the counters to be appended.
         """
-        await cache.incr(f"{NUM_THREADS_PER_FORUM}:{forum_id}")
+        index = await self._get(cache, FORUM_INDEX_KEY)
+        if index is None:
+            return None
+        ids, forums = index.split("\n", 1)
+        if not ids:
+            return [], []
+        return [int(id) for id in ids.split(",")], forums.split("\0")
+
+    async def set_forum_index(self, cache: Redis, ids: list[int], forums: list[str]):
+        """Cache the forum index. Counters are not part of it, they change too often."""
+        # Encoded JSON never holds a raw newline or NUL, so both are safe separators
+        index = ",".join(map(str, ids)) + "\n" + "\0".join(forums)
+        await self._set(cache, FORUM_INDEX_KEY, index, FORUM_INDEX_TTL)
+
+    async def get_user_total_posts(self, cache: Redis, user_id: int) -> int | None:
+        """Get the total number of posts of a user."""
+        return await cache.get(f"{NUM_POSTS_PER_USER}:{user_id}")
 
-    async def on_thread_deleted(self, cache: Redis, forum_id: int):
+    async def get_user(self, cache: Redis, user_id: int) -> UserCache | None:
+        """Get a cached user with its role."""
+        user = await self._get(cache, f"{USER_KEY}:{user_id}")
+        return UserCache.model_validate_json(user) if user is not None else None
+
+    async def set_user(self, cache: Redis, user: UserCache):
+        """Cache a user with its role."""
+        await self._set(
+            cache, f"{USER_KEY}:{user.id}", user.model_dump_json(), USER_TTL
+        )
+
+    async def revoke_role_claims(self, cache: Redis, user_id: int):
         """
-        Update cache after a thread is deleted.
-        Decrements forum total threads.
+        Stop trusting the role claimed by the access tokens of a user.
+        Kept until every token issued before the change has expired.
         """
-        await cache.decr(f"{NUM_THREADS_PER_FORUM}:{forum_id}")
+        await cache.set(
+            f"{REVOKED_ROLE_KEY}:{user_id}", 1, ex=settings.JWT_EXPIRATION * 60
+        )
+
+    async def is_role_claims_revoked(self, cache: Redis, user_id: int) -> bool:
+        """True if the role claimed by the tokens of a user cannot be trusted."""
+        return bool(await cache.exists(f"{REVOKED_ROLE_KEY}:{user_id}"))
+
+    async def get_role_permissions(self, cache: Redis, role_id: int) -> set[str] | None:
+        """Get the cached permissions of a role."""
+        perms = await self._get(cache, f"{ROLE_PERMISSIONS_KEY}:{role_id}")
+        return set(json.loads(perms)) if perms is not None else None
+
+    async def set_role_permissions(self, cache: Redis, perms: dict[int, set[str]]):
+        """Cache the permissions of many roles in a single round trip."""
+        values = {
+            f"{ROLE_PERMISSIONS_KEY}:{role_id}": json.dumps(sorted(role_perms))
+            for role_id, role_perms in perms.items()
+        }
+        async with cache.pipeline(transaction=False) as pipe:
+            for key, value in values.items():
+                await pipe.set(key, value, ex=ROLE_PERMISSIONS_TTL)
+            await pipe.execute()
+        if self._local is not None:
+            for key, value in values.items():
+                self._local.set(key, value)
+
+    async def _get(self, cache: Redis, key: str) -> str | None:
+        """Get a value, trying the in-process cache before Redis."""
+        if self._local is not None:
+            value = self._local.get(key)
+            if value is not None:
+                return value
+
+        value = await cache.get(key)
+        if value is not None and self._local is not None:
+            self._local.set(key, value)
+        return value
+
+    async def _set(self, cache: Redis, key: str, value: str, ex: int | None = None):
+        """Set a value in Redis and in the in-process cache."""
+        await cache.set(key, value, ex=ex)
+        if self._local is not None:
+            self._local.set(key, value)
 
-    async def on_forum_read(self, cache: Redis, forum_id: int) -> tuple[int, int]:
+    async def warmup(
+        self, cache: Redis, db_session: AsyncSession, lock_ttl: int
+    ) -> bool:
         """
-        Read cache for a single forum.
-        Returns the total posts and the number of threads.
+        Load the counters from the database unless they already are in Redis.
+        Only the worker holding the warmup lock loads them, the others skip it.
+        The version marker is set once loaded, and is gone if Redis was flushed.
+
+        Warmup runs while the outbox relay applies increments. An increment
+        landing between the read of a count and its MSET is overwritten, and
+        one for a post committed before the read but relayed after it counts
+        twice. The loaded keys are marked as reconciler suspects, so the
+        reconciler checks them on its next passes and repairs this drift.
+
+        Returns True if this worker loaded the counters.
         """
-        async with cache.pipeline(transaction=False) as pipe:
-            await pipe.get(f"{NUM_POSTS_PER_FORUM}:{forum_id}")
-            await pipe.get(f"{NUM_THREADS_PER_FORUM}:{forum_id}")
-            res = await pipe.execute()
-        return (res[0] or 0, res[1] or 0)
+        if await cache.get(COUNTERS_VERSION_KEY) == COUNTERS_VERSION:
+            log.info("Cache counters are up to date, skipping warmup")
+            return False
 
-    async def get_user_total_posts(self, cache: Redis, user_id: int) -> int | None:
-        """Get the total number of posts of a user."""
-        return await cache.get(f"{NUM_POSTS_PER_USER}:{user_id}")
+        token = uuid4().hex
+        if not await cache.set(WARMUP_LOCK_KEY, token, nx=True, ex=lock_ttl):
+            log.info("Cache warmup already running in another worker")
+            return False
+        try:
+            # Another worker may have finished while this one took the lock
+            if await cache.get(COUNTERS_VERSION_KEY) == COUNTERS_VERSION:
+                return False
+            await self.load_from_db(cache, db_session)
+            await cache.set(COUNTERS_VERSION_KEY, COUNTERS_VERSION)
+            log.info("Cache counters loaded from database")
+            return True
+        finally:
+            await self._release_lock(cache, WARMUP_LOCK_KEY, token)
+
+    async def _release_lock(self, cache: Redis, key: str, token: str):
+        """Delete a lock, unless it expired and was taken by someone else."""
+        async with cache.pipeline() as pipe:
+            try:
+                await pipe.watch(key)
+                if await pipe.get(key) == token:
+                    pipe.multi()
+                    pipe.delete(key)
+                    await pipe.execute()
+            except WatchError:
+                pass
 
     async def load_from_db(self, cache: Redis, db_session: AsyncSession):
         """Load cache with data from the database."""
@@ -99,44 +277,45 @@ class CacheRepository:
 
     async def _load_threads(self, cache: Redis, db_session: AsyncSession):
         """Load thread count per forum from database to cache."""
-        stmt = select(Thread.forum_id, func.count().label("n_threads")).group_by(
-            Thread.forum_id
-        )
-        res = await db_session.execute(stmt)
-
-        async with cache.pipeline() as pipe:
-            for row in res.all():
-                await pipe.set(f"{NUM_THREADS_PER_FORUM}:{row.forum_id}", row.n_threads)
-            await pipe.execute()
+        stmt = select(Thread.forum_id, func.count()).group_by(Thread.forum_id)
+        await self._load_counts(cache, db_session, stmt, NUM_THREADS_PER_FORUM)
 
     async def _load_posts(self, cache: Redis, db_session: AsyncSession):
         """Load post count per forum from database to cache."""
         stmt = (
-            select(Thread.forum_id, func.count().label("n_posts"))
+            select(Thread.forum_id, func.count())
             .select_from(Post)
             .join(Thread)
             .group_by(Thread.forum_id)
         )
-
-        res = await db_session.execute(stmt)
-
-        async with cache.pipeline() as pipe:
-            for row in res.all():
-                await pipe.set(f"{NUM_POSTS_PER_FORUM}:{row.forum_id}", row.n_posts)
-            await pipe.execute()
+        await self._load_counts(cache, db_session, stmt, NUM_POSTS_PER_FORUM)
 
     async def _load_user_posts(self, cache: Redis, db_session: AsyncSession):
         """Load post count per user from database to cache."""
-        stmt = select(Post.author_id, func.count().label("n_posts")).group_by(
-            Post.author_id
-        )
+        stmt = select(Post.author_id, func.count()).group_by(Post.author_id)
+        await self._load_counts(cache, db_session, stmt, NUM_POSTS_PER_USER)
 
-        res = await db_session.execute(stmt)
-
-        async with cache.pipeline() as pipe:
-            for row in res.all():
-                await pipe.set(f"{NUM_POSTS_PER_USER}:{row.author_id}", row.n_posts)
-            await pipe.execute()
+    async def _load_counts(
+        self, cache: Redis, db_session: AsyncSession, stmt: Select, prefix: str
+    ):
+        """
+        Load (id, count) rows into `prefix:id` keys, marked as reconciler suspects.
+        Rows are streamed from a server-side cursor and written with one MSET
+        per chunk, so memory does not grow with the number of rows.
+        """
+        res = await db_session.stream(stmt.execution_options(yield_per=LOAD_CHUNK_SIZE))
+        async for rows in res.partitions():
+            counts = {f"{prefix}:{id}": count for id, count in rows}
+            async with cache.pipeline(transaction=False) as pipe:
+                pipe.mset(counts)
+                pipe.hset(
+                    RECONCILE_SUSPECTS_KEY,
+                    mapping=dict.fromkeys(counts, SUSPECT_LOADED),
+                )
+                await pipe.execute()
 
 
-cache_repo = CacheRepository()
+cache_repo = CacheRepository(
+    local_cache if settings.LOCAL_CACHE_ENABLED else None,
+    write_behind if settings.WRITE_BEHIND_ENABLED else None,
+)
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+
+from redis.asyncio import Redis
+
+from forum.config import settings
+
+log = logging.getLogger(__name__)
+
+
+class WriteBehindCounters:
+    """
+    Per-worker buffer of counter increments, written to Redis every `window`.
+    Increments of the same key are summed, and each flush sends one INCRBY
+    per changed key in a single pipeline.
+
+    Increments still buffered when a worker dies are lost, the counter
+    reconciliation repairs them. Events relayed from the outbox are never
+    buffered, their rows are gone once applied.
+    """
+
+    def __init__(self, window: float) -> None:
+        self.window = window
+        self._pending: defaultdict[str, int] = defaultdict(int)
+        self.increments = 0
+        self.flushes = 0
+        self.keys_flushed = 0
+        self.flush_time = 0.0
+        self.max_flush_time = 0.0
+        self.last_flush_time = 0.0
+
+    def incr(self, key: str, amount: int = 1):
+        """Buffer an increment, negative to decrement."""
+        self._pending[key] += amount
+        self.increments += 1
+
+    def clear(self):
+        """Drop every buffered increment."""
+        self._pending.clear()
+
+    async def flush(self, cache: Redis) -> int:
+        """Write the buffered increments. Returns the number of keys written."""
+        pending, self._pending = self._pending, defaultdict(int)
+        deltas = {key: amount for key, amount in pending.items() if amount}
+        if not deltas:
+            return 0
+
+        start = time.perf_counter()
+        try:
+            async with cache.pipeline(transaction=False) as pipe:
+                for key, amount in deltas.items():
+                    pipe.incrby(key, amount)
+                await pipe.execute()
+        except BaseException:
+            # Kept for the next flush
+            for key, amount in deltas.items():
+                self._pending[key] += amount
+            raise
+
+        elapsed = time.perf_counter() - start
+        self.flushes += 1
+        self.keys_flushed += len(deltas)
+        self.flush_time += elapsed
+        self.max_flush_time = max(self.max_flush_time, elapsed)
+        self.last_flush_time = elapsed
+        return len(deltas)
+
+    async def run(self, cache: Redis):
+        """Flush every window until cancelled."""
+        while True:
+            await asyncio.sleep(self.window)
+            try:
+                await self.flush(cache)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f"Failed to flush counter increments: {e}")
+
+    def get_stats(self) -> dict:
+        """Buffer and flush latency stats of this worker."""
+        return {
+            "pid": os.getpid(),
+            "pending": len(self._pending),
+            "increments": self.increments,
+            "flushes": self.flushes,
+            "keys_flushed": self.keys_flushed,
+            "avg_flush_ms": (
+                self.flush_time / self.flushes * 1000 if self.flushes else 0.0
+            ),
+            "max_flush_ms": self.max_flush_time * 1000,
+            "last_flush_ms": self.last_flush_time * 1000,
+        }
+
+
+write_behind = WriteBehindCounters(settings.WRITE_BEHIND_WINDOW)
@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from forum.auth.dependencies import get_admin_user
 from forum.category.exceptions import CategoryAlreadyExists
 from forum.category.schemas import CategoryCreate, CategoryPagination, CategoryRead
-from forum.database.core import DbSession
+from forum.database.core import DbSession, ReadDbSession
 from forum.category.service import category_service as cat_srvc
 
 log = logging.getLogger(__name__)
@@ -36,7 +36,7 @@ async def create_category(db_session: DbSession, category_in: CategoryCreate):
 
 
 @category_router.get("/", response_model=CategoryPagination)
-async def get_categories(db_session: DbSession):
+async def get_categories(db_session: ReadDbSession):
     """Get list of categories."""
     try:
         cats = await cat_srvc.list(db_session)
@@ -3,16 +3,21 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import delete, func, select
 
+from forum.cache.repository import FORUM_INDEX_CHANGED
 from forum.category.exceptions import CategoryAlreadyExists
 from forum.category.models import Category
 from forum.category.schemas import CategoryCreate
+from forum.outbox.service import outbox
 
 log = logging.getLogger(__name__)
 
 
 class CategoryService:
     async def create(self, session: AsyncSession, data_in: CategoryCreate) -> Category:
-        """Create a new Category in the database."""
+        """
+        Create a new Category in the database.
+        The cached forum index is dropped once committed.
+        """
         try:
             if data_in.order is None:
                 max_order = await session.scalar(func.max(Category.order))
@@ -21,6 +26,7 @@ class CategoryService:
             session.add(category)
             await session.flush()
             await session.refresh(category)
+            outbox.add(session, FORUM_INDEX_CHANGED)
             return category
         except IntegrityError:
             # TODO: Check if its the category name is in conflict or the order
@@ -40,10 +46,14 @@ class CategoryService:
             raise
 
     async def delete(self, session: AsyncSession, id: int):
-        """Delete a Category from the database."""
+        """
+        Delete a Category from the database.
+        The cached forum index is dropped once committed.
+        """
         try:
             st = delete(Category).where(Category.id == id)
             await session.execute(st)
+            outbox.add(session, FORUM_INDEX_CHANGED)
         except Exception as e:
             log.error(f"Unexpected error when DELETING category with ID={id}: {e}")
             raise
@@ -1,7 +1,5 @@
 from typing import Literal
-from urllib.parse import quote
 
-import boto3
 from pydantic import PostgresDsn, computed_field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -22,9 +20,49 @@ class Settings(BaseSettings):
     POSTGRES_PORT: int = 5432
     POSTGRES_DB: str = ""
 
+    # Read replica, reads go to the primary when no host is set
+    POSTGRES_REPLICA_HOST: str = ""
+    POSTGRES_REPLICA_PORT: int = 5432
+    REPLICA_MAX_LAG: float = 5  # seconds
+    REPLICA_LAG_CHECK_INTERVAL: float = 5  # seconds
+    READ_YOUR_WRITES_WINDOW: int = 10  # seconds
+
+    # Connection pool, per worker
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # seconds
+    DB_POOL_RECYCLE: int = 30 * 60  # seconds
+    DB_POOL_PRE_PING: bool = False  # a round trip per checkout
+
     REDIS_HOST: str = "127.0.0.1"
     REDIS_PORT: int = 6379
 
+    # In-process cache in front of Redis, one per worker
+    LOCAL_CACHE_ENABLED: bool = True
+    LOCAL_CACHE_MAX_SIZE: int = 1024  # entries
+    LOCAL_CACHE_TTL: int = 30  # seconds
+
+    # Counters are loaded by a single worker per deploy, holding a lock this long
+    CACHE_WARMUP_LOCK_TTL: int = 10 * 60  # seconds
+    # Cached counters checked against the database, per pass and across workers
+    RECONCILE_BATCH_SIZE: int = 500  # forums and users
+    RECONCILE_INTERVAL: int = 60  # seconds
+    # Counter increments buffered per worker and written together, every window
+    WRITE_BEHIND_ENABLED: bool = True
+    WRITE_BEHIND_WINDOW: float = 0.05  # seconds
+
+    # Cache side effects relayed from the outbox table after commit
+    OUTBOX_BATCH_SIZE: int = 500  # events
+    OUTBOX_RELAY_INTERVAL: float = 1  # seconds, when not woken up by a commit
+
+    # Threads hashing passwords, caps concurrent argon2 hashes per worker
+    PASSWORD_HASH_WORKERS: int = 4
+
+    # Failed logins allowed in a sliding window before rejecting attempts
+    LOGIN_MAX_FAILURES_PER_USERNAME: int = 5
+    LOGIN_MAX_FAILURES_PER_IP: int = 50
+    LOGIN_FAILURES_WINDOW: int = 15 * 60  # seconds
+
     ENVIRONMENT: Literal["development", "production"] = "development"
 
     CORS: list[str] = ["*"]
@@ -39,34 +77,32 @@ class Settings(BaseSettings):
     def DATABASE_URI(self) -> PostgresDsn:
         """
         Construct PostgreSQL connection URI.
+        Outside of development the password is an RDS IAM auth token,
+        provided to each new connection, see forum.database.iam.
         """
-        if self.is_development:
-            return PostgresDsn.build(
-                scheme="postgresql+psycopg",
-                username=self.POSTGRES_USER,
-                password=self.POSTGRES_PWD,
-                host=self.POSTGRES_HOST,
-                port=self.POSTGRES_PORT,
-                path=self.POSTGRES_DB,
-            )
-        auth_token = boto3.client(
-            "rds", region_name=self.AWS_REGION_NAME
-        ).generate_db_auth_token(
-            DBHostname=self.POSTGRES_HOST,
-            Port=self.POSTGRES_PORT,
-            DBUsername=self.POSTGRES_USER,
-            Region=self.AWS_REGION_NAME,
-        )
-
         return PostgresDsn.build(
             scheme="postgresql+psycopg",
             username=self.POSTGRES_USER,
-            password=quote(auth_token, safe=""),
+            password=self.POSTGRES_PWD if self.is_development else None,
             host=self.POSTGRES_HOST,
             port=self.POSTGRES_PORT,
             path=self.POSTGRES_DB,
         )
 
+    @property
+    def DATABASE_REPLICA_URI(self) -> PostgresDsn | None:
+        """Construct the read replica connection URI, None without a replica."""
+        if not self.POSTGRES_REPLICA_HOST:
+            return None
+        return PostgresDsn.build(
+            scheme="postgresql+psycopg",
+            username=self.POSTGRES_USER,
+            password=self.POSTGRES_PWD if self.is_development else None,
+            host=self.POSTGRES_REPLICA_HOST,
+            port=self.POSTGRES_REPLICA_PORT,
+            path=self.POSTGRES_DB,
+        )
+
     @property
     def is_development(self):
         return self.ENVIRONMENT == "development"
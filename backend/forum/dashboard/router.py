@@ -2,8 +2,14 @@ import logging
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 
 from forum.auth.dependencies import get_moderator_user
-from forum.dashboard.schemas import DashboardStats
-from forum.database.core import DbSession
+from forum.dashboard.schemas import (
+    CounterStats,
+    DashboardStats,
+    LoginStats,
+    PoolStats,
+    WriteBehindStats,
+)
+from forum.database.core import ReadDbSession
 from forum.dashboard.service import dash_service as srvc
 
 
@@ -15,7 +21,7 @@ log = logging.getLogger(__name__)
 @dashboard_router.get(
     "/", response_model=DashboardStats, dependencies=[Depends(get_moderator_user)]
 )
-async def get_stats(db_session: DbSession, request: Request):
+async def get_stats(db_session: ReadDbSession, request: Request):
     try:
         return await srvc.get_stats(db_session, request.app.state.cache)
     except Exception:
@@ -23,3 +29,62 @@ async def get_stats(db_session: DbSession, request: Request):
         raise HTTPException(
             status.HTTP_500_INTERNAL_SERVER_ERROR, "An unexpected error occurred"
         )
+
+
+@dashboard_router.get(
+    "/login", response_model=LoginStats, dependencies=[Depends(get_moderator_user)]
+)
+async def get_login_stats(request: Request):
+    try:
+        return await srvc.get_login_stats(request.app.state.cache)
+    except Exception:
+        log.error("failed to get login stats", exc_info=True)
+        raise HTTPException(
+            status.HTTP_500_INTERNAL_SERVER_ERROR, "An unexpected error occurred"
+        )
+
+
+@dashboard_router.get(
+    "/counters",
+    response_model=CounterStats,
+    dependencies=[Depends(get_moderator_user)],
+)
+async def get_counter_stats(request: Request):
+    """Drift found and repaired in the cached counters, across workers."""
+    try:
+        return await srvc.get_counter_stats(request.app.state.cache)
+    except Exception:
+        log.error("failed to get counter stats", exc_info=True)
+        raise HTTPException(
+            status.HTTP_500_INTERNAL_SERVER_ERROR, "An unexpected error occurred"
+        )
+
+
+@dashboard_router.get(
+    "/pool", response_model=PoolStats, dependencies=[Depends(get_moderator_user)]
+)
+async def get_pool_stats():
+    """Database connection pools of the worker answering the request."""
+    try:
+        return srvc.get_pool_stats()
+    except Exception:
+        log.error("failed to get pool stats", exc_info=True)
+        raise HTTPException(
+            status.HTTP_500_INTERNAL_SERVER_ERROR, "An unexpected error occurred"
+        )
+
+
+@dashboard_router.get(
+    "/write-behind",
+    response_model=WriteBehindStats,
+    dependencies=[Depends(get_moderator_user)],
+)
+async def get_write_behind_stats():
+    """Buffered counter increments of the worker answering the request."""
+    try:
+        return srvc.get_write_behind_stats()
+    except Exception:
+        log.error("failed to get write-behind stats", exc_info=True)
+        raise HTTPException(
+            status.HTTP_500_INTERNAL_SERVER_ERROR, "An unexpected error occurred"
+        )
@@ -12,3 +12,54 @@ class DashboardStats(BaseModel):
     n_threads: int
     n_posts: int
     recent_users: list[UserRead]
+
+
+class LoginStats(BaseModel):
+    """Pydantic schema for login throttling counters."""
+
+    attempts: int = 0
+    failures: int = 0
+    rejected_username: int = 0
+    rejected_ip: int = 0
+
+
+class PoolStats(BaseModel):
+    """
+    Pydantic schema for the database connection pool of a worker.
+    The replica pool is included when a replica is configured.
+    """
+
+    pid: int
+    size: int
+    checked_out: int
+    idle: int
+    overflow: int
+    checkouts: int
+    timeouts: int
+    avg_wait_ms: float
+    max_wait_ms: float
+    replica: "PoolStats | None" = None
+
+
+class WriteBehindStats(BaseModel):
+    """Pydantic schema for the buffered counter increments of a worker."""
+
+    pid: int
+    pending: int
+    increments: int
+    flushes: int
+    keys_flushed: int
+    avg_flush_ms: float
+    max_flush_ms: float
+    last_flush_ms: float
+
+
+class CounterStats(BaseModel):
+    """Pydantic schema for the reconciliation of the cached counters."""
+
+    passes: int = 0
+    checked: int = 0
+    suspected: int = 0
+    drifted: int = 0
+    drift: int = 0
+    repaired: int = 0
@@ -5,9 +5,21 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import func, select
 
 from forum.auth.models import User
+from forum.auth.throttling import login_throttle
 from forum.cache.repository import cache_repo
+from forum.cache.write_behind import write_behind
 from forum.category.models import Category
-from forum.dashboard.schemas import DashboardStats
+from forum.cache.reconcile import counter_reconciler
+from forum.config import settings
+from forum.dashboard.schemas import (
+    CounterStats,
+    DashboardStats,
+    LoginStats,
+    PoolStats,
+    WriteBehindStats,
+)
+from forum.database.core import get_engine, get_replica_engine
+from forum.database.pool import get_pool_stats
 from forum.forum.models import Forum
 from forum.post.models import Post
 from forum.thread.models import Thread
@@ -37,5 +49,28 @@ class DashboardService:
             recent_users=users,
         )
 
+    async def get_login_stats(self, cache: Redis) -> LoginStats:
+        """Get login throttling counters."""
+        return LoginStats(**await login_throttle.get_stats(cache))
+
+    async def get_counter_stats(self, cache: Redis) -> CounterStats:
+        """Get the drift found and repaired in the cached counters."""
+        return CounterStats(**await counter_reconciler.get_stats(cache))
+
+    def get_write_behind_stats(self) -> WriteBehindStats:
+        """Get the buffered counter increments and flush latency of this worker."""
+        return WriteBehindStats(**write_behind.get_stats())
+
+    def get_pool_stats(self) -> PoolStats:
+        """
+        Get the database connection pool stats of this worker, with the
+        replica pool when a replica is configured.
+        """
+        stats = PoolStats(**get_pool_stats(get_engine().pool))  # type: ignore
+        if settings.DATABASE_REPLICA_URI is not None:
+            replica_pool = get_replica_engine().pool
+            stats.replica = PoolStats(**get_pool_stats(replica_pool))  # type: ignore
+        return stats
+
 
 dash_service = DashboardService()
@@ -3,13 +3,17 @@ import logging
 from datetime import datetime
 from typing import Annotated, AsyncGenerator
 
-from fastapi import Depends
+from fastapi import Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import Mapped, declarative_base, mapped_column
+from sqlalchemy import event
+from sqlalchemy.orm import Mapped, Session, declarative_base, mapped_column
 from sqlalchemy.sql import func
 from sqlalchemy.types import DateTime
 
 from forum.config import settings
+from forum.database.pool import TimedQueuePool
+from forum.database.replica import use_primary
+from forum.exceptions import ReadOnlySessionWrite
 
 Base = declarative_base()
 
@@ -17,6 +21,29 @@ log = logging.getLogger(__name__)
 
 _engine = None
 _sessionlocal = None
+_replica_engine = None
+_read_sessionlocals: dict[tuple[bool, bool], async_sessionmaker[AsyncSession]] = {}
+
+
+def _create_engine(uri: str, replica: bool = False):
+    """Create an engine with the configured pool, authenticated with IAM outside development."""
+    pool = {
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if settings.is_development:
+        return create_async_engine(uri, **pool)
+
+    from forum.database.iam import rds_replica_tokens, rds_tokens, use_iam_auth
+
+    ssl = {"sslmode": "verify-full", "sslrootcert": "/certs/global-bundle.pem"}
+    engine = create_async_engine(uri, connect_args=ssl, **pool)
+    use_iam_auth(engine.sync_engine, rds_replica_tokens if replica else rds_tokens)
+    return engine
 
 
 def get_engine():
@@ -25,14 +52,26 @@ def get_engine():
 
     if _engine is None:
         # First time the engine gets called
-        if settings.is_development:
-            _engine = create_async_engine(str(settings.DATABASE_URI))
-        else:
-            ssl = {"sslmode": "verify-full", "sslrootcert": "/certs/global-bundle.pem"}
-            _engine = create_async_engine(str(settings.DATABASE_URI), connect_args=ssl)
+        _engine = _create_engine(str(settings.DATABASE_URI))
     return _engine
 
 
+def get_replica_engine():
+    """
+    Create the read replica engine only when explicitly called, and reuse it.
+    Returns the primary engine when no replica is configured.
+    """
+    global _replica_engine
+
+    if settings.DATABASE_REPLICA_URI is None:
+        return get_engine()
+    if _replica_engine is None:
+        _replica_engine = _create_engine(
+            str(settings.DATABASE_REPLICA_URI), replica=True
+        )
+    return _replica_engine
+
+
 def get_sessionlocal():
     """Create session only when explicitly called, and reuse it in subsequent calls."""
     global _sessionlocal
@@ -44,6 +83,41 @@ def get_sessionlocal():
     return _sessionlocal
 
 
+class ReadOnlySession(Session):
+    """Session of read-only requests, flushing changes is refused."""
+
+
+@event.listens_for(ReadOnlySession, "before_flush")
+def refuse_flush(session, flush_context, instances):
+    raise ReadOnlySessionWrite("Cannot write in a read-only session")
+
+
+def get_read_sessionlocal(replica: bool = False, autocommit: bool = True):
+    """
+    Create read-only sessions, on the replica or the primary, only when explicitly
+    called, and reuse it in subsequent calls.
+
+    By default their connections run in autocommit, each query is its own
+    transaction and no BEGIN, COMMIT or ROLLBACK is sent. Reads needing one
+    snapshot, or a server-side cursor, ask for transactions opened read-only.
+    Writes are refused by the session either way.
+    """
+    key = (replica, autocommit)
+    if key not in _read_sessionlocals:
+        engine = get_replica_engine() if replica else get_engine()
+        if autocommit:
+            engine = engine.execution_options(isolation_level="AUTOCOMMIT")
+        else:
+            engine = engine.execution_options(postgresql_readonly=True)
+        _read_sessionlocals[key] = async_sessionmaker(
+            engine,
+            class_=AsyncSession,
+            sync_session_class=ReadOnlySession,
+            expire_on_commit=False,
+        )
+    return _read_sessionlocals[key]
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Get database session with auto-commit."""
     session = get_sessionlocal()()
@@ -61,6 +135,40 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
 DbSession = Annotated[AsyncSession, Depends(get_db)]
 
 
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Get read-only database session, without commit.
+    Reads go to the replica, unless it lags behind or the client just wrote.
+    """
+    replica = settings.DATABASE_REPLICA_URI is not None and not await use_primary(
+        request, get_replica_engine()
+    )
+    session = get_read_sessionlocal(replica)()
+    try:
+        yield session
+    finally:
+        # Nothing to commit, closing ends the transaction
+        await session.close()
+
+
+ReadDbSession = Annotated[AsyncSession, Depends(get_read_db)]
+
+
+async def get_primary_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Get read-only database session on the primary, without commit.
+    For reads that are cached, a lagging replica would cache stale data.
+    """
+    session = get_read_sessionlocal()()
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
+PrimaryReadDbSession = Annotated[AsyncSession, Depends(get_primary_read_db)]
+
+
 class TimestampMixin:
     """Timestamp Mixin for created_at and updated_at."""
 
@@ -0,0 +1,82 @@
+import logging
+import threading
+import time
+from functools import partial
+from typing import Callable
+
+import boto3
+from sqlalchemy import Engine, event
+
+from forum.config import settings
+
+log = logging.getLogger(__name__)
+
+# RDS IAM auth tokens are valid for 15 minutes
+TOKEN_TTL = 15 * 60  # seconds
+# Tokens are replaced this long before they expire
+TOKEN_REFRESH_MARGIN = 5 * 60  # seconds
+
+
+def rds_token_provider(host: str, port: int) -> str:
+    """Generate an RDS IAM auth token for the configured database user."""
+    return boto3.client(
+        "rds", region_name=settings.AWS_REGION_NAME
+    ).generate_db_auth_token(
+        DBHostname=host,
+        Port=port,
+        DBUsername=settings.POSTGRES_USER,
+        Region=settings.AWS_REGION_NAME,
+    )
+
+
+class IamTokenCache:
+    """
+    Keep an RDS IAM auth token and replace it before it expires.
+    Every new connection of the pool reuses the same token, so a burst of
+    connections generates a single token instead of one each.
+    """
+
+    def __init__(
+        self,
+        provider: Callable[[], str],
+        ttl: float = TOKEN_TTL,
+        refresh_margin: float = TOKEN_REFRESH_MARGIN,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.provider = provider
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.clock = clock
+        self._token: str | None = None
+        self._refresh_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> str:
+        """Returns a valid token, generating a new one when close to expiring."""
+        with self._lock:
+            if self._token is None or self.clock() >= self._refresh_at:
+                issued_at = self.clock()
+                self._token = self.provider()
+                self._refresh_at = issued_at + self.ttl - self.refresh_margin
+                log.info("Generated a new database auth token")
+            return self._token
+
+
+def use_iam_auth(engine: Engine, tokens: IamTokenCache):
+    """Authenticate every new connection of the engine with a cached token."""
+
+    @event.listens_for(engine, "do_connect")
+    def provide_token(dialect, conn_rec, cargs, cparams):
+        cparams["password"] = tokens.get()
+
+
+rds_tokens = IamTokenCache(
+    partial(rds_token_provider, settings.POSTGRES_HOST, settings.POSTGRES_PORT)
+)
+rds_replica_tokens = IamTokenCache(
+    partial(
+        rds_token_provider,
+        settings.POSTGRES_REPLICA_HOST,
+        settings.POSTGRES_REPLICA_PORT,
+    )
+)
@@ -0,0 +1,54 @@
+import os
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection
+
+
+class PoolWaitStats:
+    """Time spent by checkouts waiting for a usable connection."""
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float):
+        self.checkouts += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool keeping track of how long checkouts wait."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def connect(self) -> PoolProxiedConnection:
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.wait_stats.timeouts += 1
+            raise
+        finally:
+            self.wait_stats.record(time.perf_counter() - start)
+
+
+def get_pool_stats(pool: TimedQueuePool) -> dict:
+    """Returns the state of a pool, for this worker only."""
+    wait = pool.wait_stats
+    return {
+        "pid": os.getpid(),
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "checkouts": wait.checkouts,
+        "timeouts": wait.timeouts,
+        "avg_wait_ms": wait.total_wait / wait.checkouts * 1000 if wait.checkouts else 0,
+        "max_wait_ms": wait.max_wait * 1000,
+    }
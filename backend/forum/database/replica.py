@@ -0,0 +1,89 @@
+import logging
+import math
+import time
+from typing import Callable
+
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from forum.config import settings
+
+log = logging.getLogger(__name__)
+
+PRIMARY_UNTIL_COOKIE = "primary_until"
+
+# Zero when every received WAL record is replayed, otherwise the age of the
+# last replayed transaction
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+class ReplicaLagMonitor:
+    """
+    Tell whether the replica lags too far behind the primary.
+    The lag is measured at most once per interval and per worker.
+    """
+
+    def __init__(
+        self,
+        max_lag: float,
+        interval: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_lag = max_lag
+        self.interval = interval
+        self.clock = clock
+        self.lag = 0.0
+        self._next_check = 0.0
+
+    async def is_lagging(self, engine: AsyncEngine) -> bool:
+        """True if the last measured lag is above the maximum."""
+        if self.clock() >= self._next_check:
+            # Set before measuring so concurrent requests do not measure too
+            self._next_check = self.clock() + self.interval
+            self.lag = await self._measure(engine)
+        return self.lag > self.max_lag
+
+    async def _measure(self, engine: AsyncEngine) -> float:
+        """Returns the replica lag in seconds, infinite if it cannot be measured."""
+        try:
+            async with engine.connect() as conn:
+                lag = await conn.scalar(REPLICA_LAG_QUERY)
+            return float(lag or 0)
+        except Exception as e:
+            log.error(f"Failed to measure replica lag: {e}")
+            return math.inf
+
+
+def mark_recent_write(response: Response):
+    """Send the next reads of this client to the primary, to read its own writes."""
+    until = time.time() + settings.READ_YOUR_WRITES_WINDOW
+    response.set_cookie(
+        PRIMARY_UNTIL_COOKIE,
+        str(int(until)),
+        max_age=settings.READ_YOUR_WRITES_WINDOW,
+        httponly=True,
+        secure=True,
+        samesite="lax",
+    )
+
+
+def has_recent_write(request: Request) -> bool:
+    """True if this client wrote within the read-your-writes window."""
+    try:
+        return float(request.cookies.get(PRIMARY_UNTIL_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+async def use_primary(request: Request, replica: AsyncEngine) -> bool:
+    """True if the reads of a request must go to the primary."""
+    return has_recent_write(request) or await replica_lag.is_lagging(replica)
+
+
+replica_lag = ReplicaLagMonitor(
+    settings.REPLICA_MAX_LAG, settings.REPLICA_LAG_CHECK_INTERVAL
+)
@@ -0,0 +1,6 @@
+class InvalidCursor(Exception):
+    pass
+
+
+class ReadOnlySessionWrite(Exception):
+    pass
@@ -19,6 +19,9 @@ class Forum(Base):
     description: Mapped[str] = mapped_column(String(300), nullable=True)
     order: Mapped[int] = mapped_column(Integer, unique=True, nullable=False)
 
+    # Denormalized from threads, kept up to date by ThreadService
+    thread_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+
     category_id: Mapped[int] = mapped_column(ForeignKey("categories.id"))
     category: Mapped["Category"] = relationship(back_populates="forums")
 
@@ -1,12 +1,12 @@
 import logging
 from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import Response
 
 from forum.auth.dependencies import get_admin_user
-from forum.database.core import DbSession
+from forum.database.core import DbSession, PrimaryReadDbSession
 from forum.forum.exceptions import CategoryDoesNotExist, ForumDoesNotExist
 from forum.forum.schemas import ForumCreate, ForumEdit, ForumPagination, ForumRead
 from forum.forum.service import forum_service as srvc
-from forum.cache.repository import cache_repo
 
 log = logging.getLogger(__name__)
 
@@ -31,19 +31,17 @@ async def create_forum(db_session: DbSession, forum_in: ForumCreate):
 
 
 @forum_router.get("/", response_model=ForumPagination)
-async def list_all_forums(db_session: DbSession, request: Request):
-    """List all forums."""
+async def list_all_forums(db_session: PrimaryReadDbSession, request: Request):
+    """
+    List all forums.
+    The index is rebuilt from the primary on a cache miss, a lagging replica
+    would cache a stale index.
+    """
     cache = request.app.state.cache
     try:
-        forums = await srvc.list(db_session)
-        forums_data = []
-        for forum in forums:
-            forum_read = ForumRead.model_validate(forum, strict=False)
-            forum_read.n_posts, forum_read.n_threads = await cache_repo.on_forum_read(
-                cache, forum_read.id
-            )
-            forums_data.append(forum_read)
-        return ForumPagination(data=forums_data)
+        # Served as is, the index is already encoded
+        index = await srvc.get_index(db_session, cache)
+        return Response(content=index, media_type="application/json")
     except Exception as e:
         log.error(e)
         raise HTTPException(
@@ -1,6 +1,7 @@
 import logging
 
-from sqlalchemy import func
+from redis.asyncio import Redis
+from sqlalchemy import func, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
@@ -10,14 +11,16 @@ from forum.category.models import Category
 from forum.forum.exceptions import CategoryDoesNotExist, ForumDoesNotExist
 from forum.forum.models import Forum
 from forum.forum.schemas import ForumCreate, ForumEdit, ForumRead
-from forum.cache.repository import cache_repo
+from forum.thread.models import Thread
+from forum.cache.repository import FORUM_INDEX_CHANGED, cache_repo
+from forum.outbox.service import outbox
 
 log = logging.getLogger(__name__)
 
 
 class ForumService:
     async def create(self, session: AsyncSession, forum_in: ForumCreate) -> Forum:
-        """Create a new Forum."""
+        """Create a new Forum. The cached index is dropped once committed."""
         category = await session.get(Category, forum_in.category_id)
         if not category:
             raise CategoryDoesNotExist
@@ -31,6 +34,7 @@ class ForumService:
             session.add(forum)
             await session.flush()
             await session.refresh(forum)
+            outbox.add(session, FORUM_INDEX_CHANGED)
 
             # Load Category data
             # PERF: You don't need this query if you the same with
@@ -65,10 +69,36 @@ class ForumService:
             log.error(f"Unexpected error when listing all forums: {e}")
             raise
 
+    async def get_index(self, session: AsyncSession, cache: Redis) -> str:
+        """
+        Get the forum index (all forums with their category) as an encoded
+        JSON body. The index is served from cache and only loaded from the
+        database when it is not cached. Live counters are spliced in.
+        """
+        index = await cache_repo.get_forum_index(cache)
+        if index is None:
+            forums = await self.list(session)
+            data = [ForumRead.model_validate(f, strict=False) for f in forums]
+            ids = [forum.id for forum in data]
+            encoded = [
+                forum.model_dump_json(exclude={"n_posts", "n_threads"})[:-1]
+                for forum in data
+            ]
+            await cache_repo.set_forum_index(cache, ids, encoded)
+        else:
+            ids, encoded = index
+
+        counters = await cache_repo.on_forums_read(cache, ids)
+        data = ",".join(
+            f'{forum},"n_posts":{n_posts},"n_threads":{n_threads}}}'
+            for forum, (n_posts, n_threads) in zip(encoded, counters)
+        )
+        return f'{{"data":[{data}]}}'
+
     async def update(
         self, session: AsyncSession, id: int, forum_in: ForumEdit
     ) -> ForumRead:
-        """Update forum."""
+        """Update forum. The cached index is dropped once committed."""
         forum = await session.get(Forum, id)
         if forum is None:
             raise ForumDoesNotExist
@@ -93,6 +123,7 @@ class ForumService:
             session.add(forum)
             await session.flush()
             await session.refresh(forum)
+            outbox.add(session, FORUM_INDEX_CHANGED)
             # For some reason this is needed here
             forum.category = category
             return forum
@@ -100,5 +131,20 @@ class ForumService:
             log.error(f"Unexpected error when updating forum {id}: {e}")
             raise
 
+    async def rebuild_counters(self, session: AsyncSession):
+        """Rebuild the denormalized thread counter of every forum from the threads."""
+        n_threads = (
+            select(func.count())
+            .select_from(Thread)
+            .where(Thread.forum_id == Forum.id)
+            .scalar_subquery()
+        )
+        st = update(Forum).values(thread_count=n_threads)
+        try:
+            await session.execute(st, execution_options={"synchronize_session": False})
+        except Exception as e:
+            log.error(f"Unexpected error when rebuilding forum counters: {e}")
+            raise
+
 
 forum_service = ForumService()
@@ -1,21 +1,39 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import redis.asyncio as redis
 
 from forum.api import api_router
 from forum.auth import utils
+from forum.auth.models import hash_executor
+from forum.auth.service import auth as auth_service
 from forum.config import settings
-from forum.database.core import get_sessionlocal
+from forum.database.core import get_read_sessionlocal, get_sessionlocal
+from forum.database.replica import mark_recent_write
+from forum.outbox.service import outbox
 from forum.cache.core import get_cache_pool
+from forum.cache.local import local_cache
+from forum.cache.reconcile import counter_reconciler
+from forum.cache.write_behind import write_behind
 from forum.cache.repository import cache_repo
 
 logging.basicConfig(level=logging.DEBUG)
 log = logging.getLogger(__name__)
 
 
+async def warm_cache(cache: redis.Redis):
+    """Load the cache counters, once per deploy across workers."""
+    try:
+        # Counters are streamed from a server-side cursor, inside a transaction
+        async with get_read_sessionlocal(autocommit=False)() as session:
+            await cache_repo.warmup(cache, session, settings.CACHE_WARMUP_LOCK_TTL)
+    except Exception as e:
+        log.error(f"Cache warmup failed: {e}", exc_info=True)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     log.info("Starting Forum API")
@@ -23,14 +41,37 @@ async def lifespan(app: FastAPI):
     app.state.cache = redis.Redis(connection_pool=get_cache_pool())
     async with get_sessionlocal()() as session:
         await utils.init_roles(session)
-        # Load cache from database
-        await cache_repo.load_from_db(app.state.cache, session)
+        await utils.init_permissions(session)
+        await auth_service.warm_permissions(session, app.state.cache)
+    # Load counters from database while serving
+    warmup = asyncio.create_task(warm_cache(app.state.cache))
+    relay = asyncio.create_task(outbox.run(app.state.cache, get_sessionlocal()))
+    reconciliation = asyncio.create_task(
+        counter_reconciler.run(app.state.cache, get_read_sessionlocal())
+    )
+
+    if settings.LOCAL_CACHE_ENABLED:
+        invalidations = asyncio.create_task(local_cache.listen(app.state.cache))
+    if settings.WRITE_BEHIND_ENABLED:
+        counters = asyncio.create_task(write_behind.run(app.state.cache))
 
     # before
     yield
     # after
 
+    warmup.cancel()
+    reconciliation.cancel()
+    relay.cancel()
+    if settings.LOCAL_CACHE_ENABLED:
+        invalidations.cancel()
+    if settings.WRITE_BEHIND_ENABLED:
+        # The relay may still buffer increments until it is stopped
+        counters.cancel()
+        await asyncio.gather(relay, counters, return_exceptions=True)
+        flushed = await write_behind.flush(app.state.cache)
+        log.info(f"Flushed {flushed} buffered counters")
     await app.state.cache.close()
+    hash_executor.shutdown(wait=False, cancel_futures=True)
     log.info("Forum API stopped")
 
 
@@ -46,6 +87,19 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    """Keep the reads of a client on the primary for a while after it writes."""
+    response = await call_next(request)
+    if (
+        settings.DATABASE_REPLICA_URI is not None
+        and request.method not in ("GET", "HEAD", "OPTIONS")
+        and response.status_code < 400
+    ):
+        mark_recent_write(response)
+    return response
+
+
 @app.get("/healthcheck")
 def healthcheck():
     return {"status": "ok", "environment": settings.ENVIRONMENT}
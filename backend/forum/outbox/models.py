@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+from sqlalchemy.types import JSON, DateTime, String
+
+from forum.database.core import Base
+
+
+class OutboxEvent(Base):
+    """
+    SQLAlchemy model for a cache event, written in the transaction of the
+    change it follows and applied to the cache once committed.
+    """
+
+    __tablename__ = "cache_outbox"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)
+    payload: Mapped[dict[str, Any]] = mapped_column(JSON, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(True), server_default=func.now()
+    )
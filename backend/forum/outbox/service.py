@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from typing import Any
+
+from redis.asyncio import Redis
+from sqlalchemy import delete, event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from forum.cache.repository import cache_repo
+from forum.config import settings
+from forum.outbox.models import OutboxEvent
+
+log = logging.getLogger(__name__)
+
+OUTBOX_INFO_KEY = "outbox"
+
+
+class OutboxService:
+    """
+    Transactional outbox of the cache side effects.
+
+    Events are written in the session of the request, so they are committed
+    or rolled back with the change they follow. A relay in every worker
+    applies committed events to the cache in batches, and is woken up as soon
+    as a session of its worker commits events. Rows are claimed with
+    SKIP LOCKED so workers relay different batches.
+
+    Events are applied before their rows are deleted, an event may be applied
+    twice if the relay fails in between, never lost. Counter increments are
+    written to Redis directly, not to the write-behind buffer of the worker.
+    """
+
+    def __init__(self, batch_size: int, interval: float) -> None:
+        self.batch_size = batch_size
+        self.interval = interval
+        self._wake = asyncio.Event()
+
+    def add(
+        self, session: AsyncSession, kind: str, payload: dict[str, Any] | None = None
+    ):
+        """Add a cache event to the transaction of the session."""
+        session.add(OutboxEvent(kind=kind, payload=payload or {}))
+        session.info[OUTBOX_INFO_KEY] = True
+
+    def wake(self):
+        """Relay the committed events without waiting for the next interval."""
+        self._wake.set()
+
+    async def relay(self, session: AsyncSession, cache: Redis) -> int:
+        """Apply a batch of events and delete them. Returns the number of events."""
+        events = (
+            await session.scalars(
+                select(OutboxEvent)
+                .order_by(OutboxEvent.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+        ).all()
+        if not events:
+            return 0
+        await cache_repo.apply_events(
+            cache, [(e.kind, e.payload) for e in events], buffered=False
+        )
+        await session.execute(
+            delete(OutboxEvent).where(OutboxEvent.id.in_([e.id for e in events]))
+        )
+        return len(events)
+
+    async def run(self, cache: Redis, sessionlocal: async_sessionmaker[AsyncSession]):
+        """Relay events as they are committed, until cancelled."""
+        while True:
+            n_events = 0
+            try:
+                async with sessionlocal() as session:
+                    n_events = await self.relay(session, cache)
+                    await session.commit()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f"Failed to relay cache events: {e}", exc_info=True)
+
+            # A full batch means more events are waiting
+            if n_events < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.interval)
+                except TimeoutError:
+                    pass
+                self._wake.clear()
+
+
+outbox = OutboxService(settings.OUTBOX_BATCH_SIZE, settings.OUTBOX_RELAY_INTERVAL)
+
+
+@event.listens_for(Session, "after_commit")
+def wake_relay(session: Session):
+    if session.info.pop(OUTBOX_INFO_KEY, False):
+        outbox.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_events(session: Session):
+    session.info.pop(OUTBOX_INFO_KEY, None)
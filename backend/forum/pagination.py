@@ -0,0 +1,60 @@
+from typing import Any, Callable, Sequence, TypeVar
+
+from sqlalchemy import ScalarSelect, Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from forum.schemas import Cursor
+
+T = TypeVar("T")
+C = TypeVar("C", bound=Cursor)
+
+
+def keyset_page(
+    rows: Sequence[T],
+    limit: int,
+    cursor: C | None,
+    key: Callable[[T], C],
+) -> tuple[list[T], C | None, C | None]:
+    """
+    Build a keyset page from `rows`, fetched with `limit + 1` in the
+    direction of `cursor`. The extra row only tells if there is more.
+    Returns the page in display order, the next and the previous cursor.
+    """
+    has_more = len(rows) > limit
+    page = list(rows[:limit])
+    backwards = cursor is not None and cursor.backwards
+    if backwards:
+        page.reverse()
+
+    if not page:
+        return page, None, None
+
+    first = key(page[0])
+    first.backwards = True
+    last = key(page[-1])
+
+    if backwards:
+        return page, last, first if has_more else None
+    return page, last if has_more else None, first if cursor is not None else None
+
+
+async def fetch_with_total(
+    session: AsyncSession,
+    st: Select,
+    total: ScalarSelect,
+    missing: type[Exception],
+) -> tuple[list[Any], int]:
+    """
+    Run the listing `st` with the scalar subquery `total` as an extra column,
+    so rows and total come back in a single round trip.
+    `total` is only queried on its own when there are no rows, raising
+    `missing` if the parent it counts from does not exist.
+    """
+    rows = (await session.execute(st.add_columns(total))).all()
+    if rows:
+        return [row[0] for row in rows], rows[0][1]
+
+    count = await session.scalar(total.element)
+    if count is None:
+        raise missing
+    return [], count
@@ -1,5 +1,5 @@
 from typing import TYPE_CHECKING
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.types import Text
 from forum.database.core import Base, TimestampMixin
@@ -13,9 +13,15 @@ class Post(Base, TimestampMixin):
     """SQLAlchemy model for a Post."""
 
     __tablename__ = "posts"
+    __table_args__ = (
+        Index("ix_posts_thread_id_created_at_id", "thread_id", "created_at", "id"),
+        Index("ix_posts_author_id", "author_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     content: Mapped[str] = mapped_column(Text, nullable=False)
+    # 1-based rank in the thread, kept dense by PostService
+    position: Mapped[int] = mapped_column(default=0, server_default="0")
 
     author_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     author: Mapped["User"] = relationship(back_populates="posts")
@@ -1,13 +1,20 @@
 import logging
 import math
 
-from fastapi import APIRouter, HTTPException, Request, status
+from fastapi import APIRouter, HTTPException, status
 from pydantic.types import PositiveInt
 
 from forum.auth.dependencies import CurrentUser
-from forum.database.core import DbSession
+from forum.database.core import DbSession, ReadDbSession
+from forum.exceptions import InvalidCursor
 from forum.post.exceptions import PostDoesNotExist, PostNotOwner, ThreadIsLocked
-from forum.post.schemas import PostCreate, PostEditUser, PostPagination, PostRead
+from forum.post.schemas import (
+    PostCreate,
+    PostCursor,
+    PostEditUser,
+    PostPagination,
+    PostRead,
+)
 from forum.post.service import post_service as srvc
 from forum.thread.exception import ThreadDoesNotExist
 from forum.thread.router import thread_router
@@ -20,15 +27,12 @@ post_router = APIRouter(prefix="/posts", tags=["posts"])
 @post_router.post("/", response_model=PostRead)
 async def create_post(
     db_session: DbSession,
-    request: Request,
     current_user: CurrentUser,
     post_in: PostCreate,
 ):
     """Create a post under a thread"""
     try:
-        post = await srvc.create(
-            db_session, request.app.state.cache, post_in, current_user
-        )
+        post = await srvc.create(db_session, post_in, current_user)
         return post
 
     except ThreadDoesNotExist:
@@ -46,11 +50,39 @@ async def create_post(
 
 @thread_router.get("/{id}/posts", response_model=PostPagination)
 async def list_thread_posts(
-    db_session: DbSession, id: int, page: PositiveInt = 1, limit: PositiveInt = 10
+    db_session: ReadDbSession,
+    id: int,
+    page: PositiveInt = 1,
+    limit: PositiveInt = 10,
+    cursor: str | None = None,
+    post_id: int | None = None,
 ):
-    """List all posts in a thread."""
+    """
+    List all posts in a thread.
+    When `post_id` is given, the page containing that post is returned.
+    Otherwise when `cursor` is given, keyset pagination is used and `page` is ignored.
+    """
     try:
-        posts, total_items = await srvc.list_posts(db_session, id, page, limit)
+        if post_id is not None:
+            posts, total_items, page, next_cursor, prev_cursor = (
+                await srvc.list_posts_around(db_session, id, post_id, limit)
+            )
+        elif cursor is not None:
+            posts, total_items, next_cursor, prev_cursor = (
+                await srvc.list_posts_by_cursor(
+                    db_session, id, limit, PostCursor.decode(cursor)
+                )
+            )
+            page = None
+        else:
+            posts, total_items = await srvc.list_posts(db_session, id, page, limit)
+            next_cursor = prev_cursor = None
+            if posts and page * limit < total_items:
+                next_cursor = srvc.to_cursor(posts[-1])
+            if posts and page > 1:
+                prev_cursor = srvc.to_cursor(posts[0])
+                prev_cursor.backwards = True
+
         posts_data = [PostRead.model_validate(p) for p in posts]
         page_size = len(posts)
         return PostPagination(
@@ -58,8 +90,14 @@ async def list_thread_posts(
             page_size=page_size,
             total_items=total_items,
             total_pages=math.ceil(total_items / limit) if total_items > 0 else 0,
+            next_cursor=next_cursor.encode() if next_cursor else None,
+            prev_cursor=prev_cursor.encode() if prev_cursor else None,
             data=posts_data,
         )
+    except PostDoesNotExist:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Post does not exist")
+    except InvalidCursor:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Invalid cursor.")
     except Exception:
         raise HTTPException(
             status.HTTP_500_INTERNAL_SERVER_ERROR, "An unexpected error occurred"
@@ -88,3 +126,20 @@ async def edit_post(
         raise HTTPException(
             status.HTTP_500_INTERNAL_SERVER_ERROR, "An unexpected error occurred"
         )
+
+
+@post_router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_post(db_session: DbSession, id: int, current_user: CurrentUser):
+    """Delete a post."""
+    try:
+        await srvc.delete(db_session, id, current_user)
+    except PostDoesNotExist:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Post does not exist")
+    except PostNotOwner:
+        raise HTTPException(
+            status.HTTP_401_UNAUTHORIZED, "You can not delete a post you do not own"
+        )
+    except Exception:
+        raise HTTPException(
+            status.HTTP_500_INTERNAL_SERVER_ERROR, "An unexpected error occurred"
+        )
@@ -1,7 +1,7 @@
 from datetime import datetime
 from pydantic import BaseModel, ConfigDict
 
-from forum.schemas import Pagination
+from forum.schemas import Cursor, CursorPagination
 from forum.thread.schemas import Author
 
 
@@ -29,5 +29,11 @@ class PostEditUser(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
-class PostPagination(Pagination):
+class PostCursor(Cursor):
+    """Position of a post in a thread, sorted by creation."""
+
+    created_at: datetime
+
+
+class PostPagination(CursorPagination):
     data: list[PostRead]
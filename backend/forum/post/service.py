@@ -1,43 +1,84 @@
 import logging
 
-from redis.asyncio import Redis
-from sqlalchemy import select
+from sqlalchemy import case, insert, or_, select, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.sql import func
 
 from forum.auth.models import User
+from forum.pagination import fetch_with_total, keyset_page
 from forum.post.exceptions import PostDoesNotExist, PostNotOwner, ThreadIsLocked
+from forum.outbox.service import outbox
 from forum.post.models import Post
-from forum.post.schemas import PostCreate, PostEditUser
+from forum.post.schemas import PostCreate, PostCursor, PostEditUser
 from forum.thread.exception import ThreadDoesNotExist
 from forum.thread.models import Thread
-from forum.cache.repository import cache_repo
+from forum.cache.repository import POST_CREATED, POST_DELETED
 
 log = logging.getLogger(__name__)
 
 
 class PostService:
     async def create(
-        self, session: AsyncSession, cache: Redis, post_in: PostCreate, author: User
+        self, session: AsyncSession, post_in: PostCreate, author: User
     ) -> Post:
-        """Create a post."""
-        thread = await session.get(Thread, post_in.thread_id)
-        if thread is None:
-            raise ThreadDoesNotExist
-        if thread.is_locked:
+        """
+        Create a post.
+        Its position in the thread is the last position of the thread, bumped
+        by the same UPDATE that checks the thread is not locked.
+        """
+        res = (
+            await session.execute(
+                update(Thread)
+                .where(Thread.id == post_in.thread_id, Thread.is_locked.is_(False))
+                .values(
+                    reply_count=Thread.reply_count + 1,
+                    last_position=Thread.last_position + 1,
+                )
+                .returning(Thread.last_position, Thread.forum_id)
+            )
+        ).first()
+        if res is None:
+            is_locked = await session.scalar(
+                select(Thread.is_locked).where(Thread.id == post_in.thread_id)
+            )
+            if is_locked is None:
+                raise ThreadDoesNotExist
             raise ThreadIsLocked
+        position, forum_id = res
 
         try:
-            post = Post(**post_in.model_dump())
-            post.thread = thread
-            post.author = author
+            # One INSERT ... RETURNING instead of add, flush and refresh
+            post = await session.scalar(
+                insert(Post)
+                .values(**post_in.model_dump(), author_id=author.id, position=position)
+                .returning(Post)
+            )
+            set_committed_value(post, "author", author)
 
-            session.add(post)
-            await session.flush()
-            await session.refresh(post)
-            await cache_repo.on_post_created(
-                cache, post.author_id, post.thread.forum_id
+            # Only move forward, a concurrent newer post may have committed first
+            is_newer = or_(
+                Thread.last_post_at.is_(None),
+                tuple_(Thread.last_post_at, Thread.last_post_id)
+                < tuple_(post.created_at, post.id),
+            )
+            await session.execute(
+                update(Thread)
+                .where(Thread.id == post_in.thread_id)
+                .values(
+                    last_post_at=case(
+                        (is_newer, post.created_at), else_=Thread.last_post_at
+                    ),
+                    last_post_id=case((is_newer, post.id), else_=Thread.last_post_id),
+                    last_activity_at=case(
+                        (Thread.last_activity_at < post.created_at, post.created_at),
+                        else_=Thread.last_activity_at,
+                    ),
+                )
+            )
+            outbox.add(
+                session, POST_CREATED, {"user_id": author.id, "forum_id": forum_id}
             )
             return post
         except Exception as e:
@@ -51,33 +92,138 @@ class PostService:
         List posts paginated from a thread.
         Returns a list of posts and the total number of posts.
         """
-        thread = await session.get(Thread, id)
-        if thread is None:
-            raise ThreadDoesNotExist
+        st = (
+            select(Post)
+            .where(Post.thread_id == id)
+            .order_by(Post.created_at, Post.id)
+            .options(joinedload(Post.author))
+            .offset((page - 1) * limit)
+            .limit(limit)
+        )
         try:
-            count_st = (
-                select(func.count()).select_from(Post).where(Post.thread_id == id)
+            return await fetch_with_total(
+                session, st, self._total(id), ThreadDoesNotExist
             )
+        except ThreadDoesNotExist:
+            raise
+        except Exception as e:
+            log.error(f"Unexpected error when listing all posts for Thread {id}: {e}")
+            raise
+
+    async def list_posts_by_cursor(
+        self, session: AsyncSession, id: int, limit: int, cursor: PostCursor | None
+    ) -> tuple[list[Post], int, PostCursor | None, PostCursor | None]:
+        """
+        List posts from a thread using keyset pagination.
+        Returns a list of posts, the total number of posts, next and previous cursor.
+        """
+        try:
             st = (
                 select(Post)
                 .where(Post.thread_id == id)
-                .order_by(Post.created_at)
-                .options(selectinload(Post.author))
-                .offset((page - 1) * limit)
-                .limit(limit)
+                .options(joinedload(Post.author))
+                .limit(limit + 1)
             )
-            posts = (await session.scalars(st)).all()
-            total = await session.scalar(count_st) or 0
+            key = tuple_(Post.created_at, Post.id)
+            if cursor is None:
+                st = st.order_by(Post.created_at, Post.id)
+            elif cursor.backwards:
+                st = st.where(key < tuple_(cursor.created_at, cursor.id)).order_by(
+                    Post.created_at.desc(), Post.id.desc()
+                )
+            else:
+                st = st.where(key > tuple_(cursor.created_at, cursor.id)).order_by(
+                    Post.created_at, Post.id
+                )
 
-            return posts, total  # type: ignore
+            rows, total = await fetch_with_total(
+                session, st, self._total(id), ThreadDoesNotExist
+            )
+            posts, next_cursor, prev_cursor = keyset_page(
+                rows, limit, cursor, self.to_cursor
+            )
+            return posts, total, next_cursor, prev_cursor
+        except ThreadDoesNotExist:
+            raise
         except Exception as e:
             log.error(f"Unexpected error when listing all posts for Thread {id}: {e}")
             raise
 
+    async def list_posts_around(
+        self, session: AsyncSession, id: int, post_id: int, limit: int
+    ) -> tuple[list[Post], int, int, PostCursor | None, PostCursor | None]:
+        """
+        List the page of a thread that contains the post `post_id`.
+        The page is found from the position of the post in the thread, and its
+        rows are read with keyset seeks around the post instead of an OFFSET scan.
+        Deleted posts leave gaps in the positions, the page number of a later
+        post is off by one page per `limit` posts deleted before it, until
+        rebuild_counters closes the gaps.
+
+        Returns a list of posts, the total number of posts, the page number,
+        next and previous cursor.
+        """
+        res = (
+            await session.execute(
+                select(Post, Thread.reply_count)
+                .join(Post.thread)
+                .where(Post.id == post_id, Post.thread_id == id)
+            )
+        ).first()
+        if res is None:
+            raise PostDoesNotExist
+        post, total = res
+        try:
+            key = tuple_(Post.created_at, Post.id)
+            position = tuple_(post.created_at, post.id)
+            page, n_before = divmod(post.position - 1, limit)
+
+            posts = []
+            if n_before:
+                head_st = (
+                    select(Post)
+                    .where(Post.thread_id == id, key < position)
+                    .options(joinedload(Post.author))
+                    .order_by(Post.created_at.desc(), Post.id.desc())
+                    .limit(n_before)
+                )
+                posts = list(reversed((await session.scalars(head_st)).all()))
+
+            n_after = limit - n_before
+            tail_st = (
+                select(Post)
+                .where(Post.thread_id == id, key >= position)
+                .options(joinedload(Post.author))
+                .order_by(Post.created_at, Post.id)
+                .limit(n_after + 1)
+            )
+            tail = (await session.scalars(tail_st)).all()
+            posts.extend(tail[:n_after])
+
+            next_cursor = self.to_cursor(posts[-1]) if len(tail) > n_after else None
+            prev_cursor = None
+            if page > 0:
+                prev_cursor = self.to_cursor(posts[0])
+                prev_cursor.backwards = True
+            return posts, total, page + 1, next_cursor, prev_cursor
+        except Exception as e:
+            log.error(f"Unexpected error when listing posts around Post {post_id}: {e}")
+            raise
+
+    def _total(self, thread_id: int):
+        """Number of posts of a thread, NULL if the thread does not exist."""
+        return (
+            select(Thread.reply_count).where(Thread.id == thread_id).scalar_subquery()
+        )
+
+    def to_cursor(self, post: Post) -> PostCursor:
+        """Cursor pointing to the post position in a listing."""
+        return PostCursor(created_at=post.created_at, id=post.id)
+
     async def get(self, session: AsyncSession, id: int) -> Post:
         """Retrieve a post from database. Raises PostDoesNotExist."""
         post = await session.get(
-            Post, id, options=[selectinload(Post.author), selectinload(Post.thread)]
+            Post, id, options=[joinedload(Post.author), joinedload(Post.thread)]
         )
         if post is None:
             raise PostDoesNotExist
@@ -106,5 +252,52 @@ class PostService:
         await session.refresh(post)
         return post
 
+    async def delete(self, session: AsyncSession, id: int, user: User):
+        """
+        Delete a post. Only allows for deleting owned posts or if user
+        is a moderator or admin.
+        """
+        post = await self.get(session, id)
+
+        if post.author != user and not user.is_moderator():
+            raise PostNotOwner
+
+        try:
+            thread = post.thread
+            # Later posts keep their position, a gap is left
+            await session.delete(post)
+            await session.flush()
+
+            values = {"reply_count": Thread.reply_count - 1}
+            if thread.last_post_id == post.id:
+                last_post = (
+                    select(Post)
+                    .where(Post.thread_id == thread.id)
+                    .order_by(Post.created_at.desc(), Post.id.desc())
+                    .limit(1)
+                )
+                last_post_at = last_post.with_only_columns(
+                    Post.created_at
+                ).scalar_subquery()
+                values["last_post_at"] = last_post_at
+                values["last_activity_at"] = func.coalesce(
+                    last_post_at, Thread.created_at
+                )
+                values["last_post_id"] = last_post.with_only_columns(
+                    Post.id
+                ).scalar_subquery()
+            await session.execute(
+                update(Thread).where(Thread.id == thread.id).values(**values)
+            )
+            outbox.add(
+                session,
+                POST_DELETED,
+                {"user_id": post.author_id, "forum_id": thread.forum_id},
+            )
+            log.debug(f"Post {id} deleted by {user}")
+        except Exception as e:
+            log.error(f"Unexpected error when deleting Post {id}: {e}")
+            raise
+
 
 post_service = PostService()
@@ -1,4 +1,8 @@
-from pydantic import BaseModel, ConfigDict
+import base64
+import binascii
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+from forum.exceptions import InvalidCursor
 
 
 class Pagination(BaseModel):
@@ -10,3 +14,37 @@ class Pagination(BaseModel):
     total_pages: int
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class Cursor(BaseModel):
+    """
+    Position of a row in a keyset paginated listing. Subclasses add the
+    columns the listing is sorted by.
+    `backwards` tells if the page is read before (True) or after the row.
+    """
+
+    id: int
+    backwards: bool = False
+
+    def encode(self) -> str:
+        """Encode the cursor into an opaque URL-safe string."""
+        return base64.urlsafe_b64encode(self.model_dump_json().encode()).decode()
+
+    @classmethod
+    def decode(cls, token: str) -> "Cursor":
+        """Decode an opaque cursor. Raises InvalidCursor."""
+        try:
+            return cls.model_validate_json(base64.urlsafe_b64decode(token))
+        except (binascii.Error, ValueError, ValidationError):
+            raise InvalidCursor
+
+
+class CursorPagination(Pagination):
+    """
+    Pydantic model for pagination that also supports keyset pagination.
+    `page` is unknown when the page was requested with a cursor.
+    """
+
+    page: int | None = None
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
@@ -1,7 +1,9 @@
+from datetime import datetime
 from typing import TYPE_CHECKING
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy.types import String, Text
+from sqlalchemy.sql import func
+from sqlalchemy.types import DateTime, String, Text
 from forum.database.core import Base, TimestampMixin
 
 if TYPE_CHECKING:
@@ -14,6 +16,15 @@ class Thread(Base, TimestampMixin):
     """SQLAlchemy model for a Thread."""
 
     __tablename__ = "threads"
+    __table_args__ = (
+        Index(
+            "ix_threads_forum_id_is_pinned_last_activity_at_id",
+            "forum_id",
+            "is_pinned",
+            "last_activity_at",
+            "id",
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -21,6 +32,19 @@ class Thread(Base, TimestampMixin):
     is_pinned: Mapped[bool] = mapped_column(default=False)
     is_locked: Mapped[bool] = mapped_column(default=False)
 
+    # Denormalized from posts, kept up to date by PostService
+    reply_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    # Position of the last created post, never decremented
+    last_position: Mapped[int] = mapped_column(default=0, server_default="0")
+    last_post_at: Mapped[datetime | None] = mapped_column(
+        DateTime(True), nullable=True
+    )
+    last_post_id: Mapped[int | None] = mapped_column(nullable=True)
+    # Last post time, or creation time for threads without posts
+    last_activity_at: Mapped[datetime] = mapped_column(
+        DateTime(True), server_default=func.now()
+    )
+
     author_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     author: Mapped["User"] = relationship(back_populates="threads")
 
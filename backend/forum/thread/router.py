@@ -1,12 +1,14 @@
 import math
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import PositiveInt
 
-from forum.auth.dependencies import CurrentUser, get_moderator_user
-from forum.database.core import DbSession
+from forum.auth.dependencies import CurrentUser, get_moderator_claims
+from forum.database.core import DbSession, ReadDbSession
+from forum.exceptions import InvalidCursor
 from forum.thread.exception import ThreadDoesNotExist, ThreadNotOwner
 from forum.thread.schemas import (
     ThreadCreate,
+    ThreadCursor,
     ThreadEditUser,
     ThreadPagination,
     ThreadRead,
@@ -21,15 +23,12 @@ thread_router = APIRouter(prefix="/thread", tags=["threads"])
 @thread_router.post("/", response_model=ThreadRead)
 async def create_thread(
     db_session: DbSession,
-    request: Request,
     thread_in: ThreadCreate,
     current_user: CurrentUser,
 ):
     """Create a thread."""
     try:
-        thread = await srvc.create(
-            db_session, request.app.state.cache, thread_in, current_user
-        )
+        thread = await srvc.create(db_session, thread_in, current_user)
         return thread
     except Exception:
         raise HTTPException(
@@ -39,11 +38,33 @@ async def create_thread(
 
 @forum_router.get("/{id}/threads", response_model=ThreadPagination)
 async def list_threads_under_forum(
-    db_session: DbSession, id: int, page: PositiveInt = 1, limit: PositiveInt = 15
+    db_session: ReadDbSession,
+    id: int,
+    page: PositiveInt = 1,
+    limit: PositiveInt = 15,
+    cursor: str | None = None,
 ):
-    """List threads paginated under a forum."""
+    """
+    List threads paginated under a forum.
+    When `cursor` is given, keyset pagination is used and `page` is ignored.
+    """
     try:
-        threads, total_items = await srvc.list_threads(db_session, id, page, limit)
+        if cursor is not None:
+            threads, total_items, next_cursor, prev_cursor = (
+                await srvc.list_threads_by_cursor(
+                    db_session, id, limit, ThreadCursor.decode(cursor)
+                )
+            )
+            page = None
+        else:
+            threads, total_items = await srvc.list_threads(db_session, id, page, limit)
+            next_cursor = prev_cursor = None
+            if threads and page * limit < total_items:
+                next_cursor = srvc.to_cursor(threads[-1])
+            if threads and page > 1:
+                prev_cursor = srvc.to_cursor(threads[0])
+                prev_cursor.backwards = True
+
         threads_data = [ThreadRead.model_validate(t) for t in threads]
         page_size = len(threads)
         return ThreadPagination(
@@ -51,8 +72,12 @@ async def list_threads_under_forum(
             page_size=page_size,
             total_items=total_items,
             total_pages=math.ceil(total_items / limit) if total_items else 0,
+            next_cursor=next_cursor.encode() if next_cursor else None,
+            prev_cursor=prev_cursor.encode() if prev_cursor else None,
             data=threads_data,
         )
+    except InvalidCursor:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Invalid cursor.")
     except Exception:
         raise HTTPException(
             status.HTTP_500_INTERNAL_SERVER_ERROR, "An unexpected error occurred"
@@ -60,7 +85,7 @@ async def list_threads_under_forum(
 
 
 @thread_router.get("/{id}", response_model=ThreadRead)
-async def read_thread(db_session: DbSession, id: int):
+async def read_thread(db_session: ReadDbSession, id: int):
     """Read a thread."""
     try:
         thread = await srvc.get(db_session, id)
@@ -76,7 +101,7 @@ async def read_thread(db_session: DbSession, id: int):
 @thread_router.patch(
     "/{id}/pin",
     status_code=status.HTTP_200_OK,
-    dependencies=[Depends(get_moderator_user)],
+    dependencies=[Depends(get_moderator_claims)],
     response_model=ThreadRead,
 )
 async def pin_thread(db_session: DbSession, id: int):
@@ -94,7 +119,7 @@ async def pin_thread(db_session: DbSession, id: int):
 @thread_router.patch(
     "/{id}/unpin",
     status_code=status.HTTP_200_OK,
-    dependencies=[Depends(get_moderator_user)],
+    dependencies=[Depends(get_moderator_claims)],
     response_model=ThreadRead,
 )
 async def unpin_thread(db_session: DbSession, id: int):
@@ -112,7 +137,7 @@ async def unpin_thread(db_session: DbSession, id: int):
 @thread_router.patch(
     "/{id}/lock",
     status_code=status.HTTP_200_OK,
-    dependencies=[Depends(get_moderator_user)],
+    dependencies=[Depends(get_moderator_claims)],
     response_model=ThreadRead,
 )
 async def lock_thread(db_session: DbSession, id: int):
@@ -130,7 +155,7 @@ async def lock_thread(db_session: DbSession, id: int):
 @thread_router.patch(
     "/{id}/unlock",
     status_code=status.HTTP_200_OK,
-    dependencies=[Depends(get_moderator_user)],
+    dependencies=[Depends(get_moderator_claims)],
     response_model=ThreadRead,
 )
 async def unlock_thread(db_session: DbSession, id: int):
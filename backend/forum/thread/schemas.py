@@ -3,7 +3,7 @@ from datetime import datetime
 from pydantic import BaseModel, ConfigDict
 from pydantic.types import PositiveInt
 
-from forum.schemas import Pagination
+from forum.schemas import Cursor, CursorPagination
 
 
 class Author(BaseModel):
@@ -31,6 +31,8 @@ class ThreadRead(ThreadBase):
     created_at: datetime
     is_pinned: bool
     is_locked: bool
+    reply_count: int = 0
+    last_post_at: datetime | None = None
 
 
 class ThreadEditUser(BaseModel):
@@ -42,5 +44,12 @@ class ThreadEditUser(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
-class ThreadPagination(Pagination):
+class ThreadCursor(Cursor):
+    """Position of a thread in a forum, sorted by pinned first then last activity."""
+
+    is_pinned: bool
+    last_activity_at: datetime
+
+
+class ThreadPagination(CursorPagination):
     data: list[ThreadRead]
@@ -1,39 +1,52 @@
 import logging
 
-from redis.asyncio import Redis
-from sqlalchemy import func
+from sqlalchemy import func, insert, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.sql import select
 
 from forum.auth.models import User
 from forum.forum.exceptions import ForumDoesNotExist
 from forum.forum.models import Forum
+from forum.outbox.service import outbox
+from forum.pagination import fetch_with_total, keyset_page
+from forum.post.models import Post
 from forum.thread.exception import ThreadDoesNotExist, ThreadNotOwner
 from forum.thread.models import Thread
-from forum.thread.schemas import ThreadCreate, ThreadEditUser
-from forum.cache.repository import cache_repo
+from forum.thread.schemas import ThreadCreate, ThreadCursor, ThreadEditUser
+from forum.cache.repository import THREAD_CREATED
 
 log = logging.getLogger(__name__)
 
+# Pinned threads first, then by last activity.
+# Backed by the (forum_id, is_pinned, last_activity_at, id) index.
+THREAD_ORDER = (Thread.is_pinned, Thread.last_activity_at, Thread.id)
+
 
 class ThreadService:
-    async def create(
-        self, session: AsyncSession, cache: Redis, thread_in: ThreadCreate, author: User
-    ):
+    async def create(self, session: AsyncSession, thread_in: ThreadCreate, author: User):
         """Create a new Thread."""
-        forum = await session.get(Forum, thread_in.forum_id)
+        # Bumping the counter first tells whether the forum exists
+        forum = await session.scalar(
+            update(Forum)
+            .where(Forum.id == thread_in.forum_id)
+            .values(thread_count=Forum.thread_count + 1)
+            .returning(Forum)
+        )
         if forum is None:
             raise ForumDoesNotExist
 
         try:
-            thread = Thread(**thread_in.model_dump())
-            thread.forum = forum
-            thread.author = author
-            session.add(thread)
-            await session.flush()
-            await session.refresh(thread)
-            await cache_repo.on_thread_created(cache, forum.id)
+            # One INSERT ... RETURNING instead of add, flush and refresh
+            thread = await session.scalar(
+                insert(Thread)
+                .values(**thread_in.model_dump(), author_id=author.id)
+                .returning(Thread)
+            )
+            set_committed_value(thread, "forum", forum)
+            set_committed_value(thread, "author", author)
+            outbox.add(session, THREAD_CREATED, {"forum_id": forum.id})
             return thread
         except Exception as e:
             log.error(f"Unexpected error when creating a new Thread {thread_in}: {e}")
@@ -46,40 +59,129 @@ class ThreadService:
         List threads paginated under a forum.
         Returns list of threads and number of total threads.
         """
-        forum = await session.get(Forum, forum_id)
-        if forum is None:
-            raise ForumDoesNotExist
-
+        st = (
+            select(Thread)
+            .where(Thread.forum_id == forum_id)
+            .options(joinedload(Thread.author))
+            .order_by(*(c.desc() for c in THREAD_ORDER))
+            .offset((page - 1) * limit)
+            .limit(limit)
+        )
         try:
-            count_st = (
-                select(func.count())
-                .select_from(Thread)
-                .where(Thread.forum_id == forum_id)
+            return await fetch_with_total(
+                session, st, self._total(forum_id), ForumDoesNotExist
             )
+        except ForumDoesNotExist:
+            raise
+        except Exception as e:
+            log.error(
+                f"Unexpected error when listing threads under Forum:{forum_id}: {e}"
+            )
+            raise
+
+    async def list_threads_by_cursor(
+        self,
+        session: AsyncSession,
+        forum_id: int,
+        limit: int,
+        cursor: ThreadCursor | None,
+    ) -> tuple[list[Thread], int, ThreadCursor | None, ThreadCursor | None]:
+        """
+        List threads under a forum using keyset pagination, so every page
+        costs the same regardless of how deep it is.
+        Returns list of threads, number of total threads, next and previous cursor.
+        """
+        try:
             st = (
                 select(Thread)
                 .where(Thread.forum_id == forum_id)
-                .options(selectinload(Thread.author))
-                .order_by(Thread.created_at.desc())
-                .offset((page - 1) * limit)
-                .limit(limit)
+                .options(joinedload(Thread.author))
+                .limit(limit + 1)
             )
-
-            threads = await session.scalars(st)
-            total = await session.scalar(count_st) or 0
-            return threads.all(), total  # type: ignore
+            key = tuple_(*THREAD_ORDER)
+            if cursor is None:
+                st = st.order_by(*(c.desc() for c in THREAD_ORDER))
+            else:
+                position = tuple_(cursor.is_pinned, cursor.last_activity_at, cursor.id)
+                if cursor.backwards:
+                    st = st.where(key > position).order_by(*THREAD_ORDER)
+                else:
+                    st = st.where(key < position).order_by(
+                        *(c.desc() for c in THREAD_ORDER)
+                    )
+
+            rows, total = await fetch_with_total(
+                session, st, self._total(forum_id), ForumDoesNotExist
+            )
+            threads, next_cursor, prev_cursor = keyset_page(
+                rows, limit, cursor, self.to_cursor
+            )
+            return threads, total, next_cursor, prev_cursor
+        except ForumDoesNotExist:
+            raise
         except Exception as e:
             log.error(
                 f"Unexpected error when listing threads under Forum:{forum_id}: {e}"
             )
             raise
 
+    def _total(self, forum_id: int):
+        """Number of threads of a forum, NULL if the forum does not exist."""
+        return select(Forum.thread_count).where(Forum.id == forum_id).scalar_subquery()
+
+    def to_cursor(self, thread: Thread) -> ThreadCursor:
+        """Cursor pointing to the thread position in a listing."""
+        return ThreadCursor(
+            is_pinned=thread.is_pinned,
+            last_activity_at=thread.last_activity_at,
+            id=thread.id,
+        )
+
+    async def rebuild_counters(self, session: AsyncSession):
+        """
+        Rebuild the denormalized reply counters of every thread from the posts,
+        and number the posts of each thread in order, closing the gaps left by
+        deleted posts.
+        """
+        numbered = select(
+            Post.id,
+            func.row_number()
+            .over(partition_by=Post.thread_id, order_by=(Post.created_at, Post.id))
+            .label("position"),
+        ).subquery()
+        positions = (
+            update(Post)
+            .where(Post.id == numbered.c.id)
+            .values(position=numbered.c.position)
+        )
+        posts = select(Post).where(Post.thread_id == Thread.id)
+        last_post = posts.order_by(Post.created_at.desc(), Post.id.desc()).limit(1)
+        n_posts = posts.with_only_columns(func.count()).scalar_subquery()
+        st = update(Thread).values(
+            reply_count=n_posts,
+            last_position=n_posts,
+            last_post_at=last_post.with_only_columns(Post.created_at).scalar_subquery(),
+            last_post_id=last_post.with_only_columns(Post.id).scalar_subquery(),
+            last_activity_at=func.coalesce(
+                last_post.with_only_columns(Post.created_at).scalar_subquery(),
+                Thread.created_at,
+            ),
+        )
+        try:
+            await session.execute(
+                positions, execution_options={"synchronize_session": False}
+            )
+            await session.execute(st, execution_options={"synchronize_session": False})
+        except Exception as e:
+            log.error(f"Unexpected error when rebuilding thread counters: {e}")
+            raise
+
     async def get(self, session: AsyncSession, id: int) -> Thread:
         """Get a thread by ID."""
         thread = await session.get(
             Thread,
             id,
-            options=[selectinload(Thread.author), selectinload(Thread.forum)],
+            options=[joinedload(Thread.author), joinedload(Thread.forum)],
         )
         if thread is None:
             raise ThreadDoesNotExist
@@ -87,7 +189,7 @@ class ThreadService:
 
     async def pin(self, session: AsyncSession, id: int) -> Thread:
         """Pin a thread by ID."""
-        thread = await session.get(Thread, id, options=[selectinload(Thread.author)])
+        thread = await session.get(Thread, id, options=[joinedload(Thread.author)])
         if thread is None:
             raise ThreadDoesNotExist
         thread.is_pinned = True
@@ -95,7 +197,7 @@ class ThreadService:
 
     async def unpin(self, session: AsyncSession, id: int) -> Thread:
         """Unpin a thread by ID."""
-        thread = await session.get(Thread, id, options=[selectinload(Thread.author)])
+        thread = await session.get(Thread, id, options=[joinedload(Thread.author)])
         if thread is None:
             raise ThreadDoesNotExist
         thread.is_pinned = False
@@ -103,7 +205,7 @@ class ThreadService:
 
     async def lock(self, session: AsyncSession, id: int) -> Thread:
         """Lock a thread by ID."""
-        thread = await session.get(Thread, id, options=[selectinload(Thread.author)])
+        thread = await session.get(Thread, id, options=[joinedload(Thread.author)])
         if thread is None:
             raise ThreadDoesNotExist
         thread.is_locked = True
@@ -111,7 +213,7 @@ class ThreadService:
 
     async def unlock(self, session: AsyncSession, id: int) -> Thread:
         """Unlock a thread by ID."""
-        thread = await session.get(Thread, id, options=[selectinload(Thread.author)])
+        thread = await session.get(Thread, id, options=[joinedload(Thread.author)])
         if thread is None:
             raise ThreadDoesNotExist
         thread.is_locked = False
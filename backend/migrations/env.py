@@ -10,7 +10,9 @@ from forum.category.models import Category
 from forum.forum.models import Forum
 from forum.thread.models import Thread
 from forum.post.models import Post
+from forum.outbox.models import OutboxEvent
 from forum.config import settings
+from forum.database.iam import rds_tokens, use_iam_auth
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -68,6 +70,7 @@ def run_migrations_online() -> None:
             connect_args=ssl,
             poolclass=pool.NullPool,
         )
+        use_iam_auth(connectable, rds_tokens)
 
     with connectable.connect() as connection:
         context.configure(connection=connection, target_metadata=target_metadata)
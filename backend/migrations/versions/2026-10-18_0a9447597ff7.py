@@ -0,0 +1,56 @@
+"""add last activity to threads and index the forum front page ordering
+
+Revision ID: 0a9447597ff7
+Revises: 18780f9ab4f2
+Create Date: 2026-10-18 13:41:05.226731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a9447597ff7'
+down_revision: Union[str, Sequence[str], None] = '18780f9ab4f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('threads', sa.Column('last_activity_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+    op.execute("UPDATE threads SET last_activity_at = coalesce(last_post_at, created_at)")
+
+    # Built concurrently so existing tables are not locked against writes
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_threads_forum_id_is_pinned_last_activity_at_id',
+            'threads',
+            ['forum_id', 'is_pinned', 'last_activity_at', 'id'],
+            postgresql_concurrently=True,
+        )
+        # Threads are no longer listed by creation time
+        op.drop_index(
+            'ix_threads_forum_id_created_at_id',
+            table_name='threads',
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_threads_forum_id_created_at_id',
+            'threads',
+            ['forum_id', 'created_at', 'id'],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_threads_forum_id_is_pinned_last_activity_at_id',
+            table_name='threads',
+            postgresql_concurrently=True,
+        )
+    op.drop_column('threads', 'last_activity_at')
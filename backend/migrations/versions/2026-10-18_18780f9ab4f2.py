@@ -0,0 +1,53 @@
+"""add denormalized reply and thread counters
+
+Revision ID: 18780f9ab4f2
+Revises: d57305b646e3
+Create Date: 2026-10-18 11:03:27.840213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '18780f9ab4f2'
+down_revision: Union[str, Sequence[str], None] = 'd57305b646e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('threads', sa.Column('reply_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('threads', sa.Column('last_post_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('threads', sa.Column('last_post_id', sa.Integer(), nullable=True))
+    op.add_column('forums', sa.Column('thread_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill from the existing rows
+    op.execute(
+        """
+        UPDATE threads SET
+            reply_count = (SELECT count(*) FROM posts WHERE posts.thread_id = threads.id),
+            last_post_at = (SELECT max(created_at) FROM posts WHERE posts.thread_id = threads.id),
+            last_post_id = (
+                SELECT id FROM posts WHERE posts.thread_id = threads.id
+                ORDER BY created_at DESC, id DESC LIMIT 1
+            )
+        """
+    )
+    op.execute(
+        """
+        UPDATE forums SET
+            thread_count = (SELECT count(*) FROM threads WHERE threads.forum_id = forums.id)
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('forums', 'thread_count')
+    op.drop_column('threads', 'last_post_id')
+    op.drop_column('threads', 'last_post_at')
+    op.drop_column('threads', 'reply_count')
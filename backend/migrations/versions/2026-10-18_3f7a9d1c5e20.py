@@ -0,0 +1,56 @@
+"""add post position
+
+Revision ID: 3f7a9d1c5e20
+Revises: 9b4e2c71d0a5
+Create Date: 2026-10-18 20:04:12.118390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f7a9d1c5e20'
+down_revision: Union[str, Sequence[str], None] = '9b4e2c71d0a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'posts',
+        sa.Column('position', sa.Integer(), server_default='0', nullable=False),
+    )
+    # Number the existing posts of each thread in order
+    op.execute(
+        """
+        UPDATE posts SET position = numbered.position
+        FROM (
+            SELECT id, row_number() OVER (
+                PARTITION BY thread_id ORDER BY created_at, id
+            ) AS position
+            FROM posts
+        ) AS numbered
+        WHERE posts.id = numbered.id
+        """
+    )
+    op.add_column(
+        'threads',
+        sa.Column('last_position', sa.Integer(), server_default='0', nullable=False),
+    )
+    op.execute(
+        """
+        UPDATE threads SET last_position = (
+            SELECT count(*) FROM posts WHERE posts.thread_id = threads.id
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('threads', 'last_position')
+    op.drop_column('posts', 'position')
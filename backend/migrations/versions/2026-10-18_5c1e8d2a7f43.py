@@ -0,0 +1,44 @@
+"""add permissions and role permissions
+
+Revision ID: 5c1e8d2a7f43
+Revises: 0a9447597ff7
+Create Date: 2026-10-18 15:02:47.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e8d2a7f43'
+down_revision: Union[str, Sequence[str], None] = '0a9447597ff7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'permissions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+    )
+    op.create_table(
+        'role_permissions',
+        sa.Column('role_id', sa.Integer(), nullable=False),
+        sa.Column('permission_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['permission_id'], ['permissions.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['role_id'], ['roles.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('role_id', 'permission_id'),
+    )
+    # Default grants are created at startup, see forum.auth.utils.init_permissions
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('role_permissions')
+    op.drop_table('permissions')
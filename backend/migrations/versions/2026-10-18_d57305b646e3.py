@@ -0,0 +1,59 @@
+"""add indexes for thread and post listings
+
+Revision ID: d57305b646e3
+Revises: 7dab60b96629
+Create Date: 2026-10-18 09:12:41.512087
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd57305b646e3'
+down_revision: Union[str, Sequence[str], None] = '7dab60b96629'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Built concurrently so existing tables are not locked against writes
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_threads_forum_id_created_at_id',
+            'threads',
+            ['forum_id', 'created_at', 'id'],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_posts_thread_id_created_at_id',
+            'posts',
+            ['thread_id', 'created_at', 'id'],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_posts_author_id',
+            'posts',
+            ['author_id'],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_posts_author_id', table_name='posts', postgresql_concurrently=True
+        )
+        op.drop_index(
+            'ix_posts_thread_id_created_at_id',
+            table_name='posts',
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_threads_forum_id_created_at_id',
+            table_name='threads',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,165 @@
+# Run with:
+# `uv run scripts/check_query_plans.py`
+#
+# Runs the listing queries of the services against the configured database,
+# EXPLAINs every SELECT they emit and fails if any of them does a sequential
+# scan on a table with at least MIN_ROWS rows. Run it against a database of
+# realistic size (e.g. a staging copy), small tables are always seq scanned.
+
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+from sqlalchemy import event, func, select, text
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from forum.auth.models import User  # noqa
+from forum.category.models import Category  # noqa
+from forum.database.core import get_engine, get_sessionlocal
+from forum.forum.models import Forum  # noqa
+from forum.post.models import Post
+from forum.post.service import post_service
+from forum.thread.models import Thread
+from forum.thread.service import thread_service
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
+MIN_ROWS = 10_000
+LIMIT = 15
+
+
+async def run_service_queries(session):
+    """Call every listing query of the services with ids taken from the database."""
+    # Busiest forum and thread, they are the ones with deep pages
+    forum_id = await session.scalar(
+        select(Thread.forum_id)
+        .group_by(Thread.forum_id)
+        .order_by(func.count().desc())
+        .limit(1)
+    )
+    thread_id = await session.scalar(
+        select(Post.thread_id)
+        .group_by(Post.thread_id)
+        .order_by(func.count().desc())
+        .limit(1)
+    )
+    if forum_id is None or thread_id is None:
+        raise SystemExit("The database needs threads and posts to check query plans")
+    post_id = await session.scalar(
+        select(Post.id)
+        .where(Post.thread_id == thread_id)
+        .order_by(Post.id.desc())
+        .limit(1)
+    )
+
+    queries = []
+
+    async def record(name, coro):
+        """Keep the statements emitted by a service call."""
+        start = len(captured)
+        res = await coro
+        queries.append((name, captured[start:]))
+        return res
+
+    _, total, next_cursor, _ = await record(
+        "list_threads_by_cursor",
+        thread_service.list_threads_by_cursor(session, forum_id, LIMIT, None),
+    )
+    await record(
+        "list_threads (first page)",
+        thread_service.list_threads(session, forum_id, 1, LIMIT),
+    )
+    await record(
+        "list_threads (last page)",
+        thread_service.list_threads(session, forum_id, max(total // LIMIT, 1), LIMIT),
+    )
+    if next_cursor is not None:
+        await record(
+            "list_threads_by_cursor (next)",
+            thread_service.list_threads_by_cursor(
+                session, forum_id, LIMIT, next_cursor
+            ),
+        )
+
+    _, total, next_cursor, _ = await record(
+        "list_posts_by_cursor",
+        post_service.list_posts_by_cursor(session, thread_id, LIMIT, None),
+    )
+    await record(
+        "list_posts (first page)",
+        post_service.list_posts(session, thread_id, 1, LIMIT),
+    )
+    await record(
+        "list_posts (last page)",
+        post_service.list_posts(session, thread_id, max(total // LIMIT, 1), LIMIT),
+    )
+    if next_cursor is not None:
+        await record(
+            "list_posts_by_cursor (next)",
+            post_service.list_posts_by_cursor(session, thread_id, LIMIT, next_cursor),
+        )
+    await record(
+        "list_posts_around",
+        post_service.list_posts_around(session, thread_id, post_id, LIMIT),
+    )
+    return queries
+
+
+def seq_scans(plan: dict):
+    """Yield the relation names of every Seq Scan node in a JSON plan."""
+    if plan.get("Node Type") == "Seq Scan":
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from seq_scans(child)
+
+
+captured: list[tuple[str, dict]] = []
+
+
+def capture(conn, cursor, statement, parameters, context, executemany):
+    if statement.lstrip().upper().startswith("SELECT"):
+        captured.append((statement, parameters))
+
+
+async def main() -> int:
+    engine = get_engine()
+
+    async with get_sessionlocal()() as session:
+        event.listen(engine.sync_engine, "before_cursor_execute", capture)
+        try:
+            queries = await run_service_queries(session)
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", capture)
+            await session.rollback()
+
+    failures = 0
+    async with engine.connect() as conn:
+        res = await conn.execute(
+            text("SELECT relname, reltuples FROM pg_class WHERE relkind = 'r'")
+        )
+        sizes = {row.relname: row.reltuples for row in res}
+
+        for name, statements in queries:
+            for statement, parameters in statements:
+                res = await conn.exec_driver_sql(
+                    f"EXPLAIN (FORMAT JSON) {statement}", parameters
+                )
+                plan = res.scalar()[0]["Plan"]  # type: ignore
+                for relation in seq_scans(plan):
+                    if sizes.get(relation, 0) >= MIN_ROWS:
+                        failures += 1
+                        log.error(f"{name}: Seq Scan on {relation}\n{statement}")
+
+    await engine.dispose()
+    if failures:
+        log.error(f"{failures} queries fall back to a sequential scan")
+        return 1
+    log.info(f"No sequential scans found in {len(queries)} service calls")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,36 @@
+# Run with:
+# `uv run scripts/rebuild_counters.py`
+#
+# Rebuild the denormalized counters (threads reply count and last post,
+# forums thread count) from scratch, for when they drift.
+
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from forum.auth.models import User  # noqa
+from forum.category.models import Category  # noqa
+from forum.database.core import get_engine, get_sessionlocal
+from forum.forum.service import forum_service
+from forum.thread.service import thread_service
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
+
+async def main():
+    async with get_sessionlocal()() as session:
+        log.info("Rebuilding thread counters")
+        await thread_service.rebuild_counters(session)
+        log.info("Rebuilding forum counters")
+        await forum_service.rebuild_counters(session)
+        await session.commit()
+    await get_engine().dispose()
+    log.info("Counters rebuilt successfully")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,14 +1,36 @@
+import asyncio
+from datetime import datetime, timezone
+
 import pytest
+from fastapi import HTTPException
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from forum.auth.dependencies import get_admin_claims, get_moderator_claims
 from forum.auth.exceptions import (
     EmailAlreadyExists,
     IncorrectPasswordOrUsername,
     InsufficientPermission,
+    InvalidRefreshToken,
+    PermissionDoesNotExist,
+    RoleDoesNotExist,
+    TooManyLoginAttempts,
     UsernameAlreadyExists,
 )
-from forum.auth.models import User
-from forum.auth.schemas import UserLogin
+from forum.auth.models import Permission, User, hash_password, verify_hash_async
+from forum.auth.schemas import TokenData, UserLogin
 from forum.auth.service import AuthService
+from forum.auth.throttling import (
+    LOGIN_FAILURES_PREFIX,
+    LoginThrottle,
+    login_throttle,
+)
+from forum.auth.utils import DEFAULT_PERMISSIONS, USER_PERMISSIONS, init_permissions
+from forum.cache.repository import cache_repo
+from forum.category.models import Category
+from forum.forum.models import Forum
+from forum.outbox.service import outbox
+from forum.thread.models import Thread
 from tests.conftest import VALID_EMAIL, VALID_PASSWORD, VALID_USERNAME
 
 
@@ -22,7 +44,7 @@ class TestAuthServiceRegister:
         self, auth_service, test_session, valid_user, test_redis
     ):
         """Registering a User should be returned"""
-        user = await auth_service.register(test_session, valid_user, test_redis)
+        user = await auth_service.register(test_session, valid_user)
 
         assert user
 
@@ -30,7 +52,7 @@ class TestAuthServiceRegister:
         self, auth_service, test_session, valid_user, test_redis
     ):
         """Registering a User's username should be saved"""
-        user = await auth_service.register(test_session, valid_user, test_redis)
+        user = await auth_service.register(test_session, valid_user)
 
         assert user.username == VALID_USERNAME
 
@@ -38,7 +60,7 @@ class TestAuthServiceRegister:
         self, auth_service, test_session, valid_user, test_redis
     ):
         """Registering a User's email should be saved"""
-        user = await auth_service.register(test_session, valid_user, test_redis)
+        user = await auth_service.register(test_session, valid_user)
 
         assert user.email == VALID_EMAIL
 
@@ -46,7 +68,7 @@ class TestAuthServiceRegister:
         self, auth_service, test_session, valid_user, test_redis
     ):
         """Registering a User gets an ID"""
-        user = await auth_service.register(test_session, valid_user, test_redis)
+        user = await auth_service.register(test_session, valid_user)
 
         assert user.id is not None
 
@@ -54,7 +76,7 @@ class TestAuthServiceRegister:
         self, auth_service, test_session, valid_user, test_redis
     ):
         """Registering a User should not store the password in plain text."""
-        user = await auth_service.register(test_session, valid_user, test_redis)
+        user = await auth_service.register(test_session, valid_user)
 
         assert user.password != VALID_PASSWORD
 
@@ -62,7 +84,7 @@ class TestAuthServiceRegister:
         self, auth_service, test_session, valid_user, test_redis
     ):
         """register should raise UsernameAlreadyExists"""
-        user1 = await auth_service.register(test_session, valid_user, test_redis)
+        user1 = await auth_service.register(test_session, valid_user)
 
         assert user1, "A user should be created"
 
@@ -70,13 +92,13 @@ class TestAuthServiceRegister:
         user2.email = "newemail@email.com"
 
         with pytest.raises(UsernameAlreadyExists):
-            await auth_service.register(test_session, valid_user, test_redis)
+            await auth_service.register(test_session, valid_user)
 
     async def test_register_duplicate_email(
         self, auth_service, test_session, valid_user, test_redis
     ):
         """register should raise EmailAlreadyExists"""
-        user1 = await auth_service.register(test_session, valid_user, test_redis)
+        user1 = await auth_service.register(test_session, valid_user)
 
         assert user1, "A user should be created"
 
@@ -84,7 +106,7 @@ class TestAuthServiceRegister:
         user2.username = "com"
 
         with pytest.raises(EmailAlreadyExists):
-            await auth_service.register(test_session, valid_user, test_redis)
+            await auth_service.register(test_session, valid_user)
 
 
 @pytest.fixture
@@ -145,108 +167,646 @@ class TestAuthServiceLogin:
             await auth_service.login(test_session, test_redis, valid_login)
 
 
+class TestAuthServiceRefresh:
+    async def test_refresh_rotates_token(
+        self,
+        auth_service: AuthService,
+        test_session,
+        test_redis,
+        test_user,
+        valid_login,
+    ):
+        """A refresh returns new tokens in the same family."""
+        tokens = await auth_service.login(test_session, test_redis, valid_login)
+
+        new_tokens = await auth_service.refresh(test_redis, tokens.refresh_token)
+
+        assert new_tokens.access_token
+        assert new_tokens.refresh_token != tokens.refresh_token
+        assert (
+            new_tokens.refresh_token.split(".")[0] == tokens.refresh_token.split(".")[0]
+        )
+
+    async def test_reused_token_revokes_family(
+        self,
+        auth_service: AuthService,
+        test_session,
+        test_redis,
+        test_user,
+        valid_login,
+    ):
+        """Reusing a rotated token invalidates the token that replaced it."""
+        tokens = await auth_service.login(test_session, test_redis, valid_login)
+        new_tokens = await auth_service.refresh(test_redis, tokens.refresh_token)
+
+        with pytest.raises(InvalidRefreshToken):
+            await auth_service.refresh(test_redis, tokens.refresh_token)
+        with pytest.raises(InvalidRefreshToken):
+            await auth_service.refresh(test_redis, new_tokens.refresh_token)
+
+    async def test_concurrent_refresh(
+        self,
+        auth_service: AuthService,
+        test_session,
+        test_redis,
+        test_user,
+        valid_login,
+    ):
+        """Only one of concurrent refreshes with the same token succeeds."""
+        tokens = await auth_service.login(test_session, test_redis, valid_login)
+
+        res = await asyncio.gather(
+            *(auth_service.refresh(test_redis, tokens.refresh_token) for _ in range(5)),
+            return_exceptions=True,
+        )
+
+        assert sum(not isinstance(r, Exception) for r in res) == 1
+        assert sum(isinstance(r, InvalidRefreshToken) for r in res) == 4
+
+    async def test_malformed_token(self, auth_service: AuthService, test_redis):
+        """InvalidRefreshToken is raised for tokens without a family."""
+        with pytest.raises(InvalidRefreshToken):
+            await auth_service.refresh(test_redis, "not-a-token")
+
+    async def test_logout(
+        self,
+        auth_service: AuthService,
+        test_session,
+        test_redis,
+        test_user,
+        valid_login,
+    ):
+        """The refresh token of a logged out session stops working."""
+        tokens = await auth_service.login(test_session, test_redis, valid_login)
+        other = await auth_service.login(test_session, test_redis, valid_login)
+
+        await auth_service.logout(test_redis, tokens.refresh_token)
+
+        with pytest.raises(InvalidRefreshToken):
+            await auth_service.refresh(test_redis, tokens.refresh_token)
+        assert await auth_service.refresh(test_redis, other.refresh_token)
+
+    async def test_logout_everywhere(
+        self,
+        auth_service: AuthService,
+        test_session,
+        test_redis,
+        test_user,
+        valid_login,
+    ):
+        """Every refresh token of the user stops working."""
+        sessions = [
+            await auth_service.login(test_session, test_redis, valid_login)
+            for _ in range(3)
+        ]
+        await auth_service.refresh(test_redis, sessions[0].refresh_token)
+
+        await auth_service.logout_everywhere(test_redis, test_user.id)
+
+        for tokens in sessions[1:]:
+            with pytest.raises(InvalidRefreshToken):
+                await auth_service.refresh(test_redis, tokens.refresh_token)
+        assert await test_redis.exists(f"rf_families:{test_user.id}") == 0
+
+    async def test_logout_everywhere_after_index_ttl(
+        self,
+        auth_service: AuthService,
+        test_session,
+        test_redis,
+        test_user,
+        valid_login,
+    ):
+        """A session kept alive past the login TTL is still revoked."""
+        tokens = await auth_service.login(test_session, test_redis, valid_login)
+        # The index of the families was about to expire
+        await test_redis.pexpire(f"rf_families:{test_user.id}", 50)
+        tokens = await auth_service.refresh(test_redis, tokens.refresh_token)
+        await asyncio.sleep(0.1)
+
+        await auth_service.logout_everywhere(test_redis, test_user.id)
+
+        with pytest.raises(InvalidRefreshToken):
+            await auth_service.refresh(test_redis, tokens.refresh_token)
+
+
+class TestAuthServiceLoginThrottling:
+    async def fail_login(self, auth_service, session, cache, username, ip=None):
+        with pytest.raises(IncorrectPasswordOrUsername):
+            await auth_service.login(
+                session,
+                cache,
+                UserLogin(username=username, password="wrongpassword"),
+                ip,
+            )
+
+    async def test_rejected_after_too_many_failures(
+        self, auth_service: AuthService, test_session, test_redis, test_user
+    ):
+        """TooManyLoginAttempts is raised once a username reaches its limit."""
+        for _ in range(login_throttle.max_per_username):
+            await self.fail_login(
+                auth_service, test_session, test_redis, VALID_USERNAME
+            )
+
+        with pytest.raises(TooManyLoginAttempts) as exc:
+            await auth_service.login(
+                test_session,
+                test_redis,
+                UserLogin(username=VALID_USERNAME, password=VALID_PASSWORD),
+            )
+        assert 0 < exc.value.retry_after <= login_throttle.window
+
+    async def test_rejected_before_hashing(
+        self,
+        auth_service: AuthService,
+        test_session,
+        test_redis,
+        test_user,
+        monkeypatch,
+    ):
+        """Rejected attempts do not verify the password."""
+        for _ in range(login_throttle.max_per_username):
+            await self.fail_login(
+                auth_service, test_session, test_redis, VALID_USERNAME
+            )
+
+        async def verify_hash(*args):
+            raise AssertionError("password should not be verified")
+
+        monkeypatch.setattr("forum.auth.models.verify_hash_async", verify_hash)
+        monkeypatch.setattr("forum.auth.service.verify_hash_async", verify_hash)
+        with pytest.raises(TooManyLoginAttempts):
+            await self.fail_login(
+                auth_service, test_session, test_redis, VALID_USERNAME
+            )
+
+    async def test_rejected_by_ip(
+        self, auth_service: AuthService, test_session, test_redis, monkeypatch
+    ):
+        """An IP failing with many usernames is rejected."""
+        monkeypatch.setattr(login_throttle, "max_per_ip", 3)
+        for i in range(3):
+            await self.fail_login(
+                auth_service, test_session, test_redis, f"user{i}", "10.0.0.1"
+            )
+
+        with pytest.raises(TooManyLoginAttempts):
+            await self.fail_login(
+                auth_service, test_session, test_redis, "other", "10.0.0.1"
+            )
+        await self.fail_login(
+            auth_service, test_session, test_redis, "other", "10.0.0.2"
+        )
+
+    async def test_success_resets_failures(
+        self, auth_service: AuthService, test_session, test_redis, test_user
+    ):
+        """A successful login forgets the previous failures of the username."""
+        for _ in range(login_throttle.max_per_username - 1):
+            await self.fail_login(
+                auth_service, test_session, test_redis, VALID_USERNAME
+            )
+        await auth_service.login(
+            test_session,
+            test_redis,
+            UserLogin(username=VALID_USERNAME, password=VALID_PASSWORD),
+        )
+
+        await self.fail_login(auth_service, test_session, test_redis, VALID_USERNAME)
+
+    async def test_window_slides(self, test_redis, monkeypatch):
+        """Failures older than the window are not counted."""
+        throttle = LoginThrottle(max_per_username=2, max_per_ip=10, window=60)
+        now = 1000.0
+        monkeypatch.setattr("forum.auth.throttling.time.time", lambda: now)
+        await throttle.check(test_redis, "user", None)
+        now += 40
+        await throttle.check(test_redis, "user", None)
+        with pytest.raises(TooManyLoginAttempts) as exc:
+            await throttle.check(test_redis, "user", None)
+        assert exc.value.retry_after == 21
+
+        now += 21
+        await throttle.check(test_redis, "user", None)
+
+    async def test_concurrent_attempts(self, test_redis):
+        """Attempts in flight count against the limit."""
+        throttle = LoginThrottle(max_per_username=3, max_per_ip=10, window=60)
+
+        res = await asyncio.gather(
+            *(throttle.check(test_redis, "user", None) for _ in range(10)),
+            return_exceptions=True,
+        )
+
+        assert sum(isinstance(r, str) for r in res) == 3
+        assert sum(isinstance(r, TooManyLoginAttempts) for r in res) == 7
+
+    async def test_released_attempt_is_not_counted(self, test_redis):
+        """An attempt that did not fail frees its place in the window."""
+        throttle = LoginThrottle(max_per_username=1, max_per_ip=10, window=60)
+        attempt = await throttle.check(test_redis, "user", "10.0.0.1")
+        await throttle.release(test_redis, "user", "10.0.0.1", attempt)
+
+        await throttle.check(test_redis, "user", "10.0.0.1")
+
+    async def test_success_keeps_ip_failures(
+        self, auth_service: AuthService, test_session, test_redis, test_user
+    ):
+        """A successful login only removes its own attempt from the IP window."""
+        await self.fail_login(
+            auth_service, test_session, test_redis, "other", "10.0.0.1"
+        )
+        await auth_service.login(
+            test_session,
+            test_redis,
+            UserLogin(username=VALID_USERNAME, password=VALID_PASSWORD),
+            "10.0.0.1",
+        )
+
+        assert await test_redis.zcard(f"{LOGIN_FAILURES_PREFIX}:ip:10.0.0.1") == 1
+        assert not await test_redis.exists(
+            f"{LOGIN_FAILURES_PREFIX}:username:{VALID_USERNAME.lower()}"
+        )
+
+    async def test_stats(self, test_redis):
+        """Attempts, failures and rejections are counted."""
+        throttle = LoginThrottle(max_per_username=1, max_per_ip=10, window=60)
+        attempt = await throttle.check(test_redis, "user", "10.0.0.1")
+        await throttle.record_failure(test_redis, "user", "10.0.0.1", attempt)
+        with pytest.raises(TooManyLoginAttempts):
+            await throttle.check(test_redis, "user", "10.0.0.1")
+
+        assert await throttle.get_stats(test_redis) == {
+            "attempts": 2,
+            "failures": 1,
+            "rejected_username": 1,
+        }
+
+
+class TestPasswordHashing:
+    async def test_verify_hash_async(self):
+        """Passwords are verified against their hash in the pool."""
+        hash = hash_password(VALID_PASSWORD)
+
+        assert await verify_hash_async(VALID_PASSWORD, hash)
+
+    async def test_hashing_does_not_block_event_loop(self):
+        """Other tasks keep running while passwords are hashed."""
+        hash = hash_password(VALID_PASSWORD)
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        ticker = asyncio.create_task(tick())
+        await asyncio.sleep(0)
+        start = ticks
+        await asyncio.gather(
+            *(verify_hash_async(VALID_PASSWORD, hash) for _ in range(4))
+        )
+        ticker.cancel()
+
+        assert ticks - start > 10
+
+
 class TestAuthAuthorization:
     @pytest.fixture
-    def test_request(self, mock_request, test_redis):
-        mock_request.state.app.cache = test_redis
-        return mock_request
+    def grant(self, test_session, test_user_role):
+        async def grant(perms: set[str]):
+            test_session.add_all(
+                Permission(name=name, roles=[test_user_role]) for name in perms
+            )
+            await test_session.flush()
+
+        return grant
 
     async def test_authorization_with_sufficient_permissions(
-        self, auth_service: AuthService, test_request, test_redis
+        self, auth_service: AuthService, test_session, test_redis, test_user, grant
     ):
         """Check authorization works when the user has one permisson and requires this one permisson."""
-        user = User(username=VALID_USERNAME, email=VALID_EMAIL)
-        user.id = 1
-        user.set_password(VALID_PASSWORD)
-
         perms = {"posts:read"}
+        await grant(perms)
 
-        await test_redis.sadd(f"users_perms:{user.id}", *perms)
-
-        result = await auth_service.check_authorization(test_request, user, perms)
+        result = await auth_service.check_authorization(
+            test_session, test_redis, test_user, perms
+        )
 
         assert result is True
 
     async def test_authorization_user_with_multiple_permission_but_requires_only_one(
-        self, auth_service: AuthService, test_request, test_redis
+        self, auth_service: AuthService, test_session, test_redis, test_user, grant
     ):
         """Check authorization works when the user has many permissons, but requires only one."""
-        user = User(username=VALID_USERNAME, email=VALID_EMAIL)
-        user.id = 1
-        user.set_password(VALID_PASSWORD)
-
-        perms = {"posts:read", "posts:edit", "posts:create", "posts:delete"}
-
-        await test_redis.sadd(f"users_perms:{user.id}", *perms)
+        await grant({"posts:read", "posts:edit", "posts:create", "posts:delete"})
 
         result = await auth_service.check_authorization(
-            test_request, user, {"posts:create"}
+            test_session, test_redis, test_user, {"posts:create"}
         )
 
         assert result is True
 
     async def test_authorization_user_with_multiple_permission_and_requires_all(
-        self, auth_service: AuthService, test_request, test_redis
+        self, auth_service: AuthService, test_session, test_redis, test_user, grant
     ):
         """Check authorization works when the user has many permissons and requires all of them."""
-        user = User(username=VALID_USERNAME, email=VALID_EMAIL)
-        user.id = 1
-        user.set_password(VALID_PASSWORD)
-
         perms = {"posts:read", "posts:edit", "posts:create", "posts:delete"}
+        await grant(perms)
 
-        await test_redis.sadd(f"users_perms:{user.id}", *perms)
-
-        result = await auth_service.check_authorization(test_request, user, perms)
+        result = await auth_service.check_authorization(
+            test_session, test_redis, test_user, perms
+        )
 
         assert result is True
 
     async def test_authorization_user_with_one_wrong_permission(
-        self, auth_service: AuthService, test_request, test_redis
+        self, auth_service: AuthService, test_session, test_redis, test_user, grant
     ):
         """Check authorization raise InsufficientPermission when the user have
         only one permission and it's not the required one."""
-        user = User(username=VALID_USERNAME, email=VALID_EMAIL)
-        user.id = 1
-        user.set_password(VALID_PASSWORD)
-
-        perms = {"posts:read"}
-
-        await test_redis.sadd(f"users_perms:{user.id}", *perms)
+        await grant({"posts:read"})
 
         with pytest.raises(InsufficientPermission):
-            await auth_service.check_authorization(test_request, user, {"posts:edit"})
+            await auth_service.check_authorization(
+                test_session, test_redis, test_user, {"posts:edit"}
+            )
 
     async def test_authorization_user_with_multiple_wrong_permissions_one_required(
-        self, auth_service: AuthService, test_request, test_redis
+        self, auth_service: AuthService, test_session, test_redis, test_user, grant
     ):
         """Check authorization raise InsufficientPermission when the
         user have multiple permission and neither is the required one."""
-        user = User(username=VALID_USERNAME, email=VALID_EMAIL)
-        user.id = 1
-        user.set_password(VALID_PASSWORD)
-
-        perms = {"posts:read", "posts:edit", "posts:create"}
-
-        await test_redis.sadd(f"users_perms:{user.id}", *perms)
+        await grant({"posts:read", "posts:edit", "posts:create"})
 
         with pytest.raises(InsufficientPermission):
-            await auth_service.check_authorization(test_request, user, {"posts:delete"})
+            await auth_service.check_authorization(
+                test_session, test_redis, test_user, {"posts:delete"}
+            )
 
     async def test_authorization_user_with_multiple_wrong_permissions_multiple_required(
-        self, auth_service: AuthService, test_request, test_redis
+        self, auth_service: AuthService, test_session, test_redis, test_user, grant
     ):
         """Check authorization raise InsufficientPermission when the
         user have multiple permission and requires multiple permissions"""
-        user = User(username=VALID_USERNAME, email=VALID_EMAIL)
-        user.id = 1
-        user.set_password(VALID_PASSWORD)
+        await grant({"posts:read", "posts:edit", "posts:create"})
 
-        perms = {"posts:read", "posts:edit", "posts:create"}
+        with pytest.raises(InsufficientPermission):
+            await auth_service.check_authorization(
+                test_session, test_redis, test_user, {"posts:delete", "posts:update"}
+            )
 
-        await test_redis.sadd(f"users_perms:{user.id}", *perms)
+    async def test_authorization_user_without_role(
+        self, auth_service: AuthService, test_session, test_redis
+    ):
+        """Check authorization raise InsufficientPermission for users without a role."""
+        user = User(username=VALID_USERNAME, email=VALID_EMAIL)
+        user.id = 1
 
         with pytest.raises(InsufficientPermission):
             await auth_service.check_authorization(
-                test_request, user, {"posts:delete", "posts:update"}
+                test_session, test_redis, user, {"posts:read"}
+            )
+
+
+class TestAuthServicePermissions:
+    @pytest.fixture
+    async def roles(self, test_session, test_user_role, test_mod_role, test_adm_role):
+        await init_permissions(test_session)
+        return test_user_role, test_mod_role, test_adm_role
+
+    async def test_read_through(
+        self, auth_service: AuthService, test_session, test_redis, roles
+    ):
+        """Permissions are read from the database once, then from cache."""
+        user_role = roles[0]
+        perms = await auth_service.get_role_permissions(
+            test_session, test_redis, user_role.id
+        )
+        assert perms == USER_PERMISSIONS
+
+        async def load(*args):
+            raise AssertionError("permissions should be cached")
+
+        auth_service._load_role_permissions = load  # type: ignore
+        assert (
+            await auth_service.get_role_permissions(
+                test_session, test_redis, user_role.id
+            )
+            == USER_PERMISSIONS
+        )
+
+    async def test_warmup(
+        self, auth_service: AuthService, test_session, test_redis, roles
+    ):
+        """Every role is cached at once."""
+        await auth_service.warm_permissions(test_session, test_redis)
+
+        for role, perms in zip(roles, DEFAULT_PERMISSIONS.values()):
+            assert await cache_repo.get_role_permissions(test_redis, role.id) == perms
+
+    async def test_init_permissions_after_another_worker(
+        self,
+        auth_service: AuthService,
+        test_session,
+        test_redis,
+        test_user_role,
+        monkeypatch,
+    ):
+        """Rows seeded by another worker after the check are skipped."""
+        perm = Permission(name="posts:create", roles=[test_user_role])
+        test_session.add(perm)
+        await test_session.flush()
+
+        async def scalar(*args, **kwargs):
+            return None
+
+        monkeypatch.setattr(test_session, "scalar", scalar)
+        await init_permissions(test_session)
+        monkeypatch.undo()
+
+        perms = await auth_service.get_role_permissions(
+            test_session, test_redis, test_user_role.id
+        )
+        assert perms == USER_PERMISSIONS
+
+    async def test_role_without_permissions(
+        self, auth_service: AuthService, test_session, test_redis, test_user_role
+    ):
+        """A role without permissions is cached as an empty set."""
+        perms = await auth_service.get_role_permissions(
+            test_session, test_redis, test_user_role.id
+        )
+
+        assert perms == set()
+        assert (
+            await cache_repo.get_role_permissions(test_redis, test_user_role.id)
+            == set()
+        )
+
+    async def test_set_role_permissions_invalidates_cache(
+        self, auth_service: AuthService, test_session, test_redis, roles
+    ):
+        """Changing the permissions of a role drops the cached ones."""
+        user_role = roles[0]
+        await auth_service.warm_permissions(test_session, test_redis)
+
+        await auth_service.set_role_permissions(
+            test_session, user_role.id, {"posts:create"}
+        )
+        await outbox.relay(test_session, test_redis)
+
+        perms = await auth_service.get_role_permissions(
+            test_session, test_redis, user_role.id
+        )
+        assert perms == {"posts:create"}
+
+    async def test_set_role_permissions_unknown(
+        self, auth_service: AuthService, test_session, roles
+    ):
+        """Unknown roles and permissions are rejected."""
+        with pytest.raises(RoleDoesNotExist):
+            await auth_service.set_role_permissions(test_session, 42, {"posts:create"})
+        with pytest.raises(PermissionDoesNotExist):
+            await auth_service.set_role_permissions(
+                test_session, roles[0].id, {"posts:fly"}
+            )
+
+    async def test_set_user_role_invalidates_user(
+        self, auth_service: AuthService, test_session, test_redis, test_user, roles
+    ):
+        """Changing the role of a user drops the cached user."""
+        await auth_service.get_cached(test_session, test_redis, test_user.id)
+
+        await auth_service.set_user_role(
+            test_session, test_redis, test_user.id, roles[1].id
+        )
+        await outbox.relay(test_session, test_redis)
+
+        assert await cache_repo.get_user(test_redis, test_user.id) is None
+        user = await auth_service.get_cached(test_session, test_redis, test_user.id)
+        assert user.is_moderator()
+
+
+class TestRoleClaimDependency:
+    @pytest.fixture
+    def test_request(self, mock_request, test_redis):
+        mock_request.app.state.cache = test_redis
+        return mock_request
+
+    def claims(self, user_id: int, role: str) -> TokenData:
+        return TokenData(sub=str(user_id), exp=datetime.now(timezone.utc), role=role)
+
+    async def test_allowed_from_claims(self, test_request):
+        """A moderator claim is trusted without loading the user."""
+        claims = self.claims(1, "moderator")
+
+        assert await get_moderator_claims(None, test_request, claims) is claims  # type: ignore
+
+    async def test_forbidden_from_claims(self, test_request):
+        """A user claim is rejected on moderator routes."""
+        with pytest.raises(HTTPException) as exc:
+            await get_moderator_claims(None, test_request, self.claims(1, "user"))  # type: ignore
+        assert exc.value.status_code == 403
+
+    async def test_admin_claims(self, test_request):
+        """Moderators are rejected on admin routes."""
+        await get_admin_claims(None, test_request, self.claims(1, "admin"))  # type: ignore
+        with pytest.raises(HTTPException):
+            await get_admin_claims(None, test_request, self.claims(1, "moderator"))  # type: ignore
+
+    async def test_demoted_user(
+        self,
+        auth_service: AuthService,
+        test_session,
+        test_redis,
+        test_request,
+        test_mod,
+        test_user_role,
+    ):
+        """A demoted user's previous moderator claim is no longer trusted."""
+        claims = self.claims(test_mod.id, "moderator")
+        await get_moderator_claims(test_session, test_request, claims)
+
+        await auth_service.set_user_role(
+            test_session, test_redis, test_mod.id, test_user_role.id
+        )
+
+        with pytest.raises(HTTPException) as exc:
+            await get_moderator_claims(test_session, test_request, claims)
+        assert exc.value.status_code == 403
+
+
+class TestAuthServiceGetCached:
+    async def test_cache_miss_loads_from_database(
+        self, auth_service: AuthService, test_session, test_redis, test_user
+    ):
+        """The user is loaded from the database and cached."""
+        user = await auth_service.get_cached(test_session, test_redis, test_user.id)
+
+        assert user is test_user
+        assert await test_redis.get(f"user:{test_user.id}") is not None
+
+    async def test_cache_hit_skips_database(
+        self,
+        auth_service: AuthService,
+        test_engine,
+        test_session,
+        test_redis,
+        test_user,
+    ):
+        """A cached user is returned without querying the database."""
+        await auth_service.get_cached(test_session, test_redis, test_user.id)
+        await test_session.commit()
+
+        async with AsyncSession(test_engine, expire_on_commit=False) as session:
+            queries = []
+            event.listen(
+                test_engine.sync_engine,
+                "before_cursor_execute",
+                lambda *args: queries.append(args[2]),
             )
+            user = await auth_service.get_cached(session, test_redis, test_user.id)
+
+        assert queries == []
+        assert user is not None
+        assert user.username == VALID_USERNAME
+        assert user.role.name == "User"
+        assert not user.is_moderator()
+
+    async def test_cached_user_can_author_a_thread(
+        self,
+        auth_service: AuthService,
+        test_engine,
+        test_session,
+        test_redis,
+        test_user,
+    ):
+        """A cached user can be used as the author of new rows."""
+        cat = Category(name="Test Category", order=1)
+        forum = Forum(name="Test Forum", order=1, category=cat)
+        test_session.add(forum)
+        await auth_service.get_cached(test_session, test_redis, test_user.id)
+        await test_session.commit()
+
+        async with AsyncSession(test_engine, expire_on_commit=False) as session:
+            user = await auth_service.get_cached(session, test_redis, test_user.id)
+            thread = Thread(title="Test", content="content", forum_id=forum.id)
+            thread.author = user  # type: ignore
+            session.add(thread)
+            await session.flush()
+
+            n_users = await session.scalar(select(func.count()).select_from(User))
+
+        assert thread.author_id == test_user.id
+        assert n_users == 1
+
+    async def test_unknown_user(
+        self, auth_service: AuthService, test_session, test_redis
+    ):
+        """None is returned for unknown users and nothing is cached."""
+        user = await auth_service.get_cached(test_session, test_redis, 42)
+
+        assert user is None
+        assert await test_redis.get("user:42") is None
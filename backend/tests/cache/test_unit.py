@@ -1,7 +1,37 @@
+import asyncio
+import time
+
 import pytest
+from sqlalchemy import select
 
 from forum.auth.schemas import UserRead
-from forum.cache.repository import RECENT_USERS_KEY, CacheRepository
+from forum.category.models import Category
+from forum.forum.models import Forum
+from forum.outbox.service import outbox
+from forum.post.models import Post
+from forum.post.schemas import PostCreate
+from forum.post.service import PostService
+from forum.thread.models import Thread
+from forum.cache.local import LocalCache
+from forum.cache.reconcile import (
+    RECONCILE_CURSOR_KEY,
+    RECONCILE_SUSPECTS_KEY,
+    CounterReconciler,
+)
+from forum.cache.write_behind import WriteBehindCounters
+from forum.cache.repository import (
+    COUNTERS_VERSION,
+    COUNTERS_VERSION_KEY,
+    FORUM_INDEX_CHANGED,
+    NUM_POSTS_PER_FORUM,
+    NUM_POSTS_PER_USER,
+    POST_CREATED,
+    RECENT_USERS_KEY,
+    THREAD_CREATED,
+    USER_CREATED,
+    WARMUP_LOCK_KEY,
+    CacheRepository,
+)
 from tests.conftest import VALID_USERNAME
 
 
@@ -10,12 +40,16 @@ def cache_repo():
     return CacheRepository()
 
 
-class TestCachePushRecentUser:
+def user_created(user: UserRead) -> tuple[str, dict]:
+    return (USER_CREATED, {"user": user.model_dump(mode="json")})
+
+
+class TestCacheUserCreated:
     async def test_push_to_empty_list(
         self, cache_repo: CacheRepository, test_redis, test_readuser
     ):
         """Recent list should contain only the newly added user."""
-        await cache_repo.push_recent_user(test_redis, test_readuser)
+        await cache_repo.apply_events(test_redis, [user_created(test_readuser)])
 
         recent_users = await test_redis.lrange(RECENT_USERS_KEY, 0, -1)
 
@@ -26,9 +60,9 @@ class TestCachePushRecentUser:
         self, cache_repo: CacheRepository, test_redis, test_readuser
     ):
         """Recent list should contain the two newly added user in the correct order."""
-        await cache_repo.push_recent_user(test_redis, test_readuser)
+        await cache_repo.apply_events(test_redis, [user_created(test_readuser)])
         test_readuser.username = "username2"
-        await cache_repo.push_recent_user(test_redis, test_readuser)
+        await cache_repo.apply_events(test_redis, [user_created(test_readuser)])
 
         recent_users = await test_redis.lrange(RECENT_USERS_KEY, 0, -1)
 
@@ -44,15 +78,15 @@ class TestCachePushRecentUser:
     ):
         """Recent list should contain the exactly max number of recent users and in correct order."""
         monkeypatch.setattr("forum.cache.repository.LAST_N", 5)
-        await cache_repo.push_recent_user(test_redis, test_readuser)
+        await cache_repo.apply_events(test_redis, [user_created(test_readuser)])
         test_readuser.username = "username2"
-        await cache_repo.push_recent_user(test_redis, test_readuser)
+        await cache_repo.apply_events(test_redis, [user_created(test_readuser)])
         test_readuser.username = "username3"
-        await cache_repo.push_recent_user(test_redis, test_readuser)
+        await cache_repo.apply_events(test_redis, [user_created(test_readuser)])
         test_readuser.username = "username4"
-        await cache_repo.push_recent_user(test_redis, test_readuser)
+        await cache_repo.apply_events(test_redis, [user_created(test_readuser)])
         test_readuser.username = "username5"
-        await cache_repo.push_recent_user(test_redis, test_readuser)
+        await cache_repo.apply_events(test_redis, [user_created(test_readuser)])
 
         recent_users = await test_redis.lrange(RECENT_USERS_KEY, 0, -1)
 
@@ -71,13 +105,13 @@ class TestCachePushRecentUser:
         """Recent list should contain the max number of recent users and in correct order."""
 
         monkeypatch.setattr("forum.cache.repository.LAST_N", 3)
-        await cache_repo.push_recent_user(test_redis, test_readuser)
+        await cache_repo.apply_events(test_redis, [user_created(test_readuser)])
         test_readuser.username = "username2"
-        await cache_repo.push_recent_user(test_redis, test_readuser)
+        await cache_repo.apply_events(test_redis, [user_created(test_readuser)])
         test_readuser.username = "username3"
-        await cache_repo.push_recent_user(test_redis, test_readuser)
+        await cache_repo.apply_events(test_redis, [user_created(test_readuser)])
         test_readuser.username = "username4"
-        await cache_repo.push_recent_user(test_redis, test_readuser)
+        await cache_repo.apply_events(test_redis, [user_created(test_readuser)])
 
         recent_users = await test_redis.lrange(RECENT_USERS_KEY, 0, -1)
 
@@ -102,7 +136,7 @@ class TestCacheGetRecentUsers:
         self, cache_repo: CacheRepository, test_redis, test_readuser
     ):
         """Return the only user."""
-        await cache_repo.push_recent_user(test_redis, test_readuser)
+        await cache_repo.apply_events(test_redis, [user_created(test_readuser)])
 
         recent_users = await cache_repo.get_recent_users(test_redis)
         assert len(recent_users) == 1
@@ -113,11 +147,11 @@ class TestCacheGetRecentUsers:
     ):
         """Return the exactly max number of recent users."""
         monkeypatch.setattr("forum.cache.repository.LAST_N", 3)
-        await cache_repo.push_recent_user(test_redis, test_readuser)
+        await cache_repo.apply_events(test_redis, [user_created(test_readuser)])
         test_readuser.username = "username2"
-        await cache_repo.push_recent_user(test_redis, test_readuser)
+        await cache_repo.apply_events(test_redis, [user_created(test_readuser)])
         test_readuser.username = "username3"
-        await cache_repo.push_recent_user(test_redis, test_readuser)
+        await cache_repo.apply_events(test_redis, [user_created(test_readuser)])
 
         recent_users = await cache_repo.get_recent_users(test_redis)
 
@@ -131,14 +165,444 @@ class TestCacheGetRecentUsers:
     ):
         """Return the exactly max number of recent users when it was added more than the max."""
         monkeypatch.setattr("forum.cache.repository.LAST_N", 2)
-        await cache_repo.push_recent_user(test_redis, test_readuser)
+        await cache_repo.apply_events(test_redis, [user_created(test_readuser)])
         test_readuser.username = "username2"
-        await cache_repo.push_recent_user(test_redis, test_readuser)
+        await cache_repo.apply_events(test_redis, [user_created(test_readuser)])
         test_readuser.username = "username3"
-        await cache_repo.push_recent_user(test_redis, test_readuser)
+        await cache_repo.apply_events(test_redis, [user_created(test_readuser)])
 
         recent_users = await cache_repo.get_recent_users(test_redis)
 
         assert len(recent_users) == 2
         assert recent_users[0].username == "username3"
         assert recent_users[1].username == "username2"
+
+
+class TestCacheForumsRead:
+    async def test_read_no_forums(self, cache_repo: CacheRepository, test_redis):
+        """Empty list should be returned."""
+        assert await cache_repo.on_forums_read(test_redis, []) == []
+
+    async def test_read_counters_in_order(
+        self, cache_repo: CacheRepository, test_redis
+    ):
+        """Counters are returned in the same order as the forum ids."""
+        await cache_repo.apply_events(
+            test_redis,
+            [
+                (POST_CREATED, {"user_id": 1, "forum_id": 1}),
+                (POST_CREATED, {"user_id": 1, "forum_id": 2}),
+                (POST_CREATED, {"user_id": 1, "forum_id": 2}),
+                (THREAD_CREATED, {"forum_id": 2}),
+            ],
+        )
+
+        counters = await cache_repo.on_forums_read(test_redis, [2, 1])
+
+        assert counters == [(2, 1), (1, 0)]
+
+    async def test_read_forum_without_counters(
+        self, cache_repo: CacheRepository, test_redis
+    ):
+        """Forums without cached counters have zero posts and threads."""
+        counters = await cache_repo.on_forums_read(test_redis, [1])
+
+        assert counters == [(0, 0)]
+
+
+class TestLocalCache:
+    def test_get_missing(self):
+        """None is returned for missing keys."""
+        assert LocalCache(max_size=2, ttl=10).get("key") is None
+
+    def test_set_and_get(self):
+        """A stored value is returned."""
+        local = LocalCache(max_size=2, ttl=10)
+        local.set("key", "value")
+
+        assert local.get("key") == "value"
+
+    def test_expired_value(self, monkeypatch):
+        """Values are dropped after the TTL."""
+        local = LocalCache(max_size=2, ttl=10)
+        local.set("key", "value")
+
+        now = time.monotonic()
+        monkeypatch.setattr("forum.cache.local.time.monotonic", lambda: now + 11)
+
+        assert local.get("key") is None
+
+    def test_least_recently_used_evicted(self):
+        """The least recently used value is evicted above max size."""
+        local = LocalCache(max_size=2, ttl=10)
+        local.set("a", "1")
+        local.set("b", "2")
+        local.get("a")
+        local.set("c", "3")
+
+        assert local.get("a") == "1"
+        assert local.get("b") is None
+        assert local.get("c") == "3"
+
+    async def test_invalidation_reaches_other_workers(self, test_redis):
+        """An invalidation from one worker drops the value in another one."""
+        worker1 = LocalCache(max_size=2, ttl=10)
+        worker2 = LocalCache(max_size=2, ttl=10)
+        listener = asyncio.create_task(worker2.listen(test_redis))
+        await asyncio.sleep(0.1)
+        worker1.set("key", "value")
+        worker2.set("key", "value")
+
+        await worker1.invalidate(test_redis, "key")
+        await asyncio.sleep(0.1)
+        listener.cancel()
+
+        assert worker1.get("key") is None
+        assert worker2.get("key") is None
+
+
+class TestCacheRepositoryLocal:
+    async def test_forum_index_read_from_local_cache(self, test_redis):
+        """Once read, the forum index is served without Redis."""
+        repo = CacheRepository(LocalCache(max_size=2, ttl=10))
+        await repo.set_forum_index(test_redis, [1, 2], ['{"id":1', '{"id":2'])
+        await test_redis.flushall()
+
+        assert await repo.get_forum_index(test_redis) == (
+            [1, 2],
+            ['{"id":1', '{"id":2'],
+        )
+
+    async def test_empty_forum_index(self, test_redis):
+        """An index without forums is cached too."""
+        repo = CacheRepository(LocalCache(max_size=2, ttl=10))
+        await repo.set_forum_index(test_redis, [], [])
+
+        assert await repo.get_forum_index(test_redis) == ([], [])
+
+    async def test_forum_index_invalidated(self, test_redis):
+        """Invalidating the forum index drops it from both caches."""
+        repo = CacheRepository(LocalCache(max_size=2, ttl=10))
+        await repo.set_forum_index(test_redis, [], [])
+        await repo.apply_events(test_redis, [(FORUM_INDEX_CHANGED, {})])
+
+        assert await repo.get_forum_index(test_redis) is None
+
+
+class TestCacheWarmup:
+    @pytest.fixture
+    def loads(self, cache_repo: CacheRepository, monkeypatch):
+        """Count the loads from the database."""
+        loads = []
+
+        async def load_from_db(cache, db_session):
+            loads.append(db_session)
+
+        monkeypatch.setattr(cache_repo, "load_from_db", load_from_db)
+        return loads
+
+    async def test_warmup_loads_counters(
+        self, cache_repo: CacheRepository, test_redis, test_session, loads
+    ):
+        """Counters are loaded and marked with the current version."""
+        assert await cache_repo.warmup(test_redis, test_session, lock_ttl=10)
+
+        assert len(loads) == 1
+        assert await test_redis.get(COUNTERS_VERSION_KEY) == COUNTERS_VERSION
+        assert await test_redis.get(WARMUP_LOCK_KEY) is None
+
+    async def test_warmup_once(
+        self, cache_repo: CacheRepository, test_redis, test_session, loads
+    ):
+        """Counters already loaded with the current version are not loaded again."""
+        await cache_repo.warmup(test_redis, test_session, lock_ttl=10)
+
+        assert not await cache_repo.warmup(test_redis, test_session, lock_ttl=10)
+        assert len(loads) == 1
+
+    async def test_warmup_outdated_version(
+        self, cache_repo: CacheRepository, test_redis, test_session, loads
+    ):
+        """Counters loaded by another version are loaded again."""
+        await test_redis.set(COUNTERS_VERSION_KEY, "0")
+
+        assert await cache_repo.warmup(test_redis, test_session, lock_ttl=10)
+        assert len(loads) == 1
+
+    async def test_warmup_locked(
+        self, cache_repo: CacheRepository, test_redis, test_session, loads
+    ):
+        """Workers skip the warmup while another one is loading the counters."""
+        await test_redis.set(WARMUP_LOCK_KEY, "other worker")
+
+        assert not await cache_repo.warmup(test_redis, test_session, lock_ttl=10)
+        assert loads == []
+        assert await test_redis.get(WARMUP_LOCK_KEY) == "other worker"
+
+    async def test_failed_warmup_releases_lock(
+        self, cache_repo: CacheRepository, test_redis, test_session, monkeypatch
+    ):
+        """A failed warmup can be retried, and is not marked as done."""
+
+        async def load_from_db(cache, db_session):
+            raise RuntimeError
+
+        monkeypatch.setattr(cache_repo, "load_from_db", load_from_db)
+
+        with pytest.raises(RuntimeError):
+            await cache_repo.warmup(test_redis, test_session, lock_ttl=10)
+        assert await test_redis.get(WARMUP_LOCK_KEY) is None
+        assert await test_redis.get(COUNTERS_VERSION_KEY) is None
+
+
+class TestCacheLoadFromDb:
+    @pytest.fixture
+    async def forums(self, test_session, test_user, test_user2):
+        """Three forums with one thread each, the first one with three posts."""
+        c = Category(name="Test Category", order=1)
+        forums = []
+        for i in range(3):
+            f = Forum(name=f"Forum {i}", order=i, category=c)
+            t = Thread(title="Test", forum=f, content="content", author=test_user)
+            test_session.add(t)
+            forums.append(f)
+        await test_session.flush()
+        for author in (test_user, test_user, test_user2):
+            test_session.add(
+                Post(content="content", thread=forums[0].threads[0], author=author)
+            )
+        await test_session.flush()
+        return forums
+
+    async def test_load_counters(
+        self, cache_repo: CacheRepository, test_redis, test_session, forums
+    ):
+        """Counters of every forum and user are loaded."""
+        await cache_repo.load_from_db(test_redis, test_session)
+
+        counters = await cache_repo.on_forums_read(test_redis, [f.id for f in forums])
+        assert counters == [(3, 1), (0, 1), (0, 1)]
+        assert (
+            await test_redis.get(
+                f"{NUM_POSTS_PER_USER}:{forums[0].threads[0].author_id}"
+            )
+            == "2"
+        )
+
+    async def test_load_in_chunks(
+        self,
+        cache_repo: CacheRepository,
+        test_redis,
+        test_session,
+        forums,
+        monkeypatch,
+    ):
+        """Rows are written with one MSET per chunk."""
+        monkeypatch.setattr("forum.cache.repository.LOAD_CHUNK_SIZE", 2)
+        calls = []
+        pipeline = type(test_redis.pipeline())
+        mset = pipeline.mset
+
+        def spy(self, mapping):
+            calls.append(len(mapping))
+            return mset(self, mapping)
+
+        monkeypatch.setattr(pipeline, "mset", spy)
+
+        await cache_repo.load_from_db(test_redis, test_session)
+
+        # 3 forums with threads, 1 forum with posts, 2 users with posts
+        assert calls == [2, 1, 1, 2]
+        assert await test_redis.hlen(RECONCILE_SUSPECTS_KEY) == 6
+
+
+class TestCounterReconciler:
+    @pytest.fixture
+    async def forum(self, test_session, test_user):
+        """A forum with a thread and two posts of the test user."""
+        c = Category(name="Test Category", order=1)
+        f = Forum(name="Forum", order=1, category=c, thread_count=1)
+        t = Thread(
+            title="Test", forum=f, content="content", author=test_user, reply_count=2
+        )
+        test_session.add_all(
+            [Post(content="content", thread=t, author=test_user) for _ in range(2)]
+        )
+        await test_session.flush()
+        return f
+
+    async def test_consistent_counters(
+        self, cache_repo: CacheRepository, test_redis, test_session, forum, test_user
+    ):
+        """No drift is found in counters matching the database."""
+        await cache_repo.load_from_db(test_redis, test_session)
+
+        drift = await CounterReconciler(10, 60).reconcile(test_redis, test_session)
+
+        assert drift == 0
+        stats = await CounterReconciler(10, 60).get_stats(test_redis)
+        assert stats["checked"] == 3
+        assert stats["drifted"] == 0
+
+    async def test_repair_drift(
+        self, cache_repo: CacheRepository, test_redis, test_session, forum, test_user
+    ):
+        """Drift seen on two passes in a row is set back to the database counts."""
+        await test_redis.set(f"{NUM_POSTS_PER_FORUM}:{forum.id}", 5)
+        await test_redis.set(f"{NUM_POSTS_PER_USER}:{test_user.id}", 1)
+
+        reconciler = CounterReconciler(10, 60)
+        assert await reconciler.reconcile(test_redis, test_session) == 0
+        assert await cache_repo.on_forums_read(test_redis, [forum.id]) == [(5, 0)]
+        drift = await reconciler.reconcile(test_redis, test_session)
+
+        # 3 posts too many, 1 thread and 1 user post missing
+        assert drift == 5
+        assert await cache_repo.on_forums_read(test_redis, [forum.id]) == [(2, 1)]
+        assert await cache_repo.get_user_total_posts(test_redis, test_user.id) == "2"
+        assert not await test_redis.exists(RECONCILE_SUSPECTS_KEY)
+        stats = await reconciler.get_stats(test_redis)
+        assert stats == {
+            "passes": 2,
+            "checked": 6,
+            "suspected": 3,
+            "drifted": 3,
+            "drift": 5,
+            "repaired": 3,
+        }
+
+    async def test_forums_checked_against_denormalized_counters(
+        self, cache_repo: CacheRepository, test_redis, test_session, forum
+    ):
+        """Forum counters are compared with the thread and reply counts."""
+        forum.thread_count = 3
+        thread = await test_session.scalar(
+            select(Thread).where(Thread.forum_id == forum.id)
+        )
+        thread.reply_count = 5
+        await test_session.flush()
+
+        reconciler = CounterReconciler(10, 60)
+        for _ in range(2):
+            await reconciler.reconcile(test_redis, test_session)
+
+        assert await cache_repo.on_forums_read(test_redis, [forum.id]) == [(5, 3)]
+
+    async def test_pending_events_not_repaired(
+        self, cache_repo: CacheRepository, test_redis, test_session, forum, test_user
+    ):
+        """A post whose counter updates land between two passes is counted once."""
+        await cache_repo.load_from_db(test_redis, test_session)
+        thread_id = await test_session.scalar(
+            select(Thread.id).where(Thread.forum_id == forum.id)
+        )
+        await PostService().create(
+            test_session, PostCreate(thread_id=thread_id, content="new"), test_user
+        )
+        await test_session.commit()
+
+        reconciler = CounterReconciler(10, 60)
+        assert await reconciler.reconcile(test_redis, test_session) == 0
+        await outbox.relay(test_session, test_redis)
+        assert await reconciler.reconcile(test_redis, test_session) == 0
+
+        assert await cache_repo.on_forums_read(test_redis, [forum.id]) == [(3, 1)]
+        assert await cache_repo.get_user_total_posts(test_redis, test_user.id) == "3"
+        assert not await test_redis.exists(RECONCILE_SUSPECTS_KEY)
+
+    async def test_suspects_checked_outside_slice(
+        self, cache_repo: CacheRepository, test_redis, test_session, test_user
+    ):
+        """Suspects are checked again on the next pass, whatever the slice."""
+        await test_redis.set(f"{NUM_POSTS_PER_USER}:{test_user.id}", 4)
+        reconciler = CounterReconciler(1, 60)
+        await reconciler.reconcile(test_redis, test_session)
+
+        # The next slice starts over, after the only user
+        assert await reconciler.reconcile(test_redis, test_session) == 4
+        assert await cache_repo.get_user_total_posts(test_redis, test_user.id) == "0"
+
+    async def test_rotating_slices(
+        self, test_redis, test_session, test_user, test_user2
+    ):
+        """Each pass checks the next users, and starts over after the last one."""
+        reconciler = CounterReconciler(1, 60)
+        for _ in range(3):
+            await reconciler.reconcile(test_redis, test_session)
+
+        stats = await reconciler.get_stats(test_redis)
+        assert stats["checked"] == 3
+        assert await test_redis.hget(RECONCILE_CURSOR_KEY, "users") == str(test_user.id)
+
+
+class TestWriteBehindCounters:
+    async def test_increments_coalesced(self, test_redis):
+        """Increments of a key are written as a single INCRBY."""
+        counters = WriteBehindCounters(window=0.05)
+        counters.incr("a")
+        counters.incr("a", 2)
+        counters.incr("b", -1)
+
+        assert await counters.flush(test_redis) == 2
+        assert await test_redis.get("a") == "3"
+        assert await test_redis.get("b") == "-1"
+        stats = counters.get_stats()
+        assert stats["increments"] == 3
+        assert stats["flushes"] == 1
+        assert stats["keys_flushed"] == 2
+        assert stats["pending"] == 0
+
+    async def test_cancelled_increments_skipped(self, test_redis):
+        """Keys whose increments cancel out are not written."""
+        counters = WriteBehindCounters(window=0.05)
+        counters.incr("a")
+        counters.incr("a", -1)
+
+        assert await counters.flush(test_redis) == 0
+        assert await test_redis.get("a") is None
+
+    async def test_failed_flush_kept(self, test_redis, monkeypatch):
+        """Increments are kept for the next flush when Redis fails."""
+        counters = WriteBehindCounters(window=0.05)
+        counters.incr("a")
+        monkeypatch.setattr(test_redis, "pipeline", lambda **kwargs: 1 / 0)
+
+        with pytest.raises(ZeroDivisionError):
+            await counters.flush(test_redis)
+        monkeypatch.undo()
+        counters.incr("a")
+
+        assert await counters.flush(test_redis) == 1
+        assert await test_redis.get("a") == "2"
+
+    async def test_repository_buffers_counters(self, test_redis):
+        """Counters of a repository with write-behind change once flushed."""
+        counters = WriteBehindCounters(window=0.05)
+        repo = CacheRepository(counters=counters)
+        event = (POST_CREATED, {"user_id": 1, "forum_id": 1})
+        await repo.apply_events(test_redis, [event, event])
+
+        assert await repo.on_forums_read(test_redis, [1]) == [(0, 0)]
+        await counters.flush(test_redis)
+        assert await repo.on_forums_read(test_redis, [1]) == [(2, 0)]
+        assert await repo.get_user_total_posts(test_redis, 1) == "2"
+
+    async def test_unbuffered_events_written(self, test_redis):
+        """Counters of unbuffered events, from the outbox, are written at once."""
+        counters = WriteBehindCounters(window=0.05)
+        repo = CacheRepository(counters=counters)
+        event = (POST_CREATED, {"user_id": 1, "forum_id": 1})
+        await repo.apply_events(test_redis, [event], buffered=False)
+
+        assert await repo.on_forums_read(test_redis, [1]) == [(1, 0)]
+        assert counters.get_stats()["pending"] == 0
+
+    async def test_flushed_every_window(self, test_redis):
+        """Buffered increments are written without an explicit flush."""
+        counters = WriteBehindCounters(window=0.01)
+        flusher = asyncio.create_task(counters.run(test_redis))
+        counters.incr("a")
+        await asyncio.sleep(0.05)
+        flusher.cancel()
+
+        assert await test_redis.get("a") == "1"
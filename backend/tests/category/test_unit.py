@@ -1,8 +1,10 @@
 import pytest
 
+from forum.cache.repository import cache_repo
 from forum.category.exceptions import CategoryAlreadyExists
 from forum.category.schemas import CategoryCreate
 from forum.category.service import CategoryService
+from forum.outbox.service import outbox
 
 
 @pytest.fixture()
@@ -147,3 +149,17 @@ class TestCategoryDelete:
 
         res = await cat_service.list(test_session)
         assert len(res) == 1
+
+    async def test_delete_drops_forum_index(
+        self, cat_service: CategoryService, test_session, test_redis
+    ):
+        """The cached forum index is dropped once the deletion is relayed."""
+        sample = CategoryCreate(name="General", order=1)
+        sample = await cat_service.create(test_session, sample)
+        await outbox.relay(test_session, test_redis)
+        await cache_repo.set_forum_index(test_redis, [], [])
+
+        await cat_service.delete(test_session, sample.id)
+        await outbox.relay(test_session, test_redis)
+
+        assert await cache_repo.get_forum_index(test_redis) is None
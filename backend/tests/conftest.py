@@ -1,16 +1,21 @@
+from contextlib import contextmanager
 from typing import Any, AsyncGenerator
 from unittest.mock import MagicMock
 
 import pytest
 from fakeredis.aioredis import FakeRedis
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 import forum.auth.models  # noqa: F401
 from forum.auth.schemas import UserCreate, UserRead
 import forum.forum.models  # noqa: F401
+import forum.outbox.models  # noqa: F401
 import forum.post.models  # noqa: F401
 import forum.thread.models  # noqa: F401
 from forum.auth.models import Role, User, hash_password
+from forum.cache.local import local_cache
+from forum.cache.write_behind import write_behind
 from forum.database.core import Base
 
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
@@ -45,11 +50,47 @@ async def test_session(test_engine) -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+@pytest.fixture
+def count_statements(test_engine):
+    """Collect the SQL statements sent to the database inside a `with` block."""
+
+    @contextmanager
+    def count():
+        statements: list[str] = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(
+            test_engine.sync_engine, "before_cursor_execute", before_cursor_execute
+        )
+        try:
+            yield statements
+        finally:
+            event.remove(
+                test_engine.sync_engine, "before_cursor_execute", before_cursor_execute
+            )
+
+    return count
+
+
 @pytest.fixture
 async def test_redis():
     return FakeRedis(decode_responses=True)
 
 
+@pytest.fixture(autouse=True)
+def clear_local_cache():
+    """The in-process cache outlives a test, start every test with it empty."""
+    local_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_write_behind():
+    """Buffered increments outlive a test, start every test without any."""
+    write_behind.clear()
+
+
 @pytest.fixture
 def user_data() -> dict[str, Any]:
     return {
@@ -0,0 +1,271 @@
+import pytest
+from fastapi import Response
+from sqlalchemy import create_engine, event, exc, func, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import QueuePool
+
+from forum.auth.models import Role
+from forum.category.models import Category  # noqa
+from forum.database import core
+from forum.database.iam import IamTokenCache, use_iam_auth
+from forum.database.pool import TimedQueuePool, get_pool_stats
+from forum.database.replica import (
+    ReplicaLagMonitor,
+    has_recent_write,
+    mark_recent_write,
+)
+from forum.exceptions import ReadOnlySessionWrite
+from forum.forum.models import Forum  # noqa
+from forum.post.models import Post  # noqa
+from forum.thread.models import Thread  # noqa
+
+
+class FakeTokenProvider:
+    """Local stand-in for the RDS token generation."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self) -> str:
+        self.calls += 1
+        return f"token-{self.calls}"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def provider():
+    return FakeTokenProvider()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class TestIamTokenCache:
+    def test_token_is_reused(self, provider, clock):
+        """A token is generated once and reused while valid."""
+        tokens = IamTokenCache(provider, ttl=900, refresh_margin=300, clock=clock)
+
+        assert tokens.get() == "token-1"
+        clock.now = 599
+        assert tokens.get() == "token-1"
+        assert provider.calls == 1
+
+    def test_token_is_refreshed_before_expiring(self, provider, clock):
+        """A new token is generated once the old one is close to expiring."""
+        tokens = IamTokenCache(provider, ttl=900, refresh_margin=300, clock=clock)
+        tokens.get()
+
+        clock.now = 600
+        assert tokens.get() == "token-2"
+        clock.now = 1199
+        assert tokens.get() == "token-2"
+        assert provider.calls == 2
+
+
+class TestUseIamAuth:
+    @pytest.fixture
+    def engine(self, provider, clock):
+        engine = create_engine("sqlite://", poolclass=QueuePool, pool_size=5)
+        use_iam_auth(engine, IamTokenCache(provider, clock=clock))
+        engine.passwords = []  # type: ignore
+
+        @event.listens_for(engine, "do_connect")
+        def capture_password(dialect, conn_rec, cargs, cparams):
+            # sqlite takes no password, keep it for the assertions instead
+            engine.passwords.append(cparams.pop("password"))  # type: ignore
+
+        yield engine
+        engine.dispose()
+
+    def test_connections_get_the_cached_token(self, engine, provider):
+        """Every new connection is authenticated with the same token."""
+        conns = [engine.connect() for _ in range(5)]
+        for conn in conns:
+            conn.execute(text("SELECT 1"))
+            conn.close()
+
+        assert engine.passwords == ["token-1"] * 5
+        assert provider.calls == 1
+
+    def test_new_connections_get_a_fresh_token(self, engine, provider, clock):
+        """Connections opened after a refresh use the new token, without a new engine."""
+        with engine.connect():
+            pass
+        engine.dispose()
+        clock.now = 15 * 60
+
+        with engine.connect():
+            pass
+
+        assert engine.passwords == ["token-1", "token-2"]
+
+
+class TestTimedQueuePool:
+    @pytest.fixture
+    async def engine(self):
+        engine = create_async_engine(
+            "sqlite+aiosqlite://",
+            poolclass=TimedQueuePool,
+            pool_size=1,
+            max_overflow=1,
+            pool_timeout=0.05,
+        )
+        yield engine
+        await engine.dispose()
+
+    async def test_stats(self, engine):
+        """Checked out, idle and overflow connections are counted."""
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            async with engine.connect() as other:
+                await other.execute(text("SELECT 1"))
+                stats = get_pool_stats(engine.pool)
+                assert stats["checked_out"] == 2
+                assert stats["overflow"] == 1
+
+        stats = get_pool_stats(engine.pool)
+        assert stats["checked_out"] == 0
+        assert stats["idle"] == 1
+        assert stats["checkouts"] == 2
+
+    async def test_timeouts(self, engine):
+        """Checkouts timing out on an exhausted pool are counted with their wait."""
+        async with engine.connect(), engine.connect():
+            with pytest.raises(exc.TimeoutError):
+                async with engine.connect():
+                    pass
+
+        stats = get_pool_stats(engine.pool)
+        assert stats["timeouts"] == 1
+        assert stats["max_wait_ms"] >= 50
+
+
+class TestReplicaLagMonitor:
+    @pytest.fixture
+    def monitor(self, clock, monkeypatch):
+        monitor = ReplicaLagMonitor(max_lag=5, interval=10, clock=clock)
+        monitor.measures = []  # type: ignore
+
+        async def measure(engine):
+            monitor.measures.append(clock.now)  # type: ignore
+            return monitor.next_lag  # type: ignore
+
+        monkeypatch.setattr(monitor, "_measure", measure)
+        return monitor
+
+    async def test_lag_is_measured_once_per_interval(self, monitor, clock):
+        """The lag is measured again only after the interval."""
+        monitor.next_lag = 1
+        assert not await monitor.is_lagging(None)
+        monitor.next_lag = 30
+        clock.now = 9
+        assert not await monitor.is_lagging(None)
+
+        clock.now = 10
+        assert await monitor.is_lagging(None)
+        assert monitor.measures == [0, 10]
+
+    async def test_unmeasurable_lag(self, clock):
+        """A replica whose lag cannot be measured is treated as lagging."""
+        engine = create_async_engine("sqlite+aiosqlite://")
+        monitor = ReplicaLagMonitor(max_lag=5, interval=10, clock=clock)
+
+        assert await monitor.is_lagging(engine)
+        await engine.dispose()
+
+
+class TestReadYourWrites:
+    def test_recent_write(self, mock_request):
+        """A client that just wrote reads from the primary."""
+        response = Response()
+        mark_recent_write(response)
+        name, value = response.headers["set-cookie"].split(";")[0].split("=")
+        mock_request.cookies = {name: value}
+
+        assert has_recent_write(mock_request)
+
+    def test_no_or_old_write(self, mock_request):
+        """Clients without a recent write read from the replica."""
+        mock_request.cookies = {}
+        assert not has_recent_write(mock_request)
+        mock_request.cookies = {"primary_until": "1"}
+        assert not has_recent_write(mock_request)
+        mock_request.cookies = {"primary_until": "garbage"}
+        assert not has_recent_write(mock_request)
+
+
+class TestReadOnlySession:
+    @pytest.fixture
+    def read_db(self, test_engine, mock_request, monkeypatch):
+        monkeypatch.setattr(core, "get_engine", lambda: test_engine)
+        monkeypatch.setattr(core, "_read_sessionlocals", {})
+        return core.get_read_db(mock_request)
+
+    async def test_reads(self, read_db, test_session, test_user_role):
+        """Read-only sessions read committed data."""
+        await test_session.commit()
+        session = await anext(read_db)
+
+        assert await session.scalar(select(func.count()).select_from(Role)) == 1
+        await read_db.aclose()
+
+    async def test_autocommit(self, read_db):
+        """Request sessions read in autocommit, without transaction statements."""
+        session = await anext(read_db)
+        conn = await session.connection()
+
+        options = conn.sync_connection.get_execution_options()
+        assert options["isolation_level"] == "AUTOCOMMIT"
+        await read_db.aclose()
+
+    async def test_flush_is_refused(self, read_db):
+        """Changes are never flushed from a read-only session."""
+        session = await anext(read_db)
+        session.add(Role(name="Sneaky"))
+
+        with pytest.raises(ReadOnlySessionWrite):
+            await session.flush()
+        await read_db.aclose()
+
+    async def test_no_commit(self, read_db, monkeypatch):
+        """The session is closed without committing."""
+        session = await anext(read_db)
+
+        async def commit():
+            raise AssertionError("read-only sessions should not commit")
+
+        monkeypatch.setattr(session, "commit", commit)
+        with pytest.raises(StopAsyncIteration):
+            await anext(read_db)
+
+    async def test_primary_read_ignores_replica(
+        self, test_engine, test_session, test_user_role, monkeypatch
+    ):
+        """Primary read sessions never use the replica."""
+        monkeypatch.setattr(core, "get_engine", lambda: test_engine)
+        monkeypatch.setattr(core, "_read_sessionlocals", {})
+        monkeypatch.setattr(
+            type(core.settings),
+            "DATABASE_REPLICA_URI",
+            property(lambda self: "postgresql://replica/forum"),
+        )
+
+        def get_replica_engine():
+            raise AssertionError("the replica should not be used")
+
+        monkeypatch.setattr(core, "get_replica_engine", get_replica_engine)
+        await test_session.commit()
+        read_db = core.get_primary_read_db()
+        session = await anext(read_db)
+
+        assert await session.scalar(select(func.count()).select_from(Role)) == 1
+        await read_db.aclose()
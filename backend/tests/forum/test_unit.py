@@ -1,11 +1,16 @@
+import json
 import pytest
 from sqlalchemy.exc import IntegrityError
 
+from forum.cache.repository import POST_CREATED, THREAD_CREATED, cache_repo
+from forum.cache.write_behind import write_behind
 from forum.category.schemas import CategoryCreate
 from forum.category.service import CategoryService
 from forum.forum.exceptions import CategoryDoesNotExist
 from forum.forum.schemas import ForumCreate
 from forum.forum.service import ForumService
+from forum.outbox.service import outbox
+from forum.thread.models import Thread
 
 
 @pytest.fixture()
@@ -145,3 +150,75 @@ class TestForumServiceList:
         assert forums[0].name == "Forum"
         assert forums[0].category.id == 1
         assert forums[0].category.name == "General"
+
+
+class TestForumServiceRebuildCounters:
+    async def test_rebuild_counters(
+        self, forum_service: ForumService, test_session, test_category, test_user
+    ):
+        """The thread counter is rebuilt from the threads of the forum."""
+        sample = ForumCreate(name="Forum", description="Cool forum", category_id=1)
+        forum = await forum_service.create(test_session, sample)
+        for _ in range(2):
+            test_session.add(
+                Thread(title="Test", content="content", forum=forum, author=test_user)
+            )
+        await test_session.flush()
+
+        await forum_service.rebuild_counters(test_session)
+        await test_session.refresh(forum)
+
+        assert forum.thread_count == 2
+
+
+class TestForumServiceGetIndex:
+    async def test_index_lists_forums(
+        self, forum_service: ForumService, test_session, test_category, test_redis
+    ):
+        """The index holds every forum with its category."""
+        sample = ForumCreate(name="Forum", description="Cool forum", category_id=1)
+        await forum_service.create(test_session, sample)
+
+        index = json.loads(await forum_service.get_index(test_session, test_redis))
+
+        assert len(index["data"]) == 1
+        assert index["data"][0]["name"] == "Forum"
+        assert index["data"][0]["category"]["name"] == "General"
+
+    async def test_index_served_from_cache(
+        self, forum_service: ForumService, test_session, test_category, test_redis
+    ):
+        """The index is not reloaded from the database until a change is relayed."""
+        sample = ForumCreate(name="Forum", description="Cool forum", category_id=1)
+        await forum_service.create(test_session, sample)
+        await forum_service.get_index(test_session, test_redis)
+
+        sample = ForumCreate(name="Forum 2", description="Cool forum", category_id=1)
+        await forum_service.create(test_session, sample)
+        index = json.loads(await forum_service.get_index(test_session, test_redis))
+        assert len(index["data"]) == 1
+
+        await outbox.relay(test_session, test_redis)
+        index = json.loads(await forum_service.get_index(test_session, test_redis))
+        assert len(index["data"]) == 2
+
+    async def test_index_has_live_counters(
+        self, forum_service: ForumService, test_session, test_category, test_redis
+    ):
+        """Counters are merged into the cached index on every read."""
+        sample = ForumCreate(name="Forum", description="Cool forum", category_id=1)
+        forum = await forum_service.create(test_session, sample)
+        await forum_service.get_index(test_session, test_redis)
+
+        await cache_repo.apply_events(
+            test_redis,
+            [
+                (THREAD_CREATED, {"forum_id": forum.id}),
+                (POST_CREATED, {"user_id": 1, "forum_id": forum.id}),
+            ],
+        )
+        await write_behind.flush(test_redis)
+        index = json.loads(await forum_service.get_index(test_session, test_redis))
+
+        assert index["data"][0]["n_threads"] == 1
+        assert index["data"][0]["n_posts"] == 1
@@ -0,0 +1,109 @@
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from forum.cache.local import LocalCache
+from forum.cache.repository import (
+    FORUM_INDEX_CHANGED,
+    FORUM_INDEX_KEY,
+    POST_CREATED,
+    CacheRepository,
+    cache_repo,
+)
+from forum.category.models import Category
+from forum.forum.models import Forum
+from forum.outbox.models import OutboxEvent
+from forum.outbox.service import OutboxService, outbox
+from forum.post.schemas import PostCreate
+from forum.post.service import post_service
+from forum.thread.models import Thread
+
+
+@pytest.fixture
+def relay():
+    return OutboxService(batch_size=2, interval=1)
+
+
+@pytest.fixture
+def sessionlocal(test_engine):
+    return async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+async def test_thread(test_session, test_user):
+    c = Category(name="Test Category", order=1)
+    f = Forum(name="Test Forum", order=1, category=c)
+    t = Thread(title="Test", forum=f, content="test content", author=test_user)
+    test_session.add(t)
+    await test_session.flush()
+    return t
+
+
+class TestOutbox:
+    async def test_counters_updated_once_relayed(
+        self, relay: OutboxService, test_session, test_redis, test_thread, test_user
+    ):
+        """
+        Creating a post leaves the counters as they are until relayed.
+        The relay writes them without going through the write-behind buffer.
+        """
+        p = PostCreate(thread_id=test_thread.id, content="content")
+        await post_service.create(test_session, p, test_user)
+
+        assert await cache_repo.get_user_total_posts(test_redis, test_user.id) is None
+
+        assert await relay.relay(test_session, test_redis) == 1
+        assert await cache_repo.get_user_total_posts(test_redis, test_user.id) == "1"
+        assert await test_session.scalar(select(func.count(OutboxEvent.id))) == 0
+
+    async def test_relay_in_batches(
+        self, relay: OutboxService, test_session, test_redis
+    ):
+        """Events are relayed in order, at most a batch at a time."""
+        for forum_id in (1, 2, 1):
+            relay.add(test_session, POST_CREATED, {"user_id": 1, "forum_id": forum_id})
+
+        assert await relay.relay(test_session, test_redis) == 2
+        assert await relay.relay(test_session, test_redis) == 1
+        assert await relay.relay(test_session, test_redis) == 0
+        assert await cache_repo.on_forums_read(test_redis, [1, 2]) == [(2, 0), (1, 0)]
+
+    async def test_rolled_back_events_dropped(
+        self, relay: OutboxService, sessionlocal, test_redis
+    ):
+        """Events of a transaction rolled back are never relayed."""
+        async with sessionlocal() as session:
+            relay.add(session, FORUM_INDEX_CHANGED)
+            await session.flush()
+            await session.rollback()
+
+        async with sessionlocal() as session:
+            assert await relay.relay(session, test_redis) == 0
+
+    async def test_commit_wakes_relay(self, sessionlocal):
+        """Committing events wakes the relay of the worker up."""
+        outbox._wake.clear()
+        async with sessionlocal() as session:
+            outbox.add(session, FORUM_INDEX_CHANGED)
+            await session.commit()
+
+        assert outbox._wake.is_set()
+        outbox._wake.clear()
+
+    async def test_commit_without_events(self, sessionlocal):
+        """Committing without events leaves the relay waiting."""
+        outbox._wake.clear()
+        async with sessionlocal() as session:
+            await session.commit()
+
+        assert not outbox._wake.is_set()
+
+    async def test_invalidation_drops_local_value(self, test_redis):
+        """Invalidation events drop the value from Redis and the local cache."""
+        repo = CacheRepository(LocalCache(max_size=2, ttl=10))
+        await repo.set_forum_index(test_redis, [], [])
+
+        await repo.apply_events(test_redis, [(FORUM_INDEX_CHANGED, {})])
+
+        assert await test_redis.get(FORUM_INDEX_KEY) is None
+        assert await repo.get_forum_index(test_redis) is None
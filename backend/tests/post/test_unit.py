@@ -0,0 +1,428 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from forum.category.models import Category
+from forum.forum.models import Forum
+from forum.post.exceptions import PostDoesNotExist, PostNotOwner
+from forum.post.models import Post
+from forum.post.schemas import PostCreate, PostRead
+from forum.post.service import PostService
+from forum.thread.exception import ThreadDoesNotExist
+from forum.thread.models import Thread
+
+
+@pytest.fixture
+def post_service():
+    return PostService()
+
+
+@pytest.fixture
+async def test_thread(test_session, test_user):
+    c = Category(name="Test Category", order=1)
+    f = Forum(name="Test Forum", order=1, category=c)
+    t = Thread(title="Test", forum=f, content="test content", author=test_user)
+    test_session.add(t)
+    await test_session.flush()
+    return t
+
+
+@pytest.fixture
+async def many_posts(test_session, test_thread, test_user):
+    """Seven posts, created one minute apart. Returned oldest first."""
+    start = datetime(2026, 1, 1)
+    posts = []
+    for i in range(7):
+        p = Post(
+            content=f"Post {i}",
+            thread=test_thread,
+            author=test_user,
+            created_at=start + timedelta(minutes=i),
+            position=i + 1,
+        )
+        test_session.add(p)
+        posts.append(p)
+    test_thread.reply_count = len(posts)
+    test_thread.last_position = len(posts)
+    await test_session.flush()
+    return posts
+
+
+class TestPostServiceCreate:
+    async def test_create_updates_thread_counters(
+        self,
+        post_service: PostService,
+        test_session,
+        test_thread,
+        test_user,
+    ):
+        """The thread keeps the number of replies and the last post."""
+        p = PostCreate(thread_id=test_thread.id, content="content")
+        await post_service.create(test_session, p, test_user)
+        p = PostCreate(thread_id=test_thread.id, content="content")
+        post = await post_service.create(test_session, p, test_user)
+
+        await test_session.refresh(test_thread)
+        assert test_thread.reply_count == 2
+        assert test_thread.last_post_id == post.id
+        assert test_thread.last_post_at == post.created_at
+
+    async def test_create_keeps_newer_last_post(
+        self,
+        post_service: PostService,
+        test_session,
+        test_thread,
+        test_user,
+    ):
+        """A post older than the thread last post does not replace it."""
+        newer = Post(
+            content="content",
+            thread=test_thread,
+            author=test_user,
+            created_at=datetime(2100, 1, 1),
+        )
+        test_session.add(newer)
+        await test_session.flush()
+        test_thread.last_post_id = newer.id
+        test_thread.last_post_at = newer.created_at
+        test_thread.last_activity_at = newer.created_at
+        await test_session.flush()
+
+        p = PostCreate(thread_id=test_thread.id, content="content")
+        await post_service.create(test_session, p, test_user)
+
+        await test_session.refresh(test_thread)
+        assert test_thread.last_post_id == newer.id
+        assert test_thread.last_post_at == newer.created_at
+        assert test_thread.last_activity_at == newer.created_at
+
+    async def test_create_assigns_positions(
+        self,
+        post_service: PostService,
+        test_session,
+        test_thread,
+        test_user,
+    ):
+        """Posts are numbered in the order they are created, starting at 1."""
+        posts = [
+            await post_service.create(
+                test_session,
+                PostCreate(thread_id=test_thread.id, content="content"),
+                test_user,
+            )
+            for _ in range(3)
+        ]
+
+        assert [p.position for p in posts] == [1, 2, 3]
+
+    async def test_list_total_comes_from_thread(
+        self,
+        post_service: PostService,
+        test_session,
+        test_thread,
+        test_user,
+    ):
+        """The total number of posts is the thread reply counter."""
+        p = PostCreate(thread_id=test_thread.id, content="content")
+        await post_service.create(test_session, p, test_user)
+
+        posts, total = await post_service.list_posts(
+            test_session, test_thread.id, 1, 10
+        )
+
+        assert len(posts) == 1
+        assert total == 1
+
+
+class TestPostServiceDelete:
+    async def test_delete_last_post(
+        self,
+        post_service: PostService,
+        test_session,
+        test_thread,
+        test_user,
+        many_posts,
+    ):
+        """Deleting the last post moves the thread last post to the previous one."""
+        test_thread.last_post_id = many_posts[-1].id
+        await post_service.delete(test_session, many_posts[-1].id, test_user)
+
+        await test_session.refresh(test_thread)
+        assert test_thread.reply_count == 6
+        assert test_thread.last_post_id == many_posts[-2].id
+        assert test_thread.last_post_at == many_posts[-2].created_at
+
+    async def test_delete_older_post(
+        self,
+        post_service: PostService,
+        test_session,
+        test_thread,
+        test_user,
+        many_posts,
+    ):
+        """Deleting an older post keeps the thread last post."""
+        test_thread.last_post_id = many_posts[-1].id
+        await post_service.delete(test_session, many_posts[0].id, test_user)
+
+        await test_session.refresh(test_thread)
+        assert test_thread.reply_count == 6
+        assert test_thread.last_post_id == many_posts[-1].id
+
+    async def test_delete_leaves_gap(
+        self,
+        post_service: PostService,
+        test_session,
+        test_thread,
+        test_user,
+        many_posts,
+    ):
+        """Later posts keep their position, new posts are numbered after them."""
+        await post_service.delete(test_session, many_posts[2].id, test_user)
+        p = PostCreate(thread_id=test_thread.id, content="content")
+        post = await post_service.create(test_session, p, test_user)
+
+        rest = many_posts[:2] + many_posts[3:]
+        for p in rest:
+            await test_session.refresh(p)
+        assert [p.position for p in rest] == [1, 2, 4, 5, 6, 7]
+        assert post.position == 8
+
+    async def test_cant_delete_others_post(
+        self,
+        post_service: PostService,
+        test_session,
+        test_user2,
+        many_posts,
+    ):
+        """A user should not be able to delete others post."""
+        with pytest.raises(PostNotOwner):
+            await post_service.delete(test_session, many_posts[0].id, test_user2)
+
+    async def test_delete_non_existent_post(
+        self, post_service: PostService, test_session, test_user
+    ):
+        """PostDoesNotExist is raised when the post does not exist."""
+        with pytest.raises(PostDoesNotExist):
+            await post_service.delete(test_session, 1, test_user)
+
+
+class TestPostServiceListByCursor:
+    async def test_first_page_without_cursor(
+        self, post_service: PostService, test_session, test_thread, many_posts
+    ):
+        """Without a cursor the oldest posts are returned."""
+        posts, total, next_cursor, prev_cursor = (
+            await post_service.list_posts_by_cursor(
+                test_session, test_thread.id, 3, None
+            )
+        )
+
+        assert [p.id for p in posts] == [p.id for p in many_posts[:3]]
+        assert total == 7
+        assert next_cursor is not None
+        assert prev_cursor is None
+
+    async def test_walk_forward_through_all_pages(
+        self, post_service: PostService, test_session, test_thread, many_posts
+    ):
+        """Following next cursors returns every post exactly once, in order."""
+        seen = []
+        cursor = None
+        for _ in range(10):
+            posts, _, cursor, _ = await post_service.list_posts_by_cursor(
+                test_session, test_thread.id, 3, cursor
+            )
+            seen.extend(p.id for p in posts)
+            if cursor is None:
+                break
+
+        assert seen == [p.id for p in many_posts]
+
+    async def test_walk_backwards(
+        self, post_service: PostService, test_session, test_thread, many_posts
+    ):
+        """The previous cursor returns the page before."""
+        _, _, next_cursor, _ = await post_service.list_posts_by_cursor(
+            test_session, test_thread.id, 3, None
+        )
+        _, _, _, prev_cursor = await post_service.list_posts_by_cursor(
+            test_session, test_thread.id, 3, next_cursor
+        )
+        posts, _, _, prev_cursor = await post_service.list_posts_by_cursor(
+            test_session, test_thread.id, 3, prev_cursor
+        )
+
+        assert [p.id for p in posts] == [p.id for p in many_posts[:3]]
+        assert prev_cursor is None
+
+    async def test_list_by_cursor_without_existing_thread(
+        self, post_service: PostService, test_session
+    ):
+        """ThreadDoesNotExist is raised when the thread does not exist."""
+        with pytest.raises(ThreadDoesNotExist):
+            await post_service.list_posts_by_cursor(test_session, 1, 3, None)
+
+
+class TestPostServiceListAround:
+    @pytest.mark.parametrize("index, page", [(0, 1), (2, 1), (3, 2), (5, 2), (6, 3)])
+    async def test_page_of_post(
+        self,
+        post_service: PostService,
+        test_session,
+        test_thread,
+        many_posts,
+        index,
+        page,
+    ):
+        """The returned page is the same as the page number listing."""
+        posts, total, found_page, _, _ = await post_service.list_posts_around(
+            test_session, test_thread.id, many_posts[index].id, 3
+        )
+        expected, _ = await post_service.list_posts(
+            test_session, test_thread.id, page, 3
+        )
+
+        assert found_page == page
+        assert total == 7
+        assert [p.id for p in posts] == [p.id for p in expected]
+
+    async def test_page_after_delete(
+        self,
+        post_service: PostService,
+        test_session,
+        test_thread,
+        test_user,
+        many_posts,
+    ):
+        """A deletion leaves the later posts on their page until rebuilt."""
+        await post_service.delete(test_session, many_posts[0].id, test_user)
+
+        posts, total, page, _, _ = await post_service.list_posts_around(
+            test_session, test_thread.id, many_posts[3].id, 3
+        )
+
+        assert (total, page) == (6, 2)
+        assert [p.id for p in posts] == [p.id for p in many_posts[3:6]]
+
+    async def test_cursors_of_middle_page(
+        self, post_service: PostService, test_session, test_thread, many_posts
+    ):
+        """Cursors of the found page point to its neighbours."""
+        _, _, _, next_cursor, prev_cursor = await post_service.list_posts_around(
+            test_session, test_thread.id, many_posts[4].id, 3
+        )
+        after, _, _, _ = await post_service.list_posts_by_cursor(
+            test_session, test_thread.id, 3, next_cursor
+        )
+        before, _, _, _ = await post_service.list_posts_by_cursor(
+            test_session, test_thread.id, 3, prev_cursor
+        )
+
+        assert [p.id for p in after] == [many_posts[6].id]
+        assert [p.id for p in before] == [p.id for p in many_posts[:3]]
+
+    async def test_post_from_another_thread(
+        self, post_service: PostService, test_session, test_thread, many_posts
+    ):
+        """PostDoesNotExist is raised when the post is not in the thread."""
+        with pytest.raises(PostDoesNotExist):
+            await post_service.list_posts_around(
+                test_session, test_thread.id + 1, many_posts[0].id, 3
+            )
+
+    async def test_non_existent_post(
+        self, post_service: PostService, test_session, test_thread
+    ):
+        """PostDoesNotExist is raised when the post does not exist."""
+        with pytest.raises(PostDoesNotExist):
+            await post_service.list_posts_around(test_session, test_thread.id, 1, 3)
+
+
+class TestPostServiceStatements:
+    """Regression tests on the number of statements of each listing."""
+
+    async def test_list_posts(
+        self,
+        post_service: PostService,
+        test_session,
+        test_thread,
+        many_posts,
+        count_statements,
+    ):
+        """Posts, authors and total are read in one statement."""
+        test_session.expunge_all()
+        with count_statements() as statements:
+            posts, total = await post_service.list_posts(
+                test_session, test_thread.id, 1, 3
+            )
+            [p.author.username for p in posts]
+
+        assert len(statements) == 1
+        assert total == 7
+
+    async def test_list_posts_by_cursor(
+        self,
+        post_service: PostService,
+        test_session,
+        test_thread,
+        many_posts,
+        count_statements,
+    ):
+        """Posts, authors and total are read in one statement."""
+        test_session.expunge_all()
+        with count_statements() as statements:
+            posts, total, _, _ = await post_service.list_posts_by_cursor(
+                test_session, test_thread.id, 3, None
+            )
+            [p.author.username for p in posts]
+
+        assert len(statements) == 1
+        assert total == 7
+
+    async def test_list_posts_around(
+        self,
+        post_service: PostService,
+        test_session,
+        test_thread,
+        many_posts,
+        count_statements,
+    ):
+        """The post, its position and the page around it take three statements."""
+        test_session.expunge_all()
+        with count_statements() as statements:
+            posts, total, page, _, _ = await post_service.list_posts_around(
+                test_session, test_thread.id, many_posts[4].id, 3
+            )
+            [p.author.username for p in posts]
+
+        assert len(statements) == 3
+        assert (total, page) == (7, 2)
+
+    async def test_create(
+        self,
+        post_service: PostService,
+        test_session,
+        test_thread,
+        test_user,
+        count_statements,
+    ):
+        """A post is inserted and returned without reading it back."""
+        test_session.expunge_all()
+        p = PostCreate(thread_id=test_thread.id, content="content")
+        with count_statements() as statements:
+            post = await post_service.create(test_session, p, test_user)
+            PostRead.model_validate(post)
+
+        assert len(statements) == 3
+        assert post.author == test_user
+
+    async def test_get(
+        self, post_service: PostService, test_session, many_posts, count_statements
+    ):
+        """A post is read with its author and thread in one statement."""
+        test_session.expunge_all()
+        with count_statements() as statements:
+            post = await post_service.get(test_session, many_posts[0].id)
+            post.author.username, post.thread.title
+
+        assert len(statements) == 1
@@ -1,11 +1,22 @@
+from datetime import datetime, timedelta
+
 import pytest
 
 from forum.category.models import Category
+from forum.exceptions import InvalidCursor
 from forum.forum.exceptions import ForumDoesNotExist
 from forum.forum.models import Forum
+from forum.post.models import Post
+from forum.post.schemas import PostCreate
+from forum.post.service import PostService
 from forum.thread.exception import ThreadDoesNotExist, ThreadNotOwner
 from forum.thread.models import Thread
-from forum.thread.schemas import ThreadCreate, ThreadEditUser
+from forum.thread.schemas import (
+    ThreadCreate,
+    ThreadCursor,
+    ThreadEditUser,
+    ThreadRead,
+)
 from forum.thread.service import ThreadService
 
 
@@ -50,6 +61,27 @@ async def new_thread(test_session, test_forum, thread_owner):
     return t
 
 
+@pytest.fixture
+async def many_threads(test_session, test_forum, thread_owner):
+    """Five threads, created one minute apart. Returned newest first."""
+    start = datetime(2026, 1, 1)
+    threads = []
+    for i in range(5):
+        t = Thread(
+            title=f"Thread {i}",
+            forum=test_forum,
+            content="test content",
+            author=thread_owner,
+            created_at=start + timedelta(minutes=i),
+            last_activity_at=start + timedelta(minutes=i),
+        )
+        test_session.add(t)
+        threads.append(t)
+    test_forum.thread_count = len(threads)
+    await test_session.flush()
+    return threads[::-1]
+
+
 class TestThreadServiceCreate:
     async def test_create_thread_success(
         self,
@@ -57,11 +89,10 @@ class TestThreadServiceCreate:
         test_session,
         test_forum,
         thread_owner,
-        test_redis,
     ):
         """A new thread should be created."""
         t = ThreadCreate(title="Test", forum_id=test_forum.id, content="test content")
-        thread = await thread_service.create(test_session, test_redis, t, thread_owner)
+        thread = await thread_service.create(test_session, t, thread_owner)
 
         assert thread
 
@@ -71,11 +102,10 @@ class TestThreadServiceCreate:
         test_session,
         test_forum,
         thread_owner,
-        test_redis,
     ):
         """Thread info is stored properly"""
         t = ThreadCreate(title="Test", forum_id=test_forum.id, content="test content")
-        thread = await thread_service.create(test_session, test_redis, t, thread_owner)
+        thread = await thread_service.create(test_session, t, thread_owner)
 
         assert thread.forum == test_forum
         assert thread.title == "Test"
@@ -86,11 +116,10 @@ class TestThreadServiceCreate:
         test_session,
         test_forum,
         thread_owner,
-        test_redis,
     ):
         """Thread keeps information about who created the thread."""
         t = ThreadCreate(title="Test", forum_id=test_forum.id, content="test content")
-        thread = await thread_service.create(test_session, test_redis, t, thread_owner)
+        thread = await thread_service.create(test_session, t, thread_owner)
 
         assert thread.author == thread_owner
 
@@ -100,16 +129,15 @@ class TestThreadServiceCreate:
         test_session,
         test_forum,
         thread_owner,
-        test_redis,
     ):
         """Thread keeps information about which forum it belongs."""
         t = ThreadCreate(title="Test", forum_id=test_forum.id, content="test content")
-        thread = await thread_service.create(test_session, test_redis, t, thread_owner)
+        thread = await thread_service.create(test_session, t, thread_owner)
 
         assert thread.forum == test_forum
 
     async def test_create_thread_without_existing_forum(
-        self, thread_service: ThreadService, test_session, thread_owner, test_redis
+        self, thread_service: ThreadService, test_session, thread_owner
     ):
         """
         ForumDoesNotExist is raised when attempting to create a
@@ -117,7 +145,7 @@ class TestThreadServiceCreate:
         """
         t = ThreadCreate(title="Test", forum_id=1, content="test content")
         with pytest.raises(ForumDoesNotExist):
-            await thread_service.create(test_session, test_redis, t, thread_owner)
+            await thread_service.create(test_session, t, thread_owner)
 
     async def test_create_thread_with_duplicate_title(
         self,
@@ -125,13 +153,12 @@ class TestThreadServiceCreate:
         test_session,
         test_forum,
         thread_owner,
-        test_redis,
     ):
         """Thread with duplicate name should exist."""
         t = ThreadCreate(title="Test", forum_id=test_forum.id, content="test content")
-        thread1 = await thread_service.create(test_session, test_redis, t, thread_owner)
+        thread1 = await thread_service.create(test_session, t, thread_owner)
         t = ThreadCreate(title="Test", forum_id=test_forum.id, content="test content")
-        thread2 = await thread_service.create(test_session, test_redis, t, thread_owner)
+        thread2 = await thread_service.create(test_session, t, thread_owner)
 
         assert thread1
         assert thread2
@@ -144,10 +171,9 @@ class TestThreadServiceList:
         test_session,
         test_forum,
         thread_owner,
-        test_redis,
     ):
         t = ThreadCreate(title="Test", forum_id=test_forum.id, content="test content")
-        await thread_service.create(test_session, test_redis, t, thread_owner)
+        await thread_service.create(test_session, t, thread_owner)
 
         threads, total = await thread_service.list_threads(
             test_session, test_forum.id, page=1, limit=2
@@ -163,14 +189,13 @@ class TestThreadServiceList:
         test_session,
         test_forum,
         thread_owner,
-        test_redis,
     ):
         t = ThreadCreate(title="Test", forum_id=test_forum.id, content="test content")
-        await thread_service.create(test_session, test_redis, t, thread_owner)
+        await thread_service.create(test_session, t, thread_owner)
         t = ThreadCreate(title="Test", forum_id=test_forum.id, content="test content")
-        await thread_service.create(test_session, test_redis, t, thread_owner)
+        await thread_service.create(test_session, t, thread_owner)
         t = ThreadCreate(title="Test", forum_id=test_forum.id, content="test content")
-        await thread_service.create(test_session, test_redis, t, thread_owner)
+        await thread_service.create(test_session, t, thread_owner)
 
         threads, total = await thread_service.list_threads(
             test_session, test_forum.id, page=1, limit=3
@@ -195,14 +220,13 @@ class TestThreadServiceList:
         test_session,
         test_forum,
         thread_owner,
-        test_redis,
     ):
         t = ThreadCreate(title="Test", forum_id=test_forum.id, content="test content")
-        await thread_service.create(test_session, test_redis, t, thread_owner)
+        await thread_service.create(test_session, t, thread_owner)
         t = ThreadCreate(title="Test", forum_id=test_forum.id, content="test content")
-        await thread_service.create(test_session, test_redis, t, thread_owner)
+        await thread_service.create(test_session, t, thread_owner)
         t = ThreadCreate(title="Test", forum_id=test_forum.id, content="test content")
-        await thread_service.create(test_session, test_redis, t, thread_owner)
+        await thread_service.create(test_session, t, thread_owner)
 
         threads, total = await thread_service.list_threads(
             test_session, test_forum.id, page=2, limit=2
@@ -333,3 +357,242 @@ class TestThreadServiceList:
 
             assert thread.title == "New title"
             assert thread.content == "New content"
+
+
+class TestThreadServiceListByCursor:
+    async def test_first_page_without_cursor(
+        self, thread_service: ThreadService, test_session, test_forum, many_threads
+    ):
+        """Without a cursor the newest threads are returned."""
+        threads, total, next_cursor, prev_cursor = (
+            await thread_service.list_threads_by_cursor(
+                test_session, test_forum.id, 2, None
+            )
+        )
+
+        assert [t.id for t in threads] == [t.id for t in many_threads[:2]]
+        assert total == 5
+        assert next_cursor is not None
+        assert prev_cursor is None
+
+    async def test_walk_forward_through_all_pages(
+        self, thread_service: ThreadService, test_session, test_forum, many_threads
+    ):
+        """Following next cursors returns every thread exactly once, in order."""
+        seen = []
+        cursor = None
+        for _ in range(10):
+            threads, _, cursor, _ = await thread_service.list_threads_by_cursor(
+                test_session, test_forum.id, 2, cursor
+            )
+            seen.extend(t.id for t in threads)
+            if cursor is None:
+                break
+
+        assert seen == [t.id for t in many_threads]
+
+    async def test_walk_backwards(
+        self, thread_service: ThreadService, test_session, test_forum, many_threads
+    ):
+        """The previous cursor returns the page before."""
+        _, _, next_cursor, _ = await thread_service.list_threads_by_cursor(
+            test_session, test_forum.id, 2, None
+        )
+        _, _, _, prev_cursor = await thread_service.list_threads_by_cursor(
+            test_session, test_forum.id, 2, next_cursor
+        )
+        threads, _, next_cursor, prev_cursor = (
+            await thread_service.list_threads_by_cursor(
+                test_session, test_forum.id, 2, prev_cursor
+            )
+        )
+
+        assert [t.id for t in threads] == [t.id for t in many_threads[:2]]
+        assert next_cursor is not None
+        assert prev_cursor is None
+
+    async def test_cursor_survives_encoding(
+        self, thread_service: ThreadService, test_session, test_forum, many_threads
+    ):
+        """An encoded cursor can be decoded back and used."""
+        _, _, next_cursor, _ = await thread_service.list_threads_by_cursor(
+            test_session, test_forum.id, 2, None
+        )
+        cursor = ThreadCursor.decode(next_cursor.encode())  # type: ignore
+        threads, _, _, _ = await thread_service.list_threads_by_cursor(
+            test_session, test_forum.id, 2, cursor
+        )
+
+        assert [t.id for t in threads] == [t.id for t in many_threads[2:4]]
+
+    async def test_invalid_cursor(self):
+        """InvalidCursor is raised for garbage cursors."""
+        with pytest.raises(InvalidCursor):
+            ThreadCursor.decode("not-a-cursor")
+
+    async def test_list_by_cursor_without_existing_forum(
+        self, thread_service: ThreadService, test_session
+    ):
+        """ForumDoesNotExist is raised when the forum does not exist."""
+        with pytest.raises(ForumDoesNotExist):
+            await thread_service.list_threads_by_cursor(test_session, 1, 2, None)
+
+
+class TestThreadServiceRebuildCounters:
+    async def test_rebuild_counters(
+        self, thread_service: ThreadService, test_session, new_thread, thread_owner
+    ):
+        """Counters are rebuilt from the posts of the thread."""
+        start = datetime(2026, 1, 1)
+        posts = [
+            Post(
+                content="content",
+                thread=new_thread,
+                author=thread_owner,
+                created_at=start + timedelta(minutes=i),
+            )
+            for i in range(3)
+        ]
+        test_session.add_all(posts)
+        await test_session.flush()
+
+        await thread_service.rebuild_counters(test_session)
+        await test_session.refresh(new_thread)
+
+        assert new_thread.reply_count == 3
+        assert new_thread.last_post_id == posts[-1].id
+        assert new_thread.last_post_at == posts[-1].created_at
+        for p in posts:
+            await test_session.refresh(p)
+        assert [p.position for p in posts] == [1, 2, 3]
+        assert new_thread.last_position == 3
+
+    async def test_rebuild_counters_without_posts(
+        self, thread_service: ThreadService, test_session, new_thread
+    ):
+        """Threads without posts have no replies and no last post."""
+        new_thread.reply_count = 10
+        await test_session.flush()
+
+        await thread_service.rebuild_counters(test_session)
+        await test_session.refresh(new_thread)
+
+        assert new_thread.reply_count == 0
+        assert new_thread.last_post_id is None
+
+
+class TestThreadServiceListOrder:
+    async def test_pinned_threads_first(
+        self, thread_service: ThreadService, test_session, test_forum, many_threads
+    ):
+        """Pinned threads are listed before the others."""
+        await thread_service.pin(test_session, many_threads[-1].id)
+        await test_session.flush()
+
+        threads, _ = await thread_service.list_threads(
+            test_session, test_forum.id, page=1, limit=5
+        )
+
+        assert threads[0].id == many_threads[-1].id
+        assert [t.id for t in threads[1:]] == [t.id for t in many_threads[:-1]]
+
+    async def test_new_post_bumps_thread(
+        self,
+        thread_service: ThreadService,
+        test_session,
+        test_forum,
+        many_threads,
+        thread_owner,
+    ):
+        """A thread with a new post is listed first."""
+        p = PostCreate(thread_id=many_threads[-1].id, content="content")
+        await PostService().create(test_session, p, thread_owner)
+
+        threads, _ = await thread_service.list_threads(
+            test_session, test_forum.id, page=1, limit=5
+        )
+
+        assert threads[0].id == many_threads[-1].id
+
+
+class TestThreadServiceStatements:
+    """Regression tests on the number of statements of each listing."""
+
+    async def test_list_threads(
+        self,
+        thread_service: ThreadService,
+        test_session,
+        test_forum,
+        many_threads,
+        count_statements,
+    ):
+        """Threads, authors and total are read in one statement."""
+        test_session.expunge_all()
+        with count_statements() as statements:
+            threads, total = await thread_service.list_threads(
+                test_session, test_forum.id, 1, 3
+            )
+            [t.author.username for t in threads]
+
+        assert len(statements) == 1
+        assert total == 5
+
+    async def test_list_threads_by_cursor(
+        self,
+        thread_service: ThreadService,
+        test_session,
+        test_forum,
+        many_threads,
+        count_statements,
+    ):
+        """Threads, authors and total are read in one statement."""
+        test_session.expunge_all()
+        _, _, cursor, _ = await thread_service.list_threads_by_cursor(
+            test_session, test_forum.id, 2, None
+        )
+        with count_statements() as statements:
+            threads, total, _, _ = await thread_service.list_threads_by_cursor(
+                test_session, test_forum.id, 2, cursor
+            )
+            [t.author.username for t in threads]
+
+        assert len(statements) == 1
+        assert total == 5
+
+    async def test_list_empty_forum(
+        self, thread_service: ThreadService, test_session, test_forum, count_statements
+    ):
+        """An empty listing checks the forum exists with a second statement."""
+        test_session.expunge_all()
+        with count_statements() as statements:
+            await thread_service.list_threads(test_session, test_forum.id, 1, 3)
+
+        assert len(statements) == 2
+
+    async def test_create(
+        self,
+        thread_service: ThreadService,
+        test_session,
+        test_forum,
+        thread_owner,
+        count_statements,
+    ):
+        """The forum counter and the insert are the only statements of a creation."""
+        t = ThreadCreate(title="Test", forum_id=test_forum.id, content="test content")
+        with count_statements() as statements:
+            thread = await thread_service.create(test_session, t, thread_owner)
+            ThreadRead.model_validate(thread)
+
+        assert len(statements) == 2
+        assert thread.forum.thread_count == 1
+
+    async def test_get(
+        self, thread_service: ThreadService, test_session, new_thread, count_statements
+    ):
+        """A thread is read with its author and forum in one statement."""
+        test_session.expunge_all()
+        with count_statements() as statements:
+            thread = await thread_service.get(test_session, new_thread.id)
+            thread.author.username, thread.forum.name
+
+        assert len(statements) == 1